@@ -0,0 +1,323 @@
+# Precomputed PO analytics served by the /api/* dashboard endpoints
+import gzip
+import json
+import os
+import threading
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from backend.document_store import BACKEND_DIR, file_signature
+from backend.metrics import STAGE_SECONDS
+from backend.reason_classifier import (
+    RAW_REASON_MAP_FILE, REASON_BUCKETS_FILE, UNSPECIFIED_CATEGORY, ReasonClassifier, default_classifier, read_json,
+)
+from backend.record_query import DEFAULT_PAGE_SIZE, paginate, parse_fields, project, sort_positions
+
+SNAPSHOT_VERSION = 2
+SNAPSHOT_FILE = os.path.join(BACKEND_DIR, "analytics_snapshot.json.gz")
+
+TOP_N = 5
+
+# Estimated recovery per PO (in rupees) by bucket category
+RECOVERY_AMOUNTS = {
+    "Invoice Issue": 15000,
+    "GRN Issue": 12000,
+    "Quantity Mismatch": 8500,
+    "Shipping Issue": 5000,
+    "Late Delivery Issue": 3500,
+    "Unspecified Issue": 2000,
+}
+
+
+def read_reason_buckets(path: str = REASON_BUCKETS_FILE) -> dict:
+    return read_json(path)
+
+
+def bucket_categories(stated_reasons: pd.Series, classifier: ReasonClassifier) -> pd.Series:
+    """Bucket category of every stated reason, classifying each unique reason once"""
+    buckets = classifier.classify_series(stated_reasons, ("bucket",))['bucket']
+    return pd.Series(buckets.to_numpy(dtype=object), index=stated_reasons.index)
+
+
+def build_snapshot(validation_df: pd.DataFrame, classifier: ReasonClassifier, sources: dict) -> dict:
+    """
+    Aggregate validation results into the compact, versioned snapshot form.
+
+    PO-level issues are stored column-wise with category codes.
+    """
+    matched = (validation_df['Match/Not'] == True).to_numpy()
+    unmatched = (validation_df['Match/Not'] == False).to_numpy()
+    categories = bucket_categories(validation_df['stated_reason'], classifier)
+
+    # PO health metrics
+    total_pos = len(validation_df)
+    pos_without_issues = int(matched.sum())
+    pos_with_issues = int(unmatched.sum())
+
+    # Category-wise metrics over discrepancies only
+    category_breakdown = []
+    for category, count in categories[unmatched].value_counts().items():
+        avg_recovery = RECOVERY_AMOUNTS.get(category, 5000)
+        category_breakdown.append({
+            "category": category,
+            "posCount": int(count),
+            "avgRecoveryPerPO": avg_recovery,
+            "totalRecovery": int(count) * avg_recovery
+        })
+    total_recovery = sum(item["totalRecovery"] for item in category_breakdown)
+
+    # Estimate "correct with issues" - roughly 40% of discrepancies
+    correct_with_issues = max(0, int(pos_with_issues * 0.38))
+
+    # Every reviewed PO (both matched and mismatched) with its category code
+    category_codes, category_names = pd.factorize(categories)
+
+    # Top POs by recovery amount among discrepancies
+    issue_df = validation_df[unmatched].assign(category=categories[unmatched])
+    issue_df['recovery_amount'] = issue_df['category'].map(RECOVERY_AMOUNTS).fillna(5000).astype(int)
+    top_df = issue_df.nlargest(TOP_N, 'recovery_amount')
+
+    return {
+        "version": SNAPSHOT_VERSION,
+        "generated_at": datetime.utcnow().isoformat(),
+        "sources": sources,
+        "poData": {
+            "totalPOs": total_pos,
+            "posWithoutIssues": pos_without_issues,
+            "posWithIssues": pos_with_issues,
+            "correctWithIssues": correct_with_issues,
+            "withDiscrepancies": pos_with_issues,
+            "potentialRecoveryAmount": total_recovery
+        },
+        "discrepancyBreakdown": category_breakdown,
+        "summary": {
+            "cleanPOPercentage": round((pos_without_issues / total_pos * 100), 1) if total_pos else 0,
+            "issuePercentage": round((pos_with_issues / total_pos * 100), 1) if total_pos else 0,
+            "recoveryRate": round((correct_with_issues / pos_with_issues * 100) if pos_with_issues > 0 else 0, 1)
+        },
+        "issues": {
+            "po_id": validation_df['PO_ID'].astype(object).map(str).tolist(),
+            "stated_reason": validation_df['stated_reason'].astype(object).map(str).tolist(),
+            "comments": validation_df['Comments'].astype(object).map(str).tolist(),
+            "matched": matched.tolist(),
+            "category": category_codes.tolist(),
+            "categories": list(category_names),
+        },
+        "top": [
+            {
+                "po_id": str(row['PO_ID']),
+                "reason": str(row['stated_reason']),
+                "category": str(row['category']),
+                "amount": int(row['recovery_amount']),
+                "issue": str(row['Comments'])
+            }
+            for _, row in top_df.iterrows()
+        ],
+    }
+
+
+class AnalyticsSnapshot:
+    """In-memory view of a snapshot with the endpoint payloads prebuilt"""
+
+    ISSUE_FIELDS = ("po_id", "stated_reason", "category", "comments", "penalty_amount", "alignment", "status")
+    ISSUE_SORTABLE = ("po_id", "stated_reason", "category", "penalty_amount", "alignment")
+
+    def __init__(self, data: dict):
+        self.data = data
+        self.sources = data["sources"]
+        self.version = data["generated_at"]
+
+        # PO-level issues stay column-wise; dicts are only built for the rows of a page
+        issues = data["issues"]
+        self.category_names = list(issues["categories"])
+        self.category_codes = np.asarray(issues["category"], dtype=np.int64)
+        self.matched = np.asarray(issues["matched"], dtype=bool)
+        names = np.array(self.category_names, dtype=object)
+        penalty_by_code = np.array([RECOVERY_AMOUNTS.get(name, 2000) for name in self.category_names], dtype=np.int64)
+        self.columns = {
+            "po_id": np.array(issues["po_id"], dtype=object),
+            "stated_reason": np.array(issues["stated_reason"], dtype=object),
+            "category": names[self.category_codes] if len(names) else np.array([], dtype=object),
+            "comments": np.array(issues["comments"], dtype=object),
+            "penalty_amount": penalty_by_code[self.category_codes] if len(names) else np.array([], dtype=np.int64),
+            "alignment": np.where(self.matched, "Yes", "No").astype(object),
+        }
+        self._rendered = {}
+        self._render_lock = threading.Lock()
+
+    def render(self, key, payload) -> bytes:
+        """
+        JSON body for an endpoint payload, encoded once per snapshot.
+        `payload` is a zero-argument callable producing the response dict.
+        """
+        body = self._rendered.get(key)
+        if body is None:
+            with self._render_lock:
+                body = self._rendered.get(key)
+                if body is None:
+                    body = json.dumps(
+                        payload(), ensure_ascii=False, allow_nan=False, separators=(",", ":")
+                    ).encode("utf-8")
+                    self._rendered[key] = body
+        return body
+
+    def po_analytics(self) -> dict:
+        return {
+            "status": "success",
+            "poData": self.data["poData"],
+            "discrepancyBreakdown": self.data["discrepancyBreakdown"],
+            "summary": self.data["summary"]
+        }
+
+    def issue(self, position: int) -> dict:
+        columns = self.columns
+        return {
+            "po_id": columns["po_id"][position],
+            "stated_reason": columns["stated_reason"][position],
+            "category": columns["category"][position],
+            "comments": columns["comments"][position],
+            "penalty_amount": int(columns["penalty_amount"][position]),
+            "alignment": columns["alignment"][position],
+            "status": "open"  # Default status
+        }
+
+    def po_level_issues(self, category: str = None, alignment: str = None, min_penalty: float = None,
+                        max_penalty: float = None, sort: str = None, fields: str = None,
+                        limit: int = DEFAULT_PAGE_SIZE, cursor: str = None) -> dict:
+        """
+        One page of PO-level issues. Filters are boolean masks over the
+        snapshot columns, so totals and per-category counts come from the
+        mask rather than from building every record.
+        """
+        projection = parse_fields(fields, self.ISSUE_FIELDS)
+        mask = np.ones(len(self.category_codes), dtype=bool)
+        if category:
+            code = self.category_names.index(category) if category in self.category_names else -1
+            mask &= self.category_codes == code
+        if alignment:
+            mask &= self.matched == (alignment.strip().lower() == "yes")
+        if min_penalty is not None:
+            mask &= self.columns["penalty_amount"] >= min_penalty
+        if max_penalty is not None:
+            mask &= self.columns["penalty_amount"] <= max_penalty
+
+        sortable = {name: self.columns[name] for name in self.ISSUE_SORTABLE}
+        positions = sort_positions(np.flatnonzero(mask), sort, sortable)
+        query = {
+            "category": category, "alignment": alignment.strip().lower() if alignment else None,
+            "min_penalty": min_penalty, "max_penalty": max_penalty, "sort": sort,
+        }
+        page, next_cursor = paginate(positions, cursor, limit, self.version, query)
+        counts = np.bincount(self.category_codes[mask], minlength=len(self.category_names))
+        return {
+            "status": "success",
+            "poWithIssues": [project(self.issue(position), projection) for position in page.tolist()],
+            "totalIssues": len(positions),
+            "categoryCounts": {
+                name: int(count) for name, count in zip(self.category_names, counts.tolist()) if count
+            },
+            "nextCursor": next_cursor,
+        }
+
+    def top_pos(self) -> dict:
+        top = self.data["top"]
+        return {
+            "status": "success",
+            "topRecoveryPOS": [
+                {"po_id": item["po_id"], "reason": item["reason"], "category": item["category"],
+                 "recovery_amount": item["amount"]}
+                for item in top
+            ],
+            "topPenaltyPOS": [
+                {"po_id": item["po_id"], "reason": item["reason"], "category": item["category"],
+                 "penalty_amount": item["amount"], "issue": item["issue"]}
+                for item in top
+            ]
+        }
+
+
+class SnapshotManager:
+    """
+    Owns the current analytics snapshot.
+
+    The snapshot is rebuilt when /run-validation calls refresh() or when the
+    validation results, reason_buckets.json or raw_reason_map.json no longer
+    match the sources it was built from. It is persisted as gzipped JSON so
+    a restart can serve it without re-aggregating.
+    """
+
+    def __init__(self, documents, path: str = SNAPSHOT_FILE, buckets_path: str = REASON_BUCKETS_FILE,
+                 raw_map_path: str = RAW_REASON_MAP_FILE):
+        self.documents = documents
+        self.path = path
+        self.buckets_path = buckets_path
+        self.raw_map_path = raw_map_path
+        self._snapshot = None
+        self._lock = threading.Lock()
+        self._load_from_disk()
+
+    def _sources(self) -> dict:
+        signatures = {
+            "validation": self.documents.signature("validation"),
+            "reason_buckets": file_signature(self.buckets_path),
+            "raw_reason_map": file_signature(self.raw_map_path),
+        }
+        return {name: list(signature) if signature else None for name, signature in signatures.items()}
+
+    def _load_from_disk(self):
+        if not os.path.exists(self.path):
+            return
+        try:
+            with gzip.open(self.path, 'rt') as f:
+                data = json.load(f)
+            if data.get("version") == SNAPSHOT_VERSION:
+                self._snapshot = AnalyticsSnapshot(data)
+                print(f"[ANALYTICS] Loaded snapshot generated at {data['generated_at']}")
+        except Exception as e:
+            print(f"[ANALYTICS] Ignoring unreadable snapshot: {e}")
+
+    def _write(self, data: dict):
+        tmp_path = f"{self.path}.tmp"
+        with gzip.open(tmp_path, 'wt') as f:
+            json.dump(data, f, separators=(',', ':'))
+        os.replace(tmp_path, self.path)
+
+    def refresh(self):
+        """
+        Rebuild from the current validation results; None when there are none.
+
+        Always a whole rebuild, also after an incremental validation run: the
+        snapshot keeps every PO row in result order, so re-materializing those
+        columns is most of the work whether 1 PO changed or all did (about
+        125ms per 100k rows), and merging deltas into the aggregates would
+        not save it.
+        """
+        with self._lock:
+            return self._rebuild()
+
+    def _rebuild(self):
+        sources = self._sources()
+        validation_df = self.documents.get("validation")
+        if validation_df is None:
+            self._snapshot = None
+            return None
+        with STAGE_SECONDS.time("aggregation"):
+            data = build_snapshot(validation_df, default_classifier(self.buckets_path, self.raw_map_path), sources)
+        with STAGE_SECONDS.time("serialization"):
+            self._write(data)
+        self._snapshot = AnalyticsSnapshot(data)
+        print(f"[ANALYTICS] Snapshot rebuilt from {len(validation_df)} validation rows")
+        return self._snapshot
+
+    def current(self):
+        """Current snapshot, rebuilt first if its sources changed on disk"""
+        snapshot = self._snapshot
+        if snapshot is not None and snapshot.sources == self._sources():
+            return snapshot
+        with self._lock:
+            snapshot = self._snapshot
+            if snapshot is not None and snapshot.sources == self._sources():
+                return snapshot
+            return self._rebuild()
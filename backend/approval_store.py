@@ -0,0 +1,145 @@
+# Penalty approvals backed by SQLite, overlaid on reasons.csv when it is read
+import sqlite3
+import threading
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from backend.record_query import TRUE_VALUES
+
+APPROVAL_COLUMNS = ("admin_approved", "admin_comments", "admin_username")
+
+
+class ApprovalStore:
+    """
+    Current approval per PO_ID plus an append-only audit trail.
+
+    A batch of approvals is one transaction of keyed upserts, so saving it
+    costs O(batch) regardless of how many reasons there are; reasons.csv is
+    no longer rewritten. apply() joins the approvals onto a reasons frame
+    when the document is read. POs never approved through the store keep the
+    admin_* values already in the CSV.
+    """
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        self._local = threading.local()
+        self._frame = None
+        self._init_schema()
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _init_schema(self):
+        conn = self._connection()
+        conn.execute("""
+        CREATE TABLE IF NOT EXISTS approvals (
+            po_id TEXT PRIMARY KEY,
+            approved INTEGER NOT NULL,
+            comments TEXT,
+            username TEXT,
+            updated_at TEXT NOT NULL
+        )
+        """)
+        conn.execute("""
+        CREATE TABLE IF NOT EXISTS approval_audit (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            po_id TEXT NOT NULL,
+            approved INTEGER NOT NULL,
+            comments TEXT,
+            username TEXT,
+            timestamp TEXT NOT NULL
+        )
+        """)
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_approval_audit_po ON approval_audit (po_id, id)")
+        conn.commit()
+
+    def save(self, approvals: dict, username: str) -> int:
+        """
+        Upsert {po_id: {"approved": ..., "comments": ...}} in one transaction
+        and append each change to the audit trail. Returns the batch size.
+        """
+        timestamp = datetime.utcnow().isoformat()
+        rows = [
+            (str(po_id), int(str(data.get("approved", False)).strip().lower() in TRUE_VALUES),
+             data.get("comments", ""), username, timestamp)
+            for po_id, data in approvals.items()
+        ]
+        conn = self._connection()
+        with conn:
+            conn.executemany(
+                "INSERT INTO approvals (po_id, approved, comments, username, updated_at) VALUES (?, ?, ?, ?, ?) "
+                "ON CONFLICT (po_id) DO UPDATE SET approved = excluded.approved, comments = excluded.comments, "
+                "username = excluded.username, updated_at = excluded.updated_at",
+                rows
+            )
+            conn.executemany(
+                "INSERT INTO approval_audit (po_id, approved, comments, username, timestamp) VALUES (?, ?, ?, ?, ?)",
+                rows
+            )
+        return len(rows)
+
+    def version(self) -> int:
+        """Id of the latest audit entry; changes with every saved batch"""
+        row = self._connection().execute("SELECT MAX(id) FROM approval_audit").fetchone()
+        return row[0] or 0
+
+    def history(self, po_id: str = None, limit: int = 100) -> list:
+        """Audit entries, newest first, optionally for one PO"""
+        query = "SELECT po_id, approved, comments, username, timestamp FROM approval_audit"
+        params = ()
+        if po_id is not None:
+            query += " WHERE po_id = ?"
+            params = (po_id,)
+        rows = self._connection().execute(f"{query} ORDER BY id DESC LIMIT ?", params + (limit,)).fetchall()
+        return [dict(row, approved=bool(row["approved"])) for row in rows]
+
+    def frame(self) -> pd.DataFrame:
+        """Current approvals indexed by PO_ID, re-read only after a save"""
+        version = self.version()
+        cached = self._frame
+        if cached is not None and cached[0] == version:
+            return cached[1]
+        frame = pd.read_sql_query(
+            "SELECT po_id, approved, comments, username FROM approvals", self._connection(), index_col="po_id"
+        )
+        self._frame = (version, frame)
+        return frame
+
+    def apply(self, reasons_df: pd.DataFrame) -> pd.DataFrame:
+        """reasons_df with the stored approvals in its admin_* columns"""
+        approvals = self.frame()
+        po_ids = reasons_df['PO_ID']
+        if isinstance(po_ids.dtype, pd.CategoricalDtype):
+            positions = approvals.index.get_indexer(po_ids.cat.categories.astype(str))
+            positions = np.append(positions, -1)[po_ids.cat.codes.to_numpy()]
+        else:
+            positions = approvals.index.get_indexer(po_ids.astype(str))
+        found = positions >= 0
+        if not found.any() and all(column in reasons_df.columns for column in APPROVAL_COLUMNS):
+            return reasons_df
+
+        # Empty comments read back as missing, the same as they did from the CSV
+        updates = {
+            "admin_approved": (False, approvals['approved'].to_numpy(dtype=bool)),
+            "admin_comments": ("", approvals['comments'].replace('', None).to_numpy(dtype=object)),
+            "admin_username": ("", approvals['username'].replace('', None).to_numpy(dtype=object)),
+        }
+        columns = {}
+        for column, (default, values) in updates.items():
+            if column in reasons_df.columns:
+                current = reasons_df[column].to_numpy(dtype=object, copy=True)
+            else:
+                current = np.full(len(reasons_df), default, dtype=object)
+            current[found] = values[positions[found]]
+            dtype = reasons_df[column].dtype if column in reasons_df.columns else type(default)
+            columns[column] = pd.Series(current, index=reasons_df.index).astype(dtype)
+        return reasons_df.assign(**columns)
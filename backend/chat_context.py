@@ -0,0 +1,200 @@
+# Cached validation summary used as the chat system-prompt context
+import hashlib
+import json
+import threading
+import time
+
+import pandas as pd
+
+from backend.analytics_snapshot import REASON_BUCKETS_FILE, read_reason_buckets
+from backend.document_store import file_signature
+
+
+def render_validation_context(df: pd.DataFrame, reason_buckets: dict) -> str:
+    """Render the validation results summary that is embedded in every chat prompt"""
+    # Create a summary instead of loading all rows
+    total_pos = len(df)
+    match_count = len(df[df['Match/Not'] == True])
+    mismatch_count = len(df[df['Match/Not'] == False])
+
+    # Get discrepancy reasons frequency
+    mismatches_df = df[df['Match/Not'] == False]
+    # As object values: a categorical column would also count reasons with no mismatches,
+    # and order ties by category rather than by first appearance
+    reason_counts = mismatches_df['stated_reason'].astype(object).value_counts().to_dict()
+
+    # Format reason frequency with bucket classification
+    reason_text = "\n".join([
+        f"  • {reason}: {count} occurrences"
+        for reason, count in sorted(reason_counts.items(), key=lambda x: x[1], reverse=True)
+    ])
+
+    # Get sample mismatches
+    samples = mismatches_df.head(10)
+    sample_text = "\n".join([
+        f"  • {po_id}: {reason} - {comment}"
+        for po_id, reason, comment in zip(samples['PO_ID'], samples['stated_reason'], samples['Comments'])
+    ])
+
+    return f"""Validation Results Summary:
+Total Purchase Orders: {total_pos}
+Valid Records: {match_count}
+Discrepancies Found: {mismatch_count}
+Recovery Rate: {(match_count/total_pos*100):.1f}%
+
+Discrepancy Reasons (Frequency Distribution):
+{reason_text}
+
+Sample Discrepancy Records:
+{sample_text}
+
+Data Context:
+- Total unique reasons found: {len(reason_counts)}
+- Most common reason: {max(reason_counts.items(), key=lambda x: x[1])[0] if reason_counts else 'N/A'}
+- Percentage of discrepancies: {(mismatch_count/total_pos*100):.1f}%
+
+Available Reason Categories:
+{json.dumps(reason_buckets, indent=2)}
+
+You can answer questions about:
+- Frequency of specific discrepancy reasons
+- Which POs have specific issues
+- Statistics about different discrepancy types
+- Recovery opportunities by reason type
+- ASN/GRN mismatches
+- Overall reconciliation metrics"""
+
+
+def render_summary_context(df: pd.DataFrame, reason_buckets: dict) -> str:
+    """
+    Headline numbers only, for prompts that carry retrieved records.
+
+    PO-level detail comes from the retrieval stage, so the sample rows and
+    the full bucket JSON are replaced by the top reasons and category names.
+    """
+    total_pos = len(df)
+    match_count = int((df['Match/Not'] == True).sum())
+    mismatch_count = int((df['Match/Not'] == False).sum())
+    top_reasons = df.loc[df['Match/Not'] == False, 'stated_reason'].astype(object).value_counts().head(5)
+    reason_text = "\n".join(f"  • {reason}: {count} occurrences" for reason, count in top_reasons.items())
+    recovery_rate = match_count / total_pos * 100 if total_pos else 0.0
+
+    return f"""Validation Results Summary:
+Total Purchase Orders: {total_pos}
+Valid Records: {match_count}
+Discrepancies Found: {mismatch_count}
+Recovery Rate: {recovery_rate:.1f}%
+
+Most Frequent Discrepancy Reasons:
+{reason_text}
+
+Reason Categories: {", ".join(sorted(set(reason_buckets.values())))}"""
+
+
+def _content_hash(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class ValidationContextCache:
+    """
+    Keeps the rendered validation context until its inputs change.
+
+    Each call costs two os.stat calls. Only when the validation results or
+    reason_buckets.json signature moves are the files hashed, and only when
+    the content hash differs is the context re-rendered, so a touched but
+    unchanged file does not trigger a rebuild.
+    """
+
+    def __init__(self, documents, buckets_path: str = REASON_BUCKETS_FILE, renderer=render_validation_context):
+        self.documents = documents
+        self.buckets_path = buckets_path
+        self.renderer = renderer
+        self._lock = threading.Lock()
+        self._signatures = None
+        self._version = None
+        self._context = None
+        self._probed = (None, None)  # (signatures, version) seen by `version` alone
+        self.hits = 0
+        self.rebuilds = 0
+        self.last_rebuild_ms = 0.0
+        self.total_rebuild_ms = 0.0
+
+    def _current_signatures(self):
+        return (file_signature(self.documents.path("validation")), file_signature(self.buckets_path))
+
+    def _input_version(self) -> str:
+        """Content hash over the validation results and reason buckets files"""
+        digest = hashlib.sha256()
+        for path in (self.documents.path("validation"), self.buckets_path):
+            digest.update(_content_hash(path).encode() if file_signature(path) else b'missing')
+        return digest.hexdigest()
+
+    @property
+    def version(self) -> str:
+        """
+        Content hash of the current inputs, the version get() would return
+        the context for. Neither renders the context nor counts as a lookup.
+        """
+        signatures = self._current_signatures()
+        if signatures[0] is None:
+            return "missing"  # No validation results: chat answers from its fallback context
+        if self._context is not None and signatures == self._signatures:
+            return self._version
+        with self._lock:
+            probed_signatures, version = self._probed
+            if signatures != probed_signatures:
+                version = self._input_version()
+                self._probed = (signatures, version)
+            return version
+
+    def get(self) -> str:
+        signatures = self._current_signatures()
+        if self._context is not None and signatures == self._signatures:
+            self.hits += 1
+            return self._context
+
+        with self._lock:
+            if self._context is not None and signatures == self._signatures:
+                self.hits += 1
+                return self._context
+
+            version = self._input_version()
+            if self._context is not None and version == self._version:
+                self._signatures = signatures
+                self.hits += 1
+                return self._context
+
+            start = time.perf_counter()
+            df = self.documents.get("validation")
+            if df is None:
+                raise FileNotFoundError(self.documents.path("validation"))
+            context = self.renderer(df, read_reason_buckets(self.buckets_path))
+            elapsed_ms = (time.perf_counter() - start) * 1000
+
+            self._context, self._version, self._signatures = context, version, signatures
+            self.rebuilds += 1
+            self.last_rebuild_ms = elapsed_ms
+            self.total_rebuild_ms += elapsed_ms
+            print(f"[CHAT] Validation context rebuilt in {elapsed_ms:.1f}ms (version {version[:12]})")
+            return context
+
+    def invalidate(self):
+        """Force the next get() to re-check the input content hash"""
+        with self._lock:
+            self._signatures = None
+            self._probed = (None, None)
+
+    def stats(self) -> dict:
+        requests = self.hits + self.rebuilds
+        return {
+            "version": self._version,
+            "hits": self.hits,
+            "rebuilds": self.rebuilds,
+            "hit_rate": round(self.hits / requests, 4) if requests else 0.0,
+            "last_rebuild_ms": round(self.last_rebuild_ms, 2),
+            "avg_rebuild_ms": round(self.total_rebuild_ms / self.rebuilds, 2) if self.rebuilds else 0.0,
+        }
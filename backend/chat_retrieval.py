@@ -0,0 +1,333 @@
+# Retrieval of PO-level records for chat prompts from the local Chroma collection
+import hashlib
+import os
+import re
+import sys
+import threading
+import time
+import zlib
+
+import numpy as np
+import pandas as pd
+
+from backend.document_store import BACKEND_DIR, UPLOADS_DIR, file_signature
+
+try:
+    import chromadb
+    from chromadb.api.types import EmbeddingFunction
+    from chromadb.utils.embedding_functions import register_embedding_function
+except ImportError:  # chat falls back to the fixed validation summary
+    chromadb = None
+    EmbeddingFunction = object
+    register_embedding_function = lambda cls: cls
+
+CHROMA_DIR = os.path.join(BACKEND_DIR, "chroma_db")
+COLLECTION_NAME = "reconciliation_records"
+BUSINESS_DOCS_FILE = os.path.join(UPLOADS_DIR, "business_docs.md")
+
+# Documents whose rows are indexed, in the order they are rendered
+INDEXED_DOCUMENTS = ("validation", "reasons", "penalties")
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9_]+")
+PO_ID_PATTERN = re.compile(r"\bPO[-_ ]?\d+\b", re.IGNORECASE)
+
+
+@register_embedding_function
+class HashingEmbeddingFunction(EmbeddingFunction):
+    """
+    Offline embedding: unigrams and bigrams feature-hashed into `dimension`
+    signed buckets, L2-normalized.
+
+    No model download and fully deterministic, so the index can be built and
+    queried without network access. It captures lexical overlap only, which
+    is what PO ids, reason phrases and rule names need.
+    """
+
+    def __init__(self, dimension: int = 512):
+        self.dimension = dimension
+
+    def embed_text(self, text: str) -> np.ndarray:
+        vector = np.zeros(self.dimension, dtype=np.float32)
+        tokens = TOKEN_PATTERN.findall(text.lower())
+        features = tokens + [f"{a} {b}" for a, b in zip(tokens, tokens[1:])]
+        for feature in features:
+            h = zlib.crc32(feature.encode())
+            vector[h % self.dimension] += 1.0 if (h >> 31) & 1 else -1.0
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def __call__(self, input):
+        return [self.embed_text(text) for text in input]
+
+    @staticmethod
+    def name() -> str:
+        return "reconciliation_hashing"
+
+    def default_space(self):
+        return "cosine"
+
+    def get_config(self) -> dict:
+        return {"dimension": self.dimension}
+
+    @staticmethod
+    def build_from_config(config: dict) -> "HashingEmbeddingFunction":
+        return HashingEmbeddingFunction(dimension=config.get("dimension", 512))
+
+
+def _text(value) -> str:
+    if pd.isna(value):
+        return ""
+    if isinstance(value, pd.Timestamp) and value == value.normalize():
+        return value.strftime('%Y-%m-%d')
+    return str(value)
+
+
+def _occurrence_ids(prefix: str, po_ids: pd.Series) -> list:
+    """Stable ids for rows keyed by PO_ID, numbering repeated POs in file order"""
+    occurrence = po_ids.groupby(po_ids, sort=False).cumcount()
+    return [f"{prefix}:{po}:{n}" for po, n in zip(po_ids, occurrence)]
+
+
+def validation_records(df: pd.DataFrame):
+    po_ids = df['PO_ID'].astype(str)
+    for record_id, po, reason, match, comment in zip(
+        _occurrence_ids("validation", po_ids), po_ids, df['stated_reason'], df['Match/Not'], df['Comments']
+    ):
+        verdict = "valid" if match is True or str(match) == "True" else "discrepancy"
+        yield record_id, (
+            f"{po} validation result: stated reason '{_text(reason)}' is {verdict}. {_text(comment)}"
+        ), {"source": "validation", "po_id": po}
+
+
+def reason_records(df: pd.DataFrame):
+    po_ids = df['PO_ID'].astype(str)
+    for record_id, po, reason, penalty, approved, comments in zip(
+        _occurrence_ids("reason", po_ids), po_ids, df['reason'], df['penalty'],
+        df.get('admin_approved', pd.Series([""] * len(df))),
+        df.get('admin_comments', pd.Series([""] * len(df))),
+    ):
+        yield record_id, (
+            f"{po} supplier reason: '{_text(reason)}', penalty {_text(penalty)}, "
+            f"admin approved: {_text(approved) or 'False'}. Admin comments: {_text(comments) or 'none'}"
+        ), {"source": "reasons", "po_id": po}
+
+
+def penalty_records(df: pd.DataFrame):
+    for penalty_id, po, reason, amount, date in zip(
+        df['Penalty_ID'], df['PO_ID'].astype(str), df['Reason'], df['Penalty_Amount'], df['Penalty_Date']
+    ):
+        yield f"penalty:{penalty_id}", (
+            f"Penalty {penalty_id} for {po}: {_text(reason)}, amount {_text(amount)}, dated {_text(date)}"
+        ), {"source": "penalties", "po_id": po}
+
+
+def business_doc_records(path: str):
+    """One record per '## ' section of the business rules document"""
+    if not os.path.exists(path):
+        return
+    with open(path, encoding='utf-8') as f:
+        sections = re.split(r"(?m)^(?=## )", f.read())
+    for i, section in enumerate(s.strip() for s in sections):
+        if section:
+            yield f"business_docs:{i}", section, {"source": "business_docs", "po_id": ""}
+
+
+RECORD_BUILDERS = {
+    "validation": validation_records,
+    "reasons": reason_records,
+    "penalties": penalty_records,
+}
+
+
+def _digest(text: str) -> str:
+    return hashlib.sha1(text.encode('utf-8')).hexdigest()
+
+
+class RetrievalIndex:
+    """
+    Chroma collection of validation results, reasons, penalties and the
+    business rules document, one record per row or section.
+
+    Every record carries the hash of its text. sync() compares those hashes
+    with the current files and only upserts (re-embeds) new or changed
+    records and deletes vanished ones; when no source file has changed
+    since the last sync it does nothing at all.
+    """
+
+    def __init__(self, documents, path: str = CHROMA_DIR, docs_path: str = BUSINESS_DOCS_FILE):
+        self.documents = documents
+        self.path = path
+        self.docs_path = docs_path
+        self.embedding_function = HashingEmbeddingFunction()
+        self._client = None
+        self._collection = None
+        self._hashes = None
+        self._signatures = None
+        self._lock = threading.Lock()
+        self._schedule_lock = threading.Lock()
+        self._worker = None
+        self._pending = False
+        self.last_sync = {}
+
+    @property
+    def available(self) -> bool:
+        return chromadb is not None
+
+    def _get_collection(self):
+        if self._collection is None:
+            self._client = chromadb.PersistentClient(path=self.path)
+            self._collection = self._client.get_or_create_collection(
+                COLLECTION_NAME,
+                embedding_function=self.embedding_function,
+                metadata={"hnsw:space": "cosine"},
+            )
+        return self._collection
+
+    def _indexed_hashes(self, collection) -> dict:
+        """id -> text hash of everything already in the collection"""
+        hashes, offset, page = {}, 0, 5000
+        while True:
+            batch = collection.get(include=["metadatas"], limit=page, offset=offset)
+            hashes.update((i, meta.get("hash")) for i, meta in zip(batch["ids"], batch["metadatas"]))
+            if len(batch["ids"]) < page:
+                return hashes
+            offset += page
+
+    def _source_signatures(self):
+        return tuple(self.documents.source_signature(name) for name in INDEXED_DOCUMENTS) + (
+            file_signature(self.docs_path),
+        )
+
+    def _records(self):
+        for name in INDEXED_DOCUMENTS:
+            df = self.documents.get(name)
+            if df is not None:
+                yield from RECORD_BUILDERS[name](df)
+        yield from business_doc_records(self.docs_path)
+
+    def sync(self) -> dict:
+        """Bring the collection in line with the source files, embedding only what changed"""
+        if not self.available:
+            return {"status": "unavailable"}
+        with self._lock:
+            signatures = self._source_signatures()
+            if signatures == self._signatures:
+                return {"status": "unchanged"}
+
+            start = time.perf_counter()
+            collection = self._get_collection()
+            if self._hashes is None:
+                self._hashes = self._indexed_hashes(collection)
+
+            current = {}
+            changed_ids, changed_texts, changed_metas = [], [], []
+            for record_id, text, metadata in self._records():
+                digest = _digest(text)
+                current[record_id] = digest
+                if self._hashes.get(record_id) != digest:
+                    changed_ids.append(record_id)
+                    changed_texts.append(text)
+                    changed_metas.append(dict(metadata, hash=digest))
+            removed = [record_id for record_id in self._hashes if record_id not in current]
+
+            batch = self._client.get_max_batch_size()
+            for i in range(0, len(changed_ids), batch):
+                collection.upsert(
+                    ids=changed_ids[i:i + batch],
+                    documents=changed_texts[i:i + batch],
+                    metadatas=changed_metas[i:i + batch],
+                )
+            for i in range(0, len(removed), batch):
+                collection.delete(ids=removed[i:i + batch])
+
+            self._hashes = current
+            self._signatures = signatures
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            self.last_sync = {
+                "records": len(current),
+                "embedded": len(changed_ids),
+                "removed": len(removed),
+                "ms": round(elapsed_ms, 1),
+            }
+            print(f"[RAG] Index synced: {len(changed_ids)} embedded, {len(removed)} removed, "
+                  f"{len(current)} total in {elapsed_ms:.0f}ms")
+            return dict(self.last_sync, status="synced")
+
+    def _sync_worker(self):
+        while True:
+            try:
+                self.sync()
+            except Exception as e:
+                print(f"[RAG] Index sync failed: {e}")
+            with self._schedule_lock:
+                if not self._pending:
+                    self._worker = None
+                    return
+                self._pending = False
+
+    def schedule_sync(self):
+        """Sync in a background thread; requests made while one runs coalesce into one rerun"""
+        if not self.available:
+            return
+        with self._schedule_lock:
+            if self._worker is not None:
+                self._pending = True
+                return
+            self._worker = threading.Thread(target=self._sync_worker, name="rag-sync", daemon=True)
+            self._worker.start()
+
+    def search(self, question: str, k: int = 8) -> list:
+        """
+        Top-k records for a question as (source, text) pairs.
+
+        Records of POs named in the question come first, looked up by
+        metadata rather than similarity, followed by the nearest neighbours.
+        Never more than k in all, however many POs the question names.
+        """
+        if not self.available:
+            return []
+        collection = self._get_collection()
+        if collection.count() == 0:
+            return []
+
+        results, seen = [], set()
+        po_ids = sorted({re.sub(r"[-_ ]", "", m).upper() for m in PO_ID_PATTERN.findall(question)})
+        if po_ids:
+            exact = collection.get(where={"po_id": {"$in": po_ids}}, limit=k, include=["documents", "metadatas"])
+            for record_id, text, meta in zip(exact["ids"], exact["documents"], exact["metadatas"]):
+                seen.add(record_id)
+                results.append((meta["source"], text))
+
+        remaining = k - len(results)
+        if remaining > 0:
+            nearest = collection.query(
+                query_texts=[question], n_results=min(remaining + len(seen), collection.count()),
+                include=["documents", "metadatas"],
+            )
+            for record_id, text, meta in zip(nearest["ids"][0], nearest["documents"][0], nearest["metadatas"][0]):
+                if record_id not in seen and len(results) < k:
+                    seen.add(record_id)
+                    results.append((meta["source"], text))
+        return results
+
+    def render(self, question: str, k: int = 8) -> str:
+        """Retrieved records formatted for the chat prompt"""
+        return "\n".join(f"  • [{source}] {text}" for source, text in self.search(question, k))
+
+    def stats(self) -> dict:
+        return {
+            "available": self.available,
+            "indexed_records": len(self._hashes) if self._hashes is not None else None,
+            "syncing": self._worker is not None,
+            "last_sync": self.last_sync,
+        }
+
+
+if __name__ == "__main__":
+    # python -m backend.chat_retrieval [question]
+    from backend.document_store import DocumentStore
+
+    index = RetrievalIndex(DocumentStore())
+    print(index.sync())
+    if len(sys.argv) > 1:
+        print(index.render(" ".join(sys.argv[1:])))
@@ -0,0 +1,120 @@
+# Append-only chat history backed by SQLite in WAL mode
+import csv
+import os
+import sqlite3
+import sys
+import threading
+from datetime import datetime
+
+
+class ChatHistoryStore:
+    """
+    Chat turns stored one row per message pair.
+
+    Appends are single-row INSERTs and per-session reads walk the
+    (session_id, timestamp) index, so neither depends on how much history
+    other sessions have. WAL mode lets readers proceed during a write and
+    serializes concurrent writers instead of losing their rows.
+    """
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        self._local = threading.local()
+        self._init_schema()
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _init_schema(self):
+        conn = self._connection()
+        conn.execute("""
+        CREATE TABLE IF NOT EXISTS chat_messages (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            session_id TEXT NOT NULL,
+            user_message TEXT,
+            assistant_message TEXT,
+            timestamp TEXT NOT NULL
+        )
+        """)
+        conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_chat_messages_session ON chat_messages (session_id, timestamp)"
+        )
+        conn.execute("CREATE TABLE IF NOT EXISTS chat_meta (key TEXT PRIMARY KEY, value TEXT)")
+        conn.commit()
+
+    def append(self, session_id: str, user_message: str, assistant_message: str, timestamp: str = None) -> str:
+        """Append one chat turn and return its timestamp"""
+        timestamp = timestamp or datetime.utcnow().isoformat()
+        conn = self._connection()
+        with conn:
+            conn.execute(
+                "INSERT INTO chat_messages (session_id, user_message, assistant_message, timestamp) VALUES (?, ?, ?, ?)",
+                (session_id, user_message, assistant_message, timestamp)
+            )
+        return timestamp
+
+    def history(self, session_id: str) -> list:
+        """All turns of a session, oldest first"""
+        rows = self._connection().execute(
+            "SELECT session_id, user_message, assistant_message, timestamp FROM chat_messages "
+            "WHERE session_id = ? ORDER BY timestamp, id",
+            (session_id,)
+        ).fetchall()
+        return [dict(row) for row in rows]
+
+    def recent(self, session_id: str, limit: int) -> list:
+        """Last `limit` turns of a session, oldest first"""
+        rows = self._connection().execute(
+            "SELECT session_id, user_message, assistant_message, timestamp FROM chat_messages "
+            "WHERE session_id = ? ORDER BY timestamp DESC, id DESC LIMIT ?",
+            (session_id, limit)
+        ).fetchall()
+        return [dict(row) for row in reversed(rows)]
+
+    def migrate_from_csv(self, csv_path: str) -> int:
+        """
+        One-shot import of a legacy chat_history.csv.
+
+        The import is recorded in chat_meta, so calling this again for the
+        same file is a no-op. Returns the number of imported turns.
+        """
+        if not os.path.exists(csv_path):
+            return 0
+        marker = f"migrated:{os.path.abspath(csv_path)}"
+        conn = self._connection()
+        if conn.execute("SELECT 1 FROM chat_meta WHERE key = ?", (marker,)).fetchone():
+            return 0
+
+        with open(csv_path, newline='', encoding='utf-8') as f:
+            rows = [
+                (row['session_id'], row.get('user_message'), row.get('assistant_message'),
+                 row.get('timestamp') or datetime.utcnow().isoformat())
+                for row in csv.DictReader(f)
+                if row.get('session_id')
+            ]
+        with conn:
+            conn.executemany(
+                "INSERT INTO chat_messages (session_id, user_message, assistant_message, timestamp) VALUES (?, ?, ?, ?)",
+                rows
+            )
+            conn.execute(
+                "INSERT INTO chat_meta (key, value) VALUES (?, ?)",
+                (marker, datetime.utcnow().isoformat())
+            )
+        print(f"[CHAT] Migrated {len(rows)} chat turns from {csv_path}")
+        return len(rows)
+
+
+if __name__ == "__main__":
+    # python -m backend.chat_store <chat_history.csv> <chat_history.db>
+    if len(sys.argv) != 3:
+        print("usage: python -m backend.chat_store <chat_history.csv> <chat_history.db>")
+        sys.exit(1)
+    ChatHistoryStore(sys.argv[2]).migrate_from_csv(sys.argv[1])
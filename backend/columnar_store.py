@@ -0,0 +1,138 @@
+# Columnar (Arrow IPC) copies of the CSV documents, read memory-mapped
+#
+# CSV stays the import/export format and the source of truth. The first
+# load of a CSV parses it once with explicit column types and writes an
+# uncompressed Arrow IPC file next to it; later loads (in the API or in a
+# job worker) memory-map that file and convert only the requested columns.
+import os
+import uuid
+
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.ipc
+except ImportError:  # every load parses the CSV
+    pa = None
+
+FORMAT_VERSION = "2"
+COLUMNAR_DIRNAME = ".columnar"
+
+# Column types applied on ingest, per logical document:
+#   id        categorical, so every table joins on integer codes
+#   category  categorical, for low-cardinality text
+#   date      datetime64 (NaT when missing or unparseable)
+#   int       nullable Int64
+#   float     float64
+#   str       free text
+# Unlisted columns keep pandas' inference.
+SCHEMAS = {
+    "pos": {"PO_ID": "id", "Vendor_ID": "category", "Item_ID": "category", "Quantity": "int",
+            "Unit_Price": "float", "PO_Date": "date", "Delivery_Date": "date"},
+    "asns": {"PO_ID": "id", "ASN_ID": "id", "Shipment_Date": "date", "Carrier": "category",
+             "Quantity_Shipped": "int"},
+    "grns": {"PO_ID": "id", "GRN_ID": "id", "Item_ID": "category", "Received_Date": "date",
+             "Quantity_Received": "int", "Warehouse": "category"},
+    "invoices": {"PO_ID": "id", "Invoice_ID": "id", "Invoice_Date": "date", "Invoice_Amount": "float",
+                 "Currency": "category"},
+    "payments": {"PO_ID": "id", "Payment_ID": "id", "Payment_Date": "date", "Amount_Paid": "float",
+                 "Payment_Mode": "category"},
+    # Approval columns are rewritten with arbitrary values, so they stay text
+    "reasons": {"PO_ID": "id", "reason": "category", "penalty": "float", "admin_comments": "str",
+                "admin_username": "str"},
+    "penalties": {"Penalty_ID": "id", "PO_ID": "id", "Reason": "category", "Penalty_Amount": "float",
+                  "Penalty_Date": "date"},
+    "validation": {"PO_ID": "id", "stated_reason": "category", "Comments": "str"},
+}
+
+_CSV_DTYPES = {"id": "category", "category": "category", "str": "str", "date": "str"}
+
+
+def columnar_path(path: str) -> str:
+    """Arrow copy of a CSV file, kept in a hidden directory beside it"""
+    directory, filename = os.path.split(path)
+    return os.path.join(directory, COLUMNAR_DIRNAME, f"{os.path.splitext(filename)[0]}.arrow")
+
+
+def _stamp(path: str) -> bytes:
+    stat = os.stat(path)
+    return f"{FORMAT_VERSION}:{stat.st_mtime_ns}:{stat.st_size}".encode()
+
+
+def parse_dates(values) -> pd.Series:
+    """
+    Dates as datetime64. ISO dates take the fast path; anything else is
+    parsed value by value, and what still fails becomes NaT.
+    """
+    values = pd.Series(values)
+    if pd.api.types.is_datetime64_any_dtype(values):
+        return values
+    parsed = pd.to_datetime(values, format="ISO8601", errors='coerce')
+    retry = parsed.isna() & values.notna() & (values.astype(str).str.strip() != '')
+    if retry.any():
+        parsed[retry] = pd.to_datetime(values[retry], format="mixed", errors='coerce')
+    return parsed
+
+
+def read_csv(name: str, path: str, columns=None) -> pd.DataFrame:
+    """Parse a CSV with the document's explicit column types"""
+    schema = SCHEMAS.get(name, {})
+    usecols = (lambda column: column in columns) if columns is not None else None
+    dtypes = {column: _CSV_DTYPES[kind] for column, kind in schema.items() if kind in _CSV_DTYPES}
+    frame = pd.read_csv(path, usecols=usecols, dtype=dtypes)
+    for column, kind in schema.items():
+        if column not in frame.columns:
+            continue
+        if kind == "date":
+            frame[column] = parse_dates(frame[column])
+        elif kind == "int":
+            frame[column] = pd.to_numeric(frame[column], errors='coerce').round().astype("Int64")
+        elif kind == "float":
+            frame[column] = pd.to_numeric(frame[column], errors='coerce').astype("float64")
+    return frame
+
+
+def convert(name: str, path: str) -> str:
+    """Write the Arrow copy of a CSV file and return its path"""
+    target = columnar_path(path)
+    stamp = _stamp(path)
+    table = pa.Table.from_pandas(read_csv(name, path), preserve_index=False)
+    table = table.replace_schema_metadata({**(table.schema.metadata or {}), b"source": stamp})
+
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    # Unique per call: threads of one process may convert the same CSV at once
+    tmp_path = f"{target}.{uuid.uuid4().hex[:12]}.tmp"
+    with pa.OSFile(tmp_path, 'wb') as sink, pa.ipc.new_file(sink, table.schema) as writer:
+        writer.write_table(table)
+    os.replace(tmp_path, target)
+    print(f"[STORE] Converted {name} ({table.num_rows} rows) to {target}")
+    return target
+
+
+def _open(name: str, path: str):
+    """Memory-mapped Arrow table for a CSV, converting it first if the copy is missing or stale"""
+    target = columnar_path(path)
+    stamp = _stamp(path)
+    if os.path.exists(target):
+        table = pa.ipc.open_file(pa.memory_map(target)).read_all()
+        if (table.schema.metadata or {}).get(b"source") == stamp:
+            return table
+    convert(name, path)
+    return pa.ipc.open_file(pa.memory_map(target)).read_all()
+
+
+def load_document(name: str, path: str, columns=None) -> pd.DataFrame:
+    """
+    A document as a DataFrame, limited to `columns` (those that exist) when
+    given. Reads the Arrow copy when pyarrow is available and falls back to
+    parsing the CSV otherwise or if the copy can't be written.
+    """
+    if pa is not None:
+        try:
+            table = _open(name, path)
+            if columns is not None:
+                table = table.select([column for column in columns if column in table.column_names])
+            return table.to_pandas()
+        except (OSError, pa.ArrowException) as e:
+            print(f"[STORE] Columnar read of {name} failed, parsing CSV: {e}")
+    return read_csv(name, path, columns)
@@ -0,0 +1,164 @@
+# Shared in-memory store for the reconciliation CSV files
+import os
+import threading
+from dataclasses import dataclass, field
+
+import pandas as pd
+
+from backend.columnar_store import load_document
+from backend.metrics import STAGE_SECONDS
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+UPLOADS_DIR = os.path.join(os.path.dirname(BACKEND_DIR), "uploads")
+
+# Logical document name -> file the endpoints read it from
+DEFAULT_SOURCES = {
+    "pos": os.path.join(UPLOADS_DIR, "pos.csv"),
+    "asns": os.path.join(UPLOADS_DIR, "asns.csv"),
+    "grns": os.path.join(UPLOADS_DIR, "grns.csv"),
+    "invoices": os.path.join(UPLOADS_DIR, "invoices.csv"),
+    "payments": os.path.join(UPLOADS_DIR, "payments.csv"),
+    "reasons": os.path.join(UPLOADS_DIR, "reasons.csv"),
+    "penalties": os.path.join(UPLOADS_DIR, "penalties.csv"),
+    "validation": os.path.join(BACKEND_DIR, "final_reason_validation_results.csv"),
+    "merged": os.path.join(BACKEND_DIR, "merged.csv"),
+    # SQLite, not a CSV: the approval store overlaid on reasons (see approval_store)
+    "approvals": os.path.join(BACKEND_DIR, "approvals.db"),
+}
+
+
+def file_signature(path: str):
+    """(mtime_ns, size) of a file, or None when it does not exist"""
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return (stat.st_mtime_ns, stat.st_size)
+
+
+@dataclass
+class _Entry:
+    signature: tuple
+    frame: pd.DataFrame
+    po_index: dict = field(default=None)
+    derived: dict = field(default_factory=dict)
+    # The frame as read from the file, before any overlay
+    base: pd.DataFrame = None
+    base_signature: tuple = None
+
+
+class DocumentStore:
+    """
+    Loads each CSV once (through its memory-mapped Arrow copy when pyarrow
+    is installed) and keeps it in memory until the file changes.
+
+    A file is re-read only when its mtime or size differs from the cached
+    copy, so polling endpoints pay one os.stat per request instead of a
+    full parse. Frames are shared between requests: treat them as
+    read-only and .copy() before mutating.
+
+    `overlays` maps a document to an object with version() and
+    apply(frame); its frame is apply()'d to the file contents and rebuilt
+    (without re-reading the file) whenever version() changes.
+    """
+
+    def __init__(self, sources: dict = None, overlays: dict = None):
+        self.sources = dict(sources or DEFAULT_SOURCES)
+        self.overlays = dict(overlays or {})
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def _entry(self, name: str) -> _Entry:
+        path = self.sources[name]
+        signature = self.source_signature(name)
+        entry = self._entries.get(name)
+        if entry is not None and entry.signature == signature:
+            return entry
+
+        with self._lock:
+            entry = self._entries.get(name)
+            if entry is None or entry.signature != signature:
+                overlay = self.overlays.get(name)
+                base_signature = signature if overlay is None else signature[0]
+                if entry is not None and entry.base_signature == base_signature:
+                    base = entry.base
+                else:
+                    base = None
+                    if base_signature is not None:
+                        with STAGE_SECONDS.time("csv_load"):
+                            base = load_document(name, path)
+                    if base is not None:
+                        print(f"[STORE] Loaded {name} ({len(base)} rows) from {path}")
+                frame = overlay.apply(base) if overlay is not None and base is not None else base
+                entry = _Entry(signature=signature, frame=frame, base=base, base_signature=base_signature)
+                self._entries[name] = entry
+        return entry
+
+    def path(self, name: str) -> str:
+        return self.sources[name]
+
+    def source_signature(self, name: str):
+        """
+        Current signature of a document's file, paired with its overlay's
+        version if it has one. Cheap, and loads nothing.
+        """
+        signature = file_signature(self.sources[name])
+        overlay = self.overlays.get(name)
+        return signature if overlay is None else (signature, overlay.version())
+
+    def signature(self, name: str):
+        """Signature of the cached copy of a document"""
+        return self._entry(name).signature
+
+    def exists(self, name: str) -> bool:
+        return self._entry(name).frame is not None
+
+    def get(self, name: str, default=None) -> pd.DataFrame:
+        """Cached frame for a document, or `default` when its file is missing"""
+        frame = self._entry(name).frame
+        return frame if frame is not None else default
+
+    def po_index(self, name: str) -> dict:
+        """PO_ID -> row positions for a document, built lazily once per file version"""
+        entry = self._entry(name)
+        if entry.frame is None:
+            return {}
+        if entry.po_index is None:
+            entry.po_index = entry.frame.groupby('PO_ID', sort=False).indices
+        return entry.po_index
+
+    def derived(self, name: str, key, build):
+        """
+        Value computed from a document's frame by `build(frame)`, cached until
+        the file changes. `key` distinguishes different derivations; include
+        the signatures of any other inputs `build` reads.
+        """
+        entry = self._entry(name)
+        if entry.frame is None:
+            return None
+        value = entry.derived.get(key)
+        if value is None:
+            with self._lock:
+                value = entry.derived.get(key)
+                if value is None:
+                    value = build(entry.frame)
+                    entry.derived[key] = value
+        return value
+
+    def rows_for_po(self, name: str, po_id: str) -> pd.DataFrame:
+        """All rows of a document for one PO_ID, via a hash lookup instead of a scan"""
+        frame = self.get(name)
+        if frame is None:
+            return None
+        positions = self.po_index(name).get(po_id)
+        if positions is None:
+            return frame.iloc[0:0]
+        return frame.iloc[positions]
+
+    def invalidate(self, name: str = None):
+        """Drop cached copies so the next access re-reads from disk"""
+        with self._lock:
+            if name is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(name, None)
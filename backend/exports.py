@@ -0,0 +1,54 @@
+# Streaming NDJSON / CSV exports of validation results, penalties and merged data
+import zlib
+
+import pandas as pd
+
+from backend.validation_engine import merge_penalties
+
+EXPORT_FORMATS = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv",
+}
+DEFAULT_CHUNK_ROWS = 10000
+
+
+def frame_chunks(frame: pd.DataFrame, chunk_rows: int = DEFAULT_CHUNK_ROWS):
+    for start in range(0, len(frame), chunk_rows):
+        yield frame.iloc[start:start + chunk_rows]
+
+
+def merged_chunks(reasons_df: pd.DataFrame, validation_df: pd.DataFrame, chunk_rows: int = DEFAULT_CHUNK_ROWS):
+    """merge_penalties() evaluated one chunk of reasons at a time"""
+    verdicts = validation_df[['PO_ID', 'Match/Not']]
+    for chunk in frame_chunks(reasons_df, chunk_rows):
+        yield merge_penalties(chunk, verdicts)
+
+
+def encode_chunks(chunks, fmt: str):
+    """
+    Serialize frame chunks as NDJSON lines or CSV (header once).
+    Only one encoded chunk is held at a time.
+    """
+    header = True
+    for chunk in chunks:
+        if fmt == "ndjson":
+            if len(chunk):
+                yield chunk.to_json(orient="records", lines=True).encode("utf-8")
+        else:
+            yield chunk.to_csv(index=False, header=header).encode("utf-8")
+            header = False
+
+
+def gzip_stream(pieces, level: int = 6):
+    """Gzip a byte stream incrementally"""
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+    for piece in pieces:
+        compressed = compressor.compress(piece)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
+
+
+def export_stream(chunks, fmt: str, gzip: bool = False):
+    stream = encode_chunks(chunks, fmt)
+    return gzip_stream(stream) if gzip else stream
@@ -0,0 +1,57 @@
+# Offline stand-in for the Gemini model, used when USE_FAKE_LLM is set
+import asyncio
+import os
+import time
+
+
+class FakeResponse:
+    def __init__(self, text: str):
+        self.text = text
+
+
+class FakeGenerativeModel:
+    """
+    Mimics the parts of genai.GenerativeModel the chat endpoints use.
+
+    Replies are deterministic and built from the user question, split into
+    word-sized chunks when streaming. `delay` (seconds per chunk, also read
+    from FAKE_LLM_DELAY) simulates generation latency.
+    """
+
+    def __init__(self, delay: float = None):
+        self.delay = float(os.getenv("FAKE_LLM_DELAY", "0")) if delay is None else delay
+
+    @staticmethod
+    def _reply(prompt: str) -> str:
+        question = prompt.rsplit("User Question:", 1)[-1].strip()
+        return f"This is a local test response to: {question}"
+
+    def _chunks(self, text: str):
+        words = text.split(" ")
+        for i, word in enumerate(words):
+            if self.delay:
+                time.sleep(self.delay)
+            yield FakeResponse(word if i == 0 else f" {word}")
+
+    async def _achunks(self, text: str):
+        words = text.split(" ")
+        for i, word in enumerate(words):
+            if self.delay:
+                await asyncio.sleep(self.delay)
+            yield FakeResponse(word if i == 0 else f" {word}")
+
+    def generate_content(self, prompt, stream: bool = False, **kwargs):
+        text = self._reply(prompt)
+        if stream:
+            return self._chunks(text)
+        if self.delay:
+            time.sleep(self.delay * len(text.split(" ")))
+        return FakeResponse(text)
+
+    async def generate_content_async(self, prompt, stream: bool = False, **kwargs):
+        text = self._reply(prompt)
+        if stream:
+            return self._achunks(text)
+        if self.delay:
+            await asyncio.sleep(self.delay * len(text.split(" ")))
+        return FakeResponse(text)
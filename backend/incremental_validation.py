@@ -0,0 +1,167 @@
+# Incremental re-validation: only POs whose inputs changed are re-evaluated
+import hashlib
+import os
+
+import numpy as np
+import pandas as pd
+
+from backend.parallel_validation import validate_sharded
+from backend.validation_engine import normalize_po_ids
+
+STATE_VERSION = 2
+DOCUMENT_TABLES = ("pos", "asns", "grns", "invoices")
+
+# Odd 64-bit constant used to spread occurrence numbers, plus one salt per table
+_GOLDEN = np.uint64(0x9E3779B97F4A7C15)
+_TABLE_SALTS = {name: np.uint64((i * 0x9E3779B97F4A7C15) & 0xFFFFFFFFFFFFFFFF)
+                for i, name in enumerate(DOCUMENT_TABLES, start=1)}
+
+
+def state_path_for(results_path: str) -> str:
+    """Fingerprint state kept next to the validation results it describes"""
+    return f"{os.path.splitext(results_path)[0]}.state.npz"
+
+
+def file_digest(path: str) -> str:
+    digest = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _group_digests(keys: np.ndarray, frame: pd.DataFrame):
+    """
+    (unique keys, one uint64 per key) combining every row of `frame` with
+    that key. Row order within a key matters, because validation reads the
+    first matching row.
+    """
+    codes, uniques = pd.factorize(keys)
+    valid = codes >= 0
+    if not valid.any():
+        return uniques, np.zeros(len(uniques), dtype=np.uint64)
+    codes = codes[valid]
+    row_hashes = pd.util.hash_pandas_object(frame, index=False).to_numpy()[valid]
+    occurrence = pd.Series(codes).groupby(codes).cumcount().to_numpy().astype(np.uint64)
+    mixed = pd.util.hash_array(row_hashes ^ (occurrence * _GOLDEN))
+
+    order = np.argsort(codes, kind="stable")
+    sorted_codes = codes[order]
+    starts = np.flatnonzero(np.r_[True, sorted_codes[1:] != sorted_codes[:-1]])
+    digests = np.zeros(len(uniques), dtype=np.uint64)
+    digests[sorted_codes[starts]] = np.bitwise_xor.reduceat(mixed[order], starts)
+    return uniques, digests
+
+
+def po_fingerprints(reasons_df: pd.DataFrame, po_ids: np.ndarray, documents: dict):
+    """
+    (PO keys, fingerprints) for every PO in reasons_df, covering its reason
+    rows and all of its PO, ASN, GRN and invoice rows.
+    """
+    keys, fingerprints = _group_digests(po_ids, reasons_df)
+    key_index = pd.Index(keys)
+    for name in DOCUMENT_TABLES:
+        df = documents[name]
+        table_digests = np.zeros(len(keys), dtype=np.uint64)
+        if not df.empty:
+            table_keys, digests = _group_digests(df['PO_ID'].to_numpy(dtype=object), df)
+            positions = pd.Index(table_keys).get_indexer(key_index)
+            found = positions >= 0
+            table_digests[found] = digests[positions[found]]
+        fingerprints = pd.util.hash_array(fingerprints ^ (table_digests + _TABLE_SALTS[name]))
+    return np.asarray(keys, dtype=object), fingerprints
+
+
+def load_state(state_path: str, results_path: str):
+    """Saved fingerprints, or None when missing or not describing the current results file"""
+    if not os.path.exists(state_path) or not os.path.exists(results_path):
+        return None
+    try:
+        with np.load(state_path, allow_pickle=False) as state:
+            if int(state["version"]) != STATE_VERSION or str(state["results_digest"]) != file_digest(results_path):
+                return None
+            return {"po_ids": state["po_ids"].astype(object), "fingerprints": state["fingerprints"]}
+    except Exception as e:
+        print(f"[VALIDATION] Ignoring unreadable fingerprint state: {e}")
+        return None
+
+
+def save_state(state_path: str, results_path: str, po_ids: np.ndarray, fingerprints: np.ndarray):
+    """Write the fingerprints for `results_path` (hashed as written) atomically"""
+    tmp_path = f"{state_path}.tmp.npz"
+    np.savez_compressed(
+        tmp_path,
+        version=STATE_VERSION,
+        results_digest=file_digest(results_path),
+        po_ids=po_ids.astype(str),
+        fingerprints=fingerprints,
+    )
+    os.replace(tmp_path, state_path)
+
+
+def validate_incremental(reasons_df, documents: dict, previous_df: pd.DataFrame = None, state: dict = None,
+                         workers: int = 1):
+    """
+    Validate reasons, re-evaluating only POs whose fingerprint differs from
+    `state` and copying the other rows from `previous_df` (the results that
+    state describes). Falls back to a full run when either is missing.
+    Whatever is recomputed is sharded across `workers` processes.
+
+    Returns (final_df, po_ids, fingerprints, stats).
+    """
+    po_ids = normalize_po_ids(reasons_df['PO_ID'])
+    keys, fingerprints = po_fingerprints(reasons_df, po_ids, documents)
+    stats = {"mode": "full", "pos_total": len(keys), "pos_recomputed": len(keys), "pos_skipped": 0, "pos_removed": 0,
+             "rows_recomputed": len(reasons_df)}
+
+    def full_run(reason):
+        print(f"[VALIDATION] Full run ({reason})")
+        final_df = validate_sharded(reasons_df, *(documents[name] for name in DOCUMENT_TABLES), workers=workers)
+        return final_df, keys, fingerprints, dict(stats, reason=reason)
+
+    if state is None or previous_df is None:
+        return full_run("no previous fingerprints")
+
+    previous = pd.Index(state["po_ids"]).get_indexer(keys)
+    changed = (previous < 0) | (state["fingerprints"][np.maximum(previous, 0)] != fingerprints)
+    removed = len(state["po_ids"]) - int((previous >= 0).sum())
+
+    # Unchanged POs have identical reason rows, so their previous result rows
+    # line up one to one by (PO_ID, occurrence)
+    row_codes = pd.Index(keys).get_indexer(po_ids)
+    row_changed = changed[row_codes]
+    occurrence = pd.Series(po_ids).groupby(po_ids).cumcount().to_numpy()
+    previous_ids = previous_df['PO_ID'].astype(str).to_numpy(dtype=object)
+    previous_occurrence = pd.Series(previous_ids).groupby(previous_ids).cumcount().to_numpy()
+    previous_rows = pd.MultiIndex.from_arrays([previous_ids, previous_occurrence]).get_indexer(
+        pd.MultiIndex.from_arrays([po_ids[~row_changed], occurrence[~row_changed]])
+    )
+    if (previous_rows < 0).any():
+        return full_run("previous results do not match their fingerprints")
+
+    changed_keys = keys[changed]
+    recomputed = validate_sharded(
+        reasons_df[row_changed],
+        *(documents[name][documents[name]['PO_ID'].isin(changed_keys)] if not documents[name].empty
+          else documents[name] for name in DOCUMENT_TABLES),
+        workers=workers,
+    )
+
+    columns = {}
+    for column in ("PO_ID", "stated_reason", "Match/Not", "Comments"):
+        values = np.empty(len(reasons_df), dtype=bool if column == "Match/Not" else object)
+        values[row_changed] = recomputed[column].to_numpy()
+        values[~row_changed] = previous_df[column].to_numpy()[previous_rows]
+        columns[column] = values
+    final_df = pd.DataFrame(columns)
+
+    stats.update(
+        mode="incremental",
+        pos_recomputed=int(changed.sum()),
+        pos_skipped=int((~changed).sum()),
+        pos_removed=removed,
+        rows_recomputed=int(row_changed.sum()),
+    )
+    print(f"[VALIDATION] Incremental run: {stats['pos_recomputed']} POs recomputed, "
+          f"{stats['pos_skipped']} skipped, {removed} removed")
+    return final_df, keys, fingerprints, stats
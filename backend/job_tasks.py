@@ -0,0 +1,138 @@
+# Job bodies executed in the worker processes of the job runner
+#
+# Workers only read their input files and write a temporary artifact next
+# to the final one; the parent process swaps it into place. Nothing here
+# touches the API's in-memory state.
+import os
+import time
+
+import pandas as pd
+
+from backend.approval_store import ApprovalStore
+from backend.incremental_validation import load_state, save_state, state_path_for, validate_incremental
+from backend.columnar_store import load_document
+from backend.validation_engine import VALIDATION_COLUMNS, merge_penalties, penalty_metrics, summarize_results
+
+
+def _report(progress, job_id: str, stage: str, fraction: float):
+    if progress is not None:
+        progress.put((job_id, stage, fraction))
+
+
+class _StageTimer:
+    """Seconds per stage of one task, returned as result["timings"] for the API process's metrics"""
+
+    def __init__(self):
+        self.timings = {}
+        self._stage, self._start = None, None
+
+    def start(self, stage: str):
+        now = time.perf_counter()
+        if self._stage is not None:
+            self.timings[self._stage] = self.timings.get(self._stage, 0.0) + now - self._start
+        self._stage, self._start = stage, now
+
+    def stop(self) -> dict:
+        self.start(None)
+        return self.timings
+
+
+def _read(sources: dict, name: str, default=None, columns=None) -> pd.DataFrame:
+    path = sources[name]
+    return load_document(name, path, columns) if os.path.exists(path) else default
+
+
+def run_validation_task(job_id: str, sources: dict, artifact_path: str, progress=None, full: bool = False,
+                        workers: int = 1) -> dict:
+    """
+    Validate reasons.csv against the supporting files into `artifact_path`.
+    Only POs whose inputs changed since the current results are re-evaluated
+    unless `full` is set; with workers > 1 they are sharded by PO_ID across
+    that many processes.
+    """
+    print(f"\n=== Starting Discrepancy Validation (job {job_id}) ===")
+    _report(progress, job_id, "loading", 0.1)
+    timer = _StageTimer()
+    timer.start("csv_load")
+    # Only the columns the rules read, so edits to other columns (approvals,
+    # carriers, ...) don't invalidate any PO fingerprints either
+    reasons_df = _read(sources, "reasons", columns=VALIDATION_COLUMNS["reasons"])
+    if reasons_df is None:
+        raise FileNotFoundError("Reasons file not found")
+    print(f"✓ Loaded {len(reasons_df)} records from reasons.csv")
+
+    documents = {
+        name: _read(sources, name, pd.DataFrame(), columns=VALIDATION_COLUMNS[name])
+        for name in ("pos", "asns", "grns", "invoices")
+    }
+    print("✓ Loaded supporting data files")
+
+    # Fingerprints describe the results currently in place; they are only
+    # trusted if that file is byte-identical to the one they were saved with
+    results_path = sources["validation"]
+    state = None if full else load_state(state_path_for(results_path), results_path)
+    previous_df = pd.read_csv(results_path, keep_default_na=False) if state is not None else None
+
+    _report(progress, job_id, "validating", 0.3)
+    timer.start("rule_evaluation")
+    final_df, po_ids, fingerprints, incremental = validate_incremental(
+        reasons_df, documents, previous_df, state, workers=workers
+    )
+    if full:
+        incremental["reason"] = "full run requested"
+    timer.start("aggregation")
+    summary_stats, reason_summary = summarize_results(final_df)
+
+    _report(progress, job_id, "writing", 0.8)
+    timer.start("serialization")
+    final_df.to_csv(artifact_path, index=False)
+    # Next to the temporary artifact; JobManager swaps both into place or discards both
+    save_state(state_path_for(artifact_path), artifact_path, po_ids, fingerprints)
+    timings = timer.stop()
+    print(f"  Total Validations: {summary_stats['total_validations']}")
+    print(f"  Valid Reasons (Match): {summary_stats['match_count']}")
+    print(f"  Invalid Reasons (Discrepancies): {summary_stats['mismatch_count']}")
+    print(f"  Match Rate: {summary_stats['match_rate']}%")
+    print(f"  POs recomputed: {incremental['pos_recomputed']}, skipped: {incremental['pos_skipped']}")
+    print("=== Discrepancy Validation Completed ===\n")
+    return {
+        "summary_stats": summary_stats,
+        "reason_summary": reason_summary,
+        "rows": len(final_df),
+        "incremental": incremental,
+        "timings": timings,
+    }
+
+
+def calculate_penalties_task(job_id: str, sources: dict, artifact_path: str, progress=None) -> dict:
+    """Join reasons with validation verdicts into `artifact_path` and compute penalty metrics"""
+    print(f"\n=== Calculating Penalties (job {job_id}) ===")
+    _report(progress, job_id, "loading", 0.1)
+    timer = _StageTimer()
+    timer.start("csv_load")
+    reasons_df = _read(sources, "reasons")
+    validation_df = _read(sources, "validation")
+    if reasons_df is None:
+        raise FileNotFoundError("Reasons file not found")
+    if validation_df is None:
+        raise FileNotFoundError("Validation results not found. Run validation first.")
+    if "approvals" in sources:
+        reasons_df = ApprovalStore(sources["approvals"]).apply(reasons_df)
+    print(f"✓ Loaded reasons.csv with {len(reasons_df)} records")
+    print(f"✓ Loaded validation results with {len(validation_df)} records")
+
+    _report(progress, job_id, "merging", 0.4)
+    timer.start("aggregation")
+    merged_df = merge_penalties(reasons_df, validation_df)
+    metrics = penalty_metrics(reasons_df, merged_df)
+
+    _report(progress, job_id, "writing", 0.8)
+    timer.start("serialization")
+    merged_df.to_csv(artifact_path)
+    timings = timer.stop()
+    print(f"  Merged records: {len(merged_df)}")
+    print(f"  Total Exposure: ${metrics['total_penalty_exposure']}")
+    print(f"  Recoverable: ${metrics['recoverable_amount']}")
+    print(f"  Recovery Rate: {metrics['recovery_rate']}%")
+    print("=== Penalties Calculation Completed ===\n")
+    return {"metrics": metrics, "timings": timings}
@@ -0,0 +1,270 @@
+# Background job runner for the validation and penalty computations
+import hashlib
+import multiprocessing
+import os
+import threading
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Callable
+
+from backend.document_store import file_signature
+from backend.metrics import STAGE_SECONDS
+from backend.profiling import ProfileStore, run_profiled
+
+ACTIVE_STATES = ("queued", "running")
+
+
+@dataclass
+class JobSpec:
+    """
+    A kind of job. `task(job_id, sources, artifact_path, progress, **params)`
+    runs in a worker process and writes `artifact_path`; `finalize(result)` runs in the
+    API process once that file has been swapped into place and may return an
+    extended result. A "timings" entry ({stage: seconds}) in the result is
+    recorded in the stage metrics and moved to Job.timings; a "profile"
+    entry (from a profiled run) is saved to the profile store.
+    `companion(path)`, if set, names a file the task writes next to the
+    artifact at `path`; it is swapped into place (or discarded) together
+    with the artifact.
+    """
+    kind: str
+    task: Callable
+    inputs: tuple
+    artifact: str
+    finalize: Callable = None
+    companion: Callable = None
+
+
+@dataclass
+class Job:
+    job_id: str
+    kind: str
+    input_version: str
+    sequence: int
+    params: dict = field(default_factory=dict)
+    status: str = "queued"
+    stage: str = "queued"
+    progress: float = 0.0
+    submitted_at: str = field(default_factory=lambda: datetime.utcnow().isoformat())
+    started_at: str = None
+    finished_at: str = None
+    result: dict = None
+    timings: dict = None
+    profile_id: str = None
+    error: str = None
+    superseded: bool = False
+    artifact_signature: tuple = None
+    done: threading.Event = field(default_factory=threading.Event)
+
+    def to_dict(self) -> dict:
+        return {
+            "job_id": self.job_id,
+            "kind": self.kind,
+            "status": self.status,
+            "stage": self.stage,
+            "progress": round(self.progress, 2),
+            "input_version": self.input_version,
+            "params": self.params,
+            "submitted_at": self.submitted_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "superseded": self.superseded,
+            "result": self.result,
+            "timings": self.timings,
+            "profile_id": self.profile_id,
+            "error": self.error,
+        }
+
+
+class JobManager:
+    """
+    Runs registered jobs on a process pool and tracks their status.
+
+    A submission whose input files have the same versions as a queued,
+    running or still-current finished job of the same kind returns that job
+    instead of starting another run. Workers write to a temporary file next
+    to the artifact; it replaces the artifact with os.replace() only if no
+    newer submission of the same kind has already been swapped in, so
+    readers never see a partial file and an older run can't overwrite a
+    newer one. If a worker process dies (e.g. OOM-killed), the jobs on the
+    pool fail and the pool is replaced, so later submissions run again.
+    """
+
+    def __init__(self, documents, max_workers: int = 2, history: int = 100, profiles: ProfileStore = None):
+        self.documents = documents
+        self.profiles = profiles
+        self.max_workers = max_workers
+        self.history = history
+        self.specs = {}
+        self._jobs = OrderedDict()
+        self._lock = threading.Lock()
+        self._swap_lock = threading.Lock()
+        self._sequence = 0
+        self._swapped = {}
+        self._context = multiprocessing.get_context("spawn")
+        self._executor = None
+        self._manager = None
+        self._progress = None
+
+    def register(self, spec: JobSpec):
+        self.specs[spec.kind] = spec
+
+    def _start(self):
+        if self._executor is not None:
+            return
+        with self._lock:
+            if self._executor is None:
+                self._manager = self._context.Manager()
+                self._progress = self._manager.Queue()
+                threading.Thread(target=self._drain_progress, name="job-progress", daemon=True).start()
+                self._executor = ProcessPoolExecutor(max_workers=self.max_workers, mp_context=self._context)
+                print(f"[JOBS] Started {self.max_workers} worker processes")
+
+    def _replace_executor(self, broken: ProcessPoolExecutor):
+        """Start a fresh pool in place of one a dead worker broke; the jobs it held have failed"""
+        with self._lock:
+            if self._executor is not broken:
+                return  # Already replaced
+            broken.shutdown(wait=False, cancel_futures=True)
+            self._executor = ProcessPoolExecutor(max_workers=self.max_workers, mp_context=self._context)
+            print(f"[JOBS] A worker process died; restarted {self.max_workers} worker processes")
+
+    def _drain_progress(self):
+        while True:
+            try:
+                job_id, stage, fraction = self._progress.get()
+            except (EOFError, OSError):
+                return
+            job = self._jobs.get(job_id)
+            if job is not None and job.status in ACTIVE_STATES:
+                if job.status == "queued":
+                    job.status, job.started_at = "running", datetime.utcnow().isoformat()
+                job.stage, job.progress = stage, fraction
+
+    def _input_version(self, spec: JobSpec) -> str:
+        signatures = [self.documents.source_signature(name) for name in spec.inputs]
+        return hashlib.sha1(repr(signatures).encode()).hexdigest()[:16]
+
+    def _coalesce(self, spec: JobSpec, version: str, params: dict):
+        artifact_signature = file_signature(self.documents.path(spec.artifact))
+        for job in reversed(self._jobs.values()):
+            if job.kind != spec.kind or job.input_version != version or job.params != params:
+                continue
+            if job.status in ACTIVE_STATES:
+                return job
+            if job.status == "succeeded" and not job.superseded and job.artifact_signature == artifact_signature:
+                return job
+        return None
+
+    def submit(self, kind: str, profile: bool = False, **params):
+        """
+        (job, coalesced) for a run of `kind` against the current input files.
+        With profile=True a new run is profiled in its worker process; joining
+        an existing job profiles nothing.
+        """
+        spec = self.specs[kind]
+        version = self._input_version(spec)
+        with self._lock:
+            existing = self._coalesce(spec, version, params)
+            if existing is not None:
+                print(f"[JOBS] {kind} coalesced into job {existing.job_id}")
+                return existing, True
+            self._sequence += 1
+            job = Job(
+                job_id=uuid.uuid4().hex[:12], kind=kind, input_version=version, sequence=self._sequence, params=params
+            )
+            self._jobs[job.job_id] = job
+            self._trim()
+
+        self._start()
+        artifact_path = self.documents.path(spec.artifact)
+        tmp_path = f"{artifact_path}.{job.job_id}.tmp"
+        args = (spec.task, job.job_id, dict(self.documents.sources), tmp_path, self._progress)
+        if profile and self.profiles is not None:
+            args = (run_profiled, f"job {kind} {job.job_id}") + args
+        executor = self._executor
+        try:
+            try:
+                future = executor.submit(*args, **params)
+            except BrokenProcessPool:
+                self._replace_executor(executor)
+                executor = self._executor
+                future = executor.submit(*args, **params)
+        except Exception as e:
+            # Never leave a job queued that no worker will run: identical submissions would join it
+            job.error, job.status, job.stage = f"Could not start job: {e}", "failed", "failed"
+            job.progress, job.finished_at = 1.0, datetime.utcnow().isoformat()
+            job.done.set()
+            print(f"[JOBS] {kind} job {job.job_id} failed to start: {e}")
+            raise
+        future.add_done_callback(lambda f: self._complete(job, spec, artifact_path, tmp_path, f, executor))
+        print(f"[JOBS] Queued {kind} job {job.job_id}")
+        return job, False
+
+    @staticmethod
+    def _discard(*paths):
+        for path in paths:
+            if path and os.path.exists(path):
+                os.remove(path)
+
+    def _complete(self, job: Job, spec: JobSpec, artifact_path: str, tmp_path: str, future,
+                  executor: ProcessPoolExecutor = None):
+        tmp_companion = spec.companion(tmp_path) if spec.companion else None
+        try:
+            result = future.result()
+            job.stage = "finalizing"
+            profile = result.pop("profile", None)
+            if profile is not None:
+                job.profile_id = self.profiles.save(profile)["profile_id"]
+            with self._swap_lock:
+                if job.sequence < self._swapped.get(job.kind, 0):
+                    job.superseded = True
+                    self._discard(tmp_path, tmp_companion)
+                else:
+                    os.replace(tmp_path, artifact_path)
+                    if tmp_companion and os.path.exists(tmp_companion):
+                        os.replace(tmp_companion, spec.companion(artifact_path))
+                    self._swapped[job.kind] = job.sequence
+                    job.artifact_signature = file_signature(artifact_path)
+            if not job.superseded and spec.finalize is not None:
+                result = spec.finalize(result) or result
+            # Stage timings measured in the worker go to this process's metrics, not the result
+            job.timings = result.pop("timings", None)
+            for stage, seconds in (job.timings or {}).items():
+                STAGE_SECONDS.labels(stage).observe(seconds)
+            job.result, job.status, job.stage = result, "succeeded", "done"
+            print(f"[JOBS] {job.kind} job {job.job_id} succeeded" + (" (superseded)" if job.superseded else ""))
+        except Exception as e:
+            self._discard(tmp_path, tmp_companion)
+            job.error, job.status, job.stage = str(e), "failed", "failed"
+            print(f"[JOBS] {job.kind} job {job.job_id} failed: {e}")
+            if isinstance(e, BrokenProcessPool) and executor is not None:
+                self._replace_executor(executor)
+        finally:
+            job.progress = 1.0
+            job.finished_at = datetime.utcnow().isoformat()
+            job.done.set()
+
+    def _trim(self):
+        """Forget the oldest finished jobs beyond `history`"""
+        finished = [job_id for job_id, job in self._jobs.items() if job.status not in ACTIVE_STATES]
+        for job_id in finished[:max(0, len(self._jobs) - self.history)]:
+            del self._jobs[job_id]
+
+    def get(self, job_id: str) -> Job:
+        return self._jobs.get(job_id)
+
+    def jobs(self) -> list:
+        return [job.to_dict() for job in reversed(self._jobs.values())]
+
+    def wait(self, job: Job, timeout: float = None) -> bool:
+        return job.done.wait(timeout)
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._manager.shutdown()
@@ -0,0 +1,49 @@
+# Bounded concurrency for upstream LLM calls
+import asyncio
+from contextlib import asynccontextmanager
+
+
+class LLMQueueFull(Exception):
+    """Raised when every LLM slot is busy and the wait queue is at capacity"""
+
+    def __init__(self, retry_after: int):
+        super().__init__(f"LLM queue is full, retry after {retry_after}s")
+        self.retry_after = retry_after
+
+
+class LLMConcurrencyLimiter:
+    """
+    Caps in-flight upstream LLM calls at `max_concurrent`.
+
+    Up to `max_queue` further callers wait for a slot; anyone beyond that
+    is rejected immediately with LLMQueueFull so the endpoint can answer
+    429 instead of piling up requests.
+    """
+
+    def __init__(self, max_concurrent: int, max_queue: int, retry_after: int):
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.retry_after = retry_after
+        self.in_flight = 0
+        self.waiting = 0
+        self._semaphore = asyncio.Semaphore(max_concurrent)
+
+    def ensure_capacity(self):
+        """Fail fast when a new caller would have to queue and the queue is full"""
+        if self.in_flight >= self.max_concurrent and self.waiting >= self.max_queue:
+            raise LLMQueueFull(self.retry_after)
+
+    @asynccontextmanager
+    async def slot(self):
+        self.ensure_capacity()
+        self.waiting += 1
+        try:
+            await self._semaphore.acquire()
+        finally:
+            self.waiting -= 1
+        self.in_flight += 1
+        try:
+            yield
+        finally:
+            self.in_flight -= 1
+            self._semaphore.release()
@@ -1,6 +1,7 @@
-from fastapi import FastAPI, HTTPException, Depends, status
+from fastapi import FastAPI, HTTPException, Depends, Request, status
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import FileResponse, JSONResponse
+from fastapi.responses import FileResponse, JSONResponse, Response, StreamingResponse
+from fastapi.concurrency import run_in_threadpool
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 import os
 import pandas as pd
@@ -9,16 +10,40 @@ from dotenv import load_dotenv
 import numpy as np
 import jwt
 from datetime import datetime, timedelta
-from passlib.context import CryptContext
 from pydantic import BaseModel
-import sqlite3
 import google.generativeai as genai
 import uuid
-import redis
+import hashlib
+from typing import Optional
 
 
 # Import and include the risk analysis router
 from backend import risk_analysis
+from backend.jobs import JobManager, JobSpec
+from backend.job_tasks import calculate_penalties_task, run_validation_task
+from backend.incremental_validation import state_path_for
+from backend.exports import EXPORT_FORMATS, export_stream, frame_chunks, merged_chunks
+from backend.document_store import DEFAULT_SOURCES, DocumentStore
+from backend.approval_store import ApprovalStore
+from backend.analytics_snapshot import SnapshotManager, bucket_categories
+from backend.reason_classifier import default_classifier, source_signature as reason_source_signature
+from backend.record_query import DEFAULT_PAGE_SIZE, PenaltyIndex, QueryError, json_records, paginate, parse_fields, project
+from backend.chat_context import ValidationContextCache, render_summary_context
+from backend.chat_retrieval import RetrievalIndex
+from backend.response_cache import ChatResponseCache
+from backend.chat_store import ChatHistoryStore
+from backend.session_context import SessionContextCache
+from backend.tiered_cache import LocalCache, TieredCache
+from backend.redis_client import ResilientRedis, connect as connect_redis
+from backend.user_store import UserStore
+from backend.password_hasher import HasherBusy, PasswordHasher
+from backend.fake_llm import FakeGenerativeModel
+from backend.llm_limiter import LLMConcurrencyLimiter, LLMQueueFull
+from backend.metrics import (
+    REGISTRY, STAGE_SECONDS, VALIDATION_ROWS, VALIDATION_ROWS_PER_SECOND,
+    CounterCallback, GaugeCallback, MetricsMiddleware,
+)
+from backend.profiling import ProfileStore, ProfilingMiddleware, current_profile, profiled
 
 app = FastAPI()
 # Load environment variables
@@ -27,34 +52,128 @@ load_dotenv()
 # Redis configuration
 REDIS_HOST = os.getenv("REDIS_HOST", "redis")
 REDIS_PORT = int(os.getenv("REDIS_PORT", 6379))
-try:
-    redis_client = redis.Redis(host=REDIS_HOST, port=REDIS_PORT, db=0, decode_responses=True)
-    redis_client.ping()
-    print("[REDIS] Connected to Redis")
-except Exception as e:
-    print(f"[REDIS] Connection failed: {e}. Using in-memory cache as fallback")
-    redis_client = None
+# The chat path is async end to end, so cache calls go through the asyncio client.
+# Each call is bounded by REDIS_TIMEOUT (socket) and REDIS_CALL_TIMEOUT (overall);
+# after REDIS_FAILURE_THRESHOLD failures in a row Redis is skipped until a background
+# ping succeeds again, at most every REDIS_PROBE_INTERVAL s after REDIS_COOLDOWN s.
+redis_breaker = ResilientRedis(
+    connect_redis(
+        REDIS_HOST, REDIS_PORT,
+        connect_timeout=float(os.getenv("REDIS_CONNECT_TIMEOUT", 0.2)),
+        timeout=float(os.getenv("REDIS_TIMEOUT", 0.2)),
+        max_connections=int(os.getenv("REDIS_MAX_CONNECTIONS", 32)),
+    ),
+    failure_threshold=int(os.getenv("REDIS_FAILURE_THRESHOLD", 3)),
+    cooldown=float(os.getenv("REDIS_COOLDOWN", 5)),
+    probe_interval=float(os.getenv("REDIS_PROBE_INTERVAL", 1)),
+    call_timeout=float(os.getenv("REDIS_CALL_TIMEOUT", 0.5)),
+)
+
+# In-process LRU (CACHE_LOCAL_MAX_ENTRIES / CACHE_LOCAL_MAX_MB, entries kept at most
+# CACHE_LOCAL_TTL seconds) in front of Redis. It keeps serving while Redis is down and
+# promotes what was written meanwhile once Redis answers again.
+chat_cache = TieredCache(
+    redis_breaker,
+    LocalCache(
+        max_entries=int(os.getenv("CACHE_LOCAL_MAX_ENTRIES", 2048)),
+        max_bytes=int(os.getenv("CACHE_LOCAL_MAX_MB", 64)) * 1024 * 1024,
+        max_ttl=float(os.getenv("CACHE_LOCAL_TTL", 60)),
+    ),
+)
+
+@app.on_event("startup")
+async def start_redis():
+    if await redis_breaker.ping():
+        print("[REDIS] Connected to Redis")
+    else:
+        print(f"[REDIS] Connection failed ({redis_breaker.last_error}), using in-memory cache until it is reachable")
+    redis_breaker.start()
+
+@app.on_event("shutdown")
+async def stop_redis():
+    await redis_breaker.close()
 
 
 # Gemini configuration
 GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
-genai.configure(api_key=GEMINI_API_KEY)
-model = genai.GenerativeModel("models/gemini-flash-latest")
+# USE_FAKE_LLM=1 swaps in a local deterministic model so chat can run without network
+USE_FAKE_LLM = os.getenv("USE_FAKE_LLM", "").lower() in ("1", "true", "yes")
+if USE_FAKE_LLM:
+    print("[CHAT] Using local fake model")
+    model = FakeGenerativeModel()
+else:
+    genai.configure(api_key=GEMINI_API_KEY)
+    model = genai.GenerativeModel("models/gemini-flash-latest")
+
+# Upstream LLM concurrency: calls beyond the cap wait in a bounded queue, the rest get 429
+llm_limiter = LLMConcurrencyLimiter(
+    max_concurrent=int(os.getenv("LLM_MAX_CONCURRENCY", 4)),
+    max_queue=int(os.getenv("LLM_MAX_QUEUE", 16)),
+    retry_after=int(os.getenv("LLM_RETRY_AFTER", 5)),
+)
 
 # Register risk analysis router
 app.include_router(risk_analysis.router)
 
+# Penalty approvals, joined onto reasons.csv whenever it is read
+approvals_store = ApprovalStore(DEFAULT_SOURCES["approvals"])
+
+# Shared, PO_ID-indexed cache of the uploads/ and validation CSV files
+documents = DocumentStore(overlays={"reasons": approvals_store})
+
+# Dashboard aggregates, rebuilt by /run-validation or when reason_buckets.json changes
+analytics = SnapshotManager(documents)
+
+# Chroma index of PO-level records; the top CHAT_RETRIEVAL_TOP_K hits go into each chat prompt
+retrieval = RetrievalIndex(documents)
+CHAT_RETRIEVAL = retrieval.available and os.getenv("CHAT_RETRIEVAL", "1").lower() not in ("0", "false", "no")
+CHAT_RETRIEVAL_TOP_K = int(os.getenv("CHAT_RETRIEVAL_TOP_K", 8))
+if CHAT_RETRIEVAL:
+    retrieval.schedule_sync()
+else:
+    print("[RAG] Retrieval disabled, chat uses the full validation summary")
+
+# Rendered chat system-prompt context, keyed by the content hash of its inputs.
+# With retrieval on, only headline numbers are kept; PO detail comes from the index.
+validation_context = ValidationContextCache(
+    documents, renderer=render_summary_context
+) if CHAT_RETRIEVAL else ValidationContextCache(documents)
+
+# Answers to repeated questions, keyed by normalized question + context version.
+# CHAT_CACHE_SIMILARITY > 0 also serves near-identical questions above that cosine similarity.
+response_cache = ChatResponseCache(
+    chat_cache,
+    max_entries=int(os.getenv("CHAT_CACHE_MAX_ENTRIES", 512)),
+    ttl=int(os.getenv("CHAT_CACHE_TTL", 86400)),
+    similarity_threshold=float(os.getenv("CHAT_CACHE_SIMILARITY", 0)),
+)
+
 # Chat configuration
 CONTEXT_WINDOW = 15  # Keep last 15 messages in context
-CHAT_HISTORY_FILE = "chat_history.csv"
+CHAT_HISTORY_FILE = "chat_history.csv"  # Legacy CSV, imported once into the chat store
+CHAT_HISTORY_DB = os.getenv("CHAT_HISTORY_DB", "chat_history.db")
+chat_store = ChatHistoryStore(CHAT_HISTORY_DB)
+chat_store.migrate_from_csv(CHAT_HISTORY_FILE)
 
 # Security configuration
 SECRET_KEY = os.getenv("SECRET_KEY", "pipeline_secret_key_2024")
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 1440  # 24 hours
 
-# Password hashing - Use argon2 instead of bcrypt to avoid 72-byte limit
-pwd_context = CryptContext(schemes=["argon2"], deprecated="auto")
+# Accounts; authorization checks are answered from a role cache for USER_CACHE_TTL seconds
+users = UserStore(os.getenv("USERS_DB", "users.db"), role_ttl=float(os.getenv("USER_CACHE_TTL", 60)))
+
+# Password hashing - Use argon2 instead of bcrypt to avoid 72-byte limit.
+# Runs on PASSWORD_HASH_WORKERS dedicated threads with a bounded queue; hashes made
+# with other ARGON2_* costs are upgraded on the next successful login.
+password_hasher = PasswordHasher(
+    time_cost=int(os.getenv("ARGON2_TIME_COST", 3)),
+    memory_cost=int(os.getenv("ARGON2_MEMORY_COST", 65536)),  # KiB
+    parallelism=int(os.getenv("ARGON2_PARALLELISM", 4)),
+    max_workers=int(os.getenv("PASSWORD_HASH_WORKERS", 2)),
+    max_queue=int(os.getenv("PASSWORD_HASH_QUEUE", 32)),
+    retry_after=int(os.getenv("PASSWORD_HASH_RETRY_AFTER", 2)),
+)
 security = HTTPBearer()
 
 # Pydantic models
@@ -85,55 +204,26 @@ class ChatResponse(BaseModel):
     user_message: str
     assistant_message: str
     timestamp: str
+    cache: Optional[dict] = None  # {"hit": bool, "tier": "exact" | "similar", ...}
 
 # Helper functions (define before init_db)
 def hash_password(password: str) -> str:
-    # Argon2 handles long passwords automatically
-    return pwd_context.hash(password)
-
-def verify_password(plain_password: str, hashed_password: str) -> bool:
-    # Argon2 handles long passwords automatically
-    return pwd_context.verify(plain_password, hashed_password)
+    # Argon2 handles long passwords automatically. Blocking; request handlers use password_hasher
+    return password_hasher.context.hash(password)
+
+def hasher_busy_error(e: HasherBusy) -> HTTPException:
+    print(f"[AUTH] {e}")
+    return HTTPException(
+        status_code=429,
+        detail="Too many sign-in attempts in progress, please retry shortly",
+        headers={"Retry-After": str(e.retry_after)}
+    )
 
-# Database initialization
+# Database initialization (the users table is created by UserStore)
 def init_db():
-    conn = sqlite3.connect("users.db")
-    cursor = conn.cursor()
-    cursor.execute("""
-    CREATE TABLE IF NOT EXISTS users (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        username TEXT UNIQUE NOT NULL,
-        email TEXT UNIQUE NOT NULL,
-        password TEXT NOT NULL,
-        role TEXT DEFAULT 'user',
-        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-    )
-    """)
-    conn.commit()
-    
-    # Check if role column exists, if not add it
-    cursor.execute("PRAGMA table_info(users)")
-    columns = [column[1] for column in cursor.fetchall()]
-    if 'role' not in columns:
-        cursor.execute("ALTER TABLE users ADD COLUMN role TEXT DEFAULT 'user'")
-        conn.commit()
-    
-    # Seed default admin user
     # Seed default admin user safely
-    cursor.execute(
-        "SELECT id FROM users WHERE username = ? OR email = ?",
-        ("admin", "admin@reconciliation.local")
-    )
-
-    if not cursor.fetchone():
-        admin_password = hash_password("admin")
-        cursor.execute(
-            "INSERT OR IGNORE INTO users (username, email, password, role) VALUES (?, ?, ?, ?)",
-            ("admin", "admin@reconciliation.local", admin_password, "admin")
-        )
-        conn.commit()
-        
-    conn.close()
+    if not users.exists("admin", "admin@reconciliation.local"):
+        users.create("admin", "admin@reconciliation.local", hash_password("admin"), role="admin")
 
 init_db()
 
@@ -161,205 +251,92 @@ def verify_token(credentials: HTTPAuthorizationCredentials = Depends(security)):
         raise HTTPException(status_code=401, detail="Invalid token")
 
 def get_user_by_username(username: str):
-    conn = sqlite3.connect("users.db")
-    cursor = conn.cursor()
-    cursor.execute("SELECT id, username, email, role FROM users WHERE username = ?", (username,))
-    result = cursor.fetchone()
-    conn.close()
-    if result:
-        return {"id": result[0], "username": result[1], "email": result[2], "role": result[3]}
-    return None
-
-def load_reason_buckets():
-    """Load reason buckets from JSON file"""
-    current_dir = os.path.dirname(os.path.abspath(__file__))
-    parent_dir = os.path.dirname(current_dir)
-    reason_buckets_file = os.path.join(parent_dir, "reasons_validation", "reason_buckets.json")
+    return users.get(username)
+
+def is_admin_token(authorization: str) -> bool:
+    """Whether an Authorization header carries a valid token of an admin"""
+    scheme, _, token = authorization.partition(" ")
+    if scheme.lower() != "bearer" or not token:
+        return False
     try:
-        with open(reason_buckets_file, 'r') as f:
-            return json.load(f)
-    except Exception as e:
-        print(f"Error loading reason buckets: {str(e)}")
-        return {}
+        username = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM]).get("sub")
+    except jwt.InvalidTokenError:
+        return False
+    user = get_user_by_username(username) if username else None
+    return bool(user) and user.get("role") == "admin"
+
+# Opt-in profiling of the analytics endpoints and the jobs they start: admins ask per request
+# with an X-Profile: 1 header or ?profile=1, PROFILING=1 profiles every such request
+profiles = ProfileStore(
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "profiles"),
+    max_profiles=int(os.getenv("PROFILE_MAX_STORED", 50)),
+)
 
 def load_validation_context():
-    """Load validation results for context"""
-    current_dir = os.path.dirname(os.path.abspath(__file__))
-    validation_file = os.path.join(current_dir, "final_reason_validation_results.csv")
+    """Load validation results for context, re-rendered only when its inputs change"""
     try:
-        df = pd.read_csv(validation_file)
-        
-        # Create a summary instead of loading all rows
-        total_pos = len(df)
-        match_count = len(df[df['Match/Not'] == True])
-        mismatch_count = len(df[df['Match/Not'] == False])
-        
-        # Get discrepancy reasons frequency
-        mismatches_df = df[df['Match/Not'] == False]
-        reason_counts = mismatches_df['stated_reason'].value_counts().to_dict()
-        
-        # Load reason buckets
-        reason_buckets = load_reason_buckets()
-        
-        # Format reason frequency with bucket classification
-        reason_text = "\n".join([
-            f"  • {reason}: {count} occurrences"
-            for reason, count in sorted(reason_counts.items(), key=lambda x: x[1], reverse=True)
-        ])
-        
-        # Get sample mismatches
-        samples = mismatches_df.head(10)
-        sample_text = "\n".join([
-            f"  • {row['PO_ID']}: {row['stated_reason']} - {row['Comments']}"
-            for idx, row in samples.iterrows()
-        ])
-        
-        context = f"""Validation Results Summary:
-Total Purchase Orders: {total_pos}
-Valid Records: {match_count}
-Discrepancies Found: {mismatch_count}
-Recovery Rate: {(match_count/total_pos*100):.1f}%
-
-Discrepancy Reasons (Frequency Distribution):
-{reason_text}
-
-Sample Discrepancy Records:
-{sample_text}
-
-Data Context:
-- Total unique reasons found: {len(reason_counts)}
-- Most common reason: {max(reason_counts.items(), key=lambda x: x[1])[0] if reason_counts else 'N/A'}
-- Percentage of discrepancies: {(mismatch_count/total_pos*100):.1f}%
-
-Available Reason Categories:
-{json.dumps(reason_buckets, indent=2)}
-
-You can answer questions about:
-- Frequency of specific discrepancy reasons
-- Which POs have specific issues
-- Statistics about different discrepancy types
-- Recovery opportunities by reason type
-- ASN/GRN mismatches
-- Overall reconciliation metrics"""
-        return context
+        return validation_context.get()
     except Exception as e:
         print(f"Error loading validation data: {str(e)}")
         return f"Validation data available but encountered error: {str(e)}"
 
-def load_chat_history(session_id: str):
-    """Load chat history from CSV"""
+def load_retrieved_records(question: str) -> str:
+    """Top-k indexed records relevant to a chat question, empty when retrieval is off"""
+    if not CHAT_RETRIEVAL:
+        return ""
     try:
-        if os.path.exists(CHAT_HISTORY_FILE):
-            df = pd.read_csv(CHAT_HISTORY_FILE)
-            session_chats = df[df['session_id'] == session_id].to_dict('records')
-            return session_chats
-        return []
+        return retrieval.render(question, CHAT_RETRIEVAL_TOP_K)
+    except Exception as e:
+        print(f"[RAG] Retrieval failed: {e}")
+        return ""
+
+def chat_cache_version() -> str:
+    """
+    Version of everything a chat answer is grounded in: the validation
+    context hash, plus the reasons and penalties files retrieval reads from
+    """
+    version = validation_context.version
+    if CHAT_RETRIEVAL:
+        signatures = [documents.source_signature(name) for name in ("reasons", "penalties")]
+        version = hashlib.sha1(f"{version}:{signatures}".encode()).hexdigest()
+    return version
+
+def load_chat_history(session_id: str, limit: int = None):
+    """Load chat history for a session, optionally only the last `limit` turns"""
+    try:
+        if limit is not None:
+            return chat_store.recent(session_id, limit)
+        return chat_store.history(session_id)
     except Exception as e:
         print(f"Error loading chat history: {e}")
         return []
 
 def save_chat_message(session_id: str, user_message: str, assistant_message: str):
-    """Save chat message to CSV"""
+    """Append chat message to the history store"""
     try:
-        timestamp = datetime.utcnow().isoformat()
-        new_record = {
-            'session_id': session_id,
-            'user_message': user_message,
-            'assistant_message': assistant_message,
-            'timestamp': timestamp
-        }
-        
-        if os.path.exists(CHAT_HISTORY_FILE):
-            df = pd.read_csv(CHAT_HISTORY_FILE)
-            df = pd.concat([df, pd.DataFrame([new_record])], ignore_index=True)
-        else:
-            df = pd.DataFrame([new_record])
-        
-        df.to_csv(CHAT_HISTORY_FILE, index=False)
+        chat_store.append(session_id, user_message, assistant_message)
         return True
     except Exception as e:
         print(f"Error saving chat history: {e}")
         return False
 
-def get_context_window(session_id: str):
+async def load_recent_turns(session_id: str, limit: int):
+    return await run_in_threadpool(load_chat_history, session_id, limit)
+
+# Last CONTEXT_WINDOW turns per session, kept in step with the history store
+session_context = SessionContextCache(chat_cache, load_recent_turns, window=CONTEXT_WINDOW, ttl=86400)
+
+async def get_context_window(session_id: str):
     """Get last N messages for context with Redis caching"""
-    cache_key = f"chat_context:{session_id}"
-    
-    # Try to get from Redis cache first
-    if redis_client:
-        try:
-            cached = redis_client.get(cache_key)
-            if cached:
-                print(f"[REDIS] Cache hit for session {session_id}")
-                return json.loads(cached)
-        except Exception as e:
-            print(f"[REDIS] Cache read error: {e}")
-    
-    # Load from database if not in cache
-    history = load_chat_history(session_id)
-    # Return last CONTEXT_WINDOW messages
-    recent_messages = history[-CONTEXT_WINDOW:] if len(history) > CONTEXT_WINDOW else history
-    
-    messages = []
-    for chat in recent_messages:
-        messages.append({"role": "user", "content": chat['user_message']})
-        messages.append({"role": "assistant", "content": chat['assistant_message']})
-    
-    # Cache the context in Redis with 24-hour TTL
-    if redis_client:
-        try:
-            redis_client.setex(cache_key, 86400, json.dumps(messages))
-            print(f"[REDIS] Cached context for session {session_id}")
-        except Exception as e:
-            print(f"[REDIS] Cache write error: {e}")
-    
-    return messages
+    return await session_context.get(session_id)
 
-def save_chat_message_to_cache(session_id: str, user_message: str, assistant_message: str):
-    """Save new chat message and update cache"""
-    cache_key = f"chat_context:{session_id}"
-    
-    # Load from cache or database
-    if redis_client:
-        try:
-            cached = redis_client.get(cache_key)
-            if cached:
-                messages = json.loads(cached)
-            else:
-                messages = get_context_window(session_id)
-        except Exception as e:
-            print(f"[REDIS] Error reading cache: {e}")
-            messages = get_context_window(session_id)
-    else:
-        messages = get_context_window(session_id)
-    
-    # Add new messages
-    messages.append({"role": "user", "content": user_message})
-    messages.append({"role": "assistant", "content": assistant_message})
-    
-    # Keep only last CONTEXT_WINDOW messages
-    if len(messages) > CONTEXT_WINDOW * 2:
-        messages = messages[-(CONTEXT_WINDOW * 2):]
-    
-    # Update cache
-    if redis_client:
-        try:
-            redis_client.setex(cache_key, 86400, json.dumps(messages))
-            print(f"[REDIS] Updated cache for session {session_id}")
-        except Exception as e:
-            print(f"[REDIS] Cache update error: {e}")
-    
-    return messages
+async def save_chat_message_to_cache(session_id: str, user_message: str, assistant_message: str):
+    """Append a saved turn to the cached context"""
+    await session_context.append(session_id, user_message, assistant_message)
 
-def clear_chat_cache(session_id: str):
+async def clear_chat_cache(session_id: str):
     """Clear chat cache for a session"""
-    cache_key = f"chat_context:{session_id}"
-    if redis_client:
-        try:
-            redis_client.delete(cache_key)
-            print(f"[REDIS] Cleared cache for session {session_id}")
-        except Exception as e:
-            print(f"[REDIS] Cache clear error: {e}")
+    await session_context.clear(session_id)
 
 app.add_middleware(
     CORSMiddleware,
@@ -368,11 +345,21 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(
+    ProfilingMiddleware,
+    store=profiles,
+    authorize=is_admin_token,
+    paths=("/api/", "/run-validation", "/calculate-penalties"),
+    always=os.getenv("PROFILING", "0").lower() in ("1", "true", "yes"),
+    interval=float(os.getenv("PROFILE_INTERVAL_MS", 5)) / 1000,
+)
+# Added last so it is outermost and times every request, CORS included
+app.add_middleware(MetricsMiddleware)
 
 load_dotenv()
 
 @app.post("/signup")
-def signup(user: UserRegister):
+async def signup(user: UserRegister):
     """Register a new user"""
     try:
         # Validate input
@@ -382,51 +369,48 @@ def signup(user: UserRegister):
             raise HTTPException(status_code=400, detail="Password must be at least 6 characters")
         
         # Check if user exists
-        conn = sqlite3.connect("users.db")
-        cursor = conn.cursor()
-        cursor.execute("SELECT id FROM users WHERE username = ? OR email = ?", (user.username, user.email))
-        if cursor.fetchone():
-            conn.close()
+        if await run_in_threadpool(users.exists, user.username, user.email):
             raise HTTPException(status_code=409, detail="Username or email already exists")
         
         # Create new user
-        hashed_password = hash_password(user.password)
-        cursor.execute(
-            "INSERT INTO users (username, email, password) VALUES (?, ?, ?)",
-            (user.username, user.email, hashed_password)
-        )
-        conn.commit()
-        conn.close()
+        hashed_password = await password_hasher.hash(user.password)
+        await run_in_threadpool(users.create, user.username, user.email, hashed_password)
         
         return {"status": "success", "message": "User created successfully"}
+    except HasherBusy as e:
+        raise hasher_busy_error(e)
     except HTTPException:
         raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.post("/login", response_model=TokenResponse)
-def login(user: UserLogin):
+async def login(user: UserLogin):
     """Authenticate user and return access token"""
     try:
         # Get user from database
-        conn = sqlite3.connect("users.db")
-        cursor = conn.cursor()
-        cursor.execute("SELECT id, username, email, password, role FROM users WHERE username = ?", (user.username,))
-        result = cursor.fetchone()
-        conn.close()
+        result = await run_in_threadpool(users.credentials, user.username)
+        if not result:
+            raise HTTPException(status_code=401, detail="Invalid username or password")
         
-        if not result or not verify_password(user.password, result[3]):
+        verified, new_hash = await password_hasher.verify_and_update(user.password, result["password"])
+        if not verified:
             raise HTTPException(status_code=401, detail="Invalid username or password")
+        if new_hash:
+            # Stored with outdated Argon2 parameters; upgrade while we have the password
+            await run_in_threadpool(users.set_password, user.username, new_hash)
         
         # Create access token
         access_token = create_access_token({"sub": user.username})
-        user_data = {"id": result[0], "username": result[1], "email": result[2], "role": result[4]}
+        user_data = {key: result[key] for key in ("id", "username", "email", "role")}
         
         return {
             "access_token": access_token,
             "token_type": "bearer",
             "user": user_data
         }
+    except HasherBusy as e:
+        raise hasher_busy_error(e)
     except HTTPException:
         raise
     except Exception as e:
@@ -445,86 +429,18 @@ def read_root():
     return {"message": "Reconciliation with RCA API is running."}
 
 @app.get("/api/po-analytics")
+@profiled
 def get_po_analytics():
     """Get PO analytics data from validation results"""
     try:
-        current_dir = os.path.dirname(os.path.abspath(__file__))
-        validation_file = os.path.join(current_dir, "final_reason_validation_results.csv")
-        
-        if not os.path.exists(validation_file):
+        snapshot = analytics.current()
+        if snapshot is None:
             return {"status": "error", "message": "Validation data not found"}
         
-        # Load validation results
-        df = pd.read_csv(validation_file)
-        
-        # Calculate PO health metrics
-        total_pos = len(df)
-        pos_without_issues = len(df[df['Match/Not'] == True])
-        pos_with_issues = len(df[df['Match/Not'] == False])
-        
-        # Load reason buckets for categorization
-        current_dir = os.path.dirname(os.path.abspath(__file__))
-        parent_dir = os.path.dirname(current_dir)
-        reason_buckets_file = os.path.join(parent_dir, "reasons_validation", "reason_buckets.json")
-        
-        reason_buckets = {}
-        if os.path.exists(reason_buckets_file):
-            with open(reason_buckets_file, 'r') as f:
-                reason_buckets = json.load(f)
-        
-        # Get discrepancy breakdown by category
-        discrepancy_df = df[df['Match/Not'] == False].copy()
-        discrepancy_df['bucket_category'] = discrepancy_df['stated_reason'].map(
-            lambda x: reason_buckets.get(str(x).strip().lower(), "Unspecified Issue") if pd.notna(x) else "Unspecified Issue"
+        return Response(
+            content=snapshot.render("po-analytics", snapshot.po_analytics),
+            media_type="application/json"
         )
-        
-        # Calculate category-wise metrics
-        category_breakdown = []
-        category_totals = discrepancy_df['bucket_category'].value_counts()
-        
-        for category in category_totals.index:
-            count = int(category_totals[category])
-            # Estimate average recovery per PO (in rupees)
-            avg_recovery = {
-                "Invoice Issue": 15000,
-                "GRN Issue": 12000,
-                "Quantity Mismatch": 8500,
-                "Shipping Issue": 5000,
-                "Late Delivery Issue": 3500,
-                "Unspecified Issue": 2000,
-            }.get(category, 5000)
-            
-            total_recovery = count * avg_recovery
-            category_breakdown.append({
-                "category": category,
-                "posCount": count,
-                "avgRecoveryPerPO": avg_recovery,
-                "totalRecovery": total_recovery
-            })
-        
-        # Calculate potential recovery
-        total_recovery = sum(item["totalRecovery"] for item in category_breakdown)
-        
-        # Estimate "correct with issues" - roughly 40% of discrepancies
-        correct_with_issues = max(0, int(pos_with_issues * 0.38))
-        
-        return {
-            "status": "success",
-            "poData": {
-                "totalPOs": total_pos,
-                "posWithoutIssues": pos_without_issues,
-                "posWithIssues": pos_with_issues,
-                "correctWithIssues": correct_with_issues,
-                "withDiscrepancies": pos_with_issues,
-                "potentialRecoveryAmount": total_recovery
-            },
-            "discrepancyBreakdown": category_breakdown,
-            "summary": {
-                "cleanPOPercentage": round((pos_without_issues / total_pos * 100), 1),
-                "issuePercentage": round((pos_with_issues / total_pos * 100), 1),
-                "recoveryRate": round((correct_with_issues / pos_with_issues * 100) if pos_with_issues > 0 else 0, 1)
-            }
-        }
     
     except Exception as e:
         import traceback
@@ -536,83 +452,35 @@ def get_po_analytics():
         }
 
 @app.get("/api/po-level-issues")
-def get_po_level_issues(category: str = None):
-    """Get individual POs with issues, optionally filtered by category"""
+@profiled
+def get_po_level_issues(
+    category: str = None,
+    alignment: str = None,
+    min_penalty: float = None,
+    max_penalty: float = None,
+    sort: str = None,
+    fields: str = None,
+    limit: int = DEFAULT_PAGE_SIZE,
+    cursor: str = None,
+):
+    """
+    Get a page of individual POs with issues.
+    Filter by category, alignment (Yes/No) and penalty range; sort by a field
+    ("-field" for descending); project with fields=a,b; pass nextCursor back
+    as cursor for the following page.
+    """
     try:
-        current_dir = os.path.dirname(os.path.abspath(__file__))
-        validation_file = os.path.join(current_dir, "final_reason_validation_results.csv")
-        
-        if not os.path.exists(validation_file):
+        snapshot = analytics.current()
+        if snapshot is None:
             return {"status": "error", "message": "Validation data not found"}
         
-        # Load validation results
-        df = pd.read_csv(validation_file)
-        
-        # Filter for only discrepancies (Match/Not = False)
-        # Show all reviewed POs (both matched and mismatched)
-        issue_df = df.copy()
-        
-        # Load reason buckets for categorization
-        parent_dir = os.path.dirname(current_dir)
-        reason_buckets_file = os.path.join(parent_dir, "reasons_validation", "reason_buckets.json")
-        
-        reason_buckets = {}
-        if os.path.exists(reason_buckets_file):
-            with open(reason_buckets_file, 'r') as f:
-                reason_buckets = json.load(f)
-        
-        # Map stated_reason to bucket category
-        issue_df['bucket_category'] = issue_df['stated_reason'].map(
-            lambda x: reason_buckets.get(str(x).strip().lower(), "Unspecified Issue") if pd.notna(x) else "Unspecified Issue"
+        return snapshot.po_level_issues(
+            category=category, alignment=alignment, min_penalty=min_penalty, max_penalty=max_penalty,
+            sort=sort, fields=fields, limit=limit, cursor=cursor
         )
-        
-        # Filter by category if provided
-        if category:
-            issue_df = issue_df[issue_df['bucket_category'] == category]
-        
-        # Define recovery amounts per category for penalty calculation
-        recovery_amounts = {
-            "Invoice Issue": 15000,
-            "GRN Issue": 12000,
-            "Quantity Mismatch": 8500,
-            "Shipping Issue": 5000,
-            "Late Delivery Issue": 3500,
-            "Unspecified Issue": 2000
-        }
-        
-        # Format response
-        pos_with_issues = []
-        for _, row in issue_df.iterrows():
-            category = str(row['bucket_category'])
-            penalty_amount = recovery_amounts.get(category, 2000)
-            # Alignment based on Match/Not column: True = "Yes", False = "No"
-            alignment = "Yes" if row['Match/Not'] == True else "No"
-            
-            pos_with_issues.append({
-                "po_id": str(row['PO_ID']),
-                "stated_reason": str(row['stated_reason']),
-                "category": category,
-                "comments": str(row['Comments']),
-                "penalty_amount": penalty_amount,
-                "alignment": alignment,
-                "status": "open"  # Default status
-            })
-        
-        # Group by category
-        grouped_issues = {}
-        for issue in pos_with_issues:
-            cat = issue['category']
-            if cat not in grouped_issues:
-                grouped_issues[cat] = []
-            grouped_issues[cat].append(issue)
-        
-        return {
-            "status": "success",
-            "poWithIssues": pos_with_issues,
-            "groupedByCategory": grouped_issues,
-            "totalIssues": len(pos_with_issues)
-        }
     
+    except QueryError as e:
+        return JSONResponse(status_code=400, content={"status": "error", "message": str(e)})
     except Exception as e:
         import traceback
         print(f"Error getting PO-level issues: {str(e)}")
@@ -623,85 +491,18 @@ def get_po_level_issues(category: str = None):
         }
 
 @app.get("/api/top-pos")
+@profiled
 def get_top_pos():
     """Get top 5 POs by recovery amount and top 5 POs with high penalties"""
     try:
-        current_dir = os.path.dirname(os.path.abspath(__file__))
-        validation_file = os.path.join(current_dir, "final_reason_validation_results.csv")
-        
-        if not os.path.exists(validation_file):
+        snapshot = analytics.current()
+        if snapshot is None:
             return {"status": "error", "message": "Validation data not found"}
         
-        # Load validation results
-        df = pd.read_csv(validation_file)
-        
-        # Load reason buckets for categorization
-        parent_dir = os.path.dirname(current_dir)
-        reason_buckets_file = os.path.join(parent_dir, "reasons_validation", "reason_buckets.json")
-        
-        reason_buckets = {}
-        if os.path.exists(reason_buckets_file):
-            with open(reason_buckets_file, 'r') as f:
-                reason_buckets = json.load(f)
-        
-        # Filter for only issues
-        issue_df = df[df['Match/Not'] == False].copy()
-        
-        # Map to categories
-        issue_df['category'] = issue_df['stated_reason'].map(
-            lambda x: reason_buckets.get(str(x).strip().lower(), "Unspecified Issue") if pd.notna(x) else "Unspecified Issue"
+        return Response(
+            content=snapshot.render("top-pos", snapshot.top_pos),
+            media_type="application/json"
         )
-        
-        # Assign recovery amounts by category
-        recovery_map = {
-            "Invoice Issue": 15000,
-            "GRN Issue": 12000,
-            "Quantity Mismatch": 8500,
-            "Shipping Issue": 5000,
-            "Late Delivery Issue": 3500,
-            "Unspecified Issue": 2000,
-        }
-        
-        issue_df['recovery_amount'] = issue_df['category'].map(
-            lambda x: recovery_map.get(x, 5000)
-        )
-        
-        # Top 5 POs by recovery amount
-        top_recovery_pos = issue_df.nlargest(5, 'recovery_amount')[
-            ['PO_ID', 'stated_reason', 'category', 'recovery_amount']
-        ].to_dict('records')
-        
-        top_recovery_pos = [
-            {
-                "po_id": str(item['PO_ID']),
-                "reason": str(item['stated_reason']),
-                "category": str(item['category']),
-                "recovery_amount": int(item['recovery_amount'])
-            }
-            for item in top_recovery_pos
-        ]
-        
-        # Top 5 POs with high penalties (by recovery amount, these are the same)
-        top_penalty_pos = issue_df.nlargest(5, 'recovery_amount')[
-            ['PO_ID', 'stated_reason', 'category', 'recovery_amount', 'Comments']
-        ].to_dict('records')
-        
-        top_penalty_pos = [
-            {
-                "po_id": str(item['PO_ID']),
-                "reason": str(item['stated_reason']),
-                "category": str(item['category']),
-                "penalty_amount": int(item['recovery_amount']),
-                "issue": str(item['Comments'])
-            }
-            for item in top_penalty_pos
-        ]
-        
-        return {
-            "status": "success",
-            "topRecoveryPOS": top_recovery_pos,
-            "topPenaltyPOS": top_penalty_pos
-        }
     
     except Exception as e:
         import traceback
@@ -712,237 +513,103 @@ def get_top_pos():
             "message": str(e)
         }
 
+def validation_result_id() -> str:
+    """Handle for the current validation results, changes whenever they are rewritten"""
+    return hashlib.sha1(repr(documents.signature("validation")).encode()).hexdigest()[:16]
+
+def validation_result_handle(row_count: int) -> dict:
+    result_id = validation_result_id()
+    return {
+        "result_id": result_id,
+        "rows": row_count,
+        "exports": {
+            fmt: f"/export/validation?format={fmt}&result_id={result_id}" for fmt in EXPORT_FORMATS
+        }
+    }
+
+def finish_validation_job(result: dict) -> dict:
+    """
+    Runs once new validation results are in place: rebuild everything derived
+    from them. Incremental runs only re-validate changed POs; the analytics
+    snapshot is still rebuilt whole from the merged results (see
+    SnapshotManager.refresh).
+    """
+    analytics.refresh()
+    validation_context.invalidate()
+    response_cache.clear()
+    if CHAT_RETRIEVAL:
+        retrieval.schedule_sync()
+    rows = result.get("incremental", {}).get("rows_recomputed", result["rows"])
+    VALIDATION_ROWS.inc(rows)
+    evaluation_seconds = result.get("timings", {}).get("rule_evaluation")
+    if evaluation_seconds:
+        VALIDATION_ROWS_PER_SECOND.set(rows / evaluation_seconds)
+    return dict(result, result=validation_result_handle(result["rows"]))
+
+# Validation and penalty runs execute in worker processes; results are swapped in atomically
+job_runner = JobManager(documents, max_workers=int(os.getenv("JOB_WORKERS", 2)), profiles=profiles)
+# Processes each validation job shards its reasons across (by PO_ID); 1 runs it serially
+VALIDATION_WORKERS = int(os.getenv("VALIDATION_WORKERS", 1))
+# Longest a wait=true request blocks on its job before answering 202 with the job id
+JOB_WAIT_TIMEOUT = float(os.getenv("JOB_WAIT_TIMEOUT", 300))
+job_runner.register(JobSpec(
+    kind="run-validation",
+    task=run_validation_task,
+    inputs=("reasons", "pos", "asns", "grns", "invoices"),
+    artifact="validation",
+    finalize=finish_validation_job,
+    companion=state_path_for,
+))
+job_runner.register(JobSpec(
+    kind="calculate-penalties",
+    task=calculate_penalties_task,
+    inputs=("reasons", "validation"),
+    artifact="merged",
+))
+
+@app.on_event("shutdown")
+def stop_job_runner():
+    job_runner.shutdown()
+    password_hasher.shutdown()
+
+def submit_job(kind: str, wait: bool, **params):
+    """
+    Enqueue a job (or join an identical one) and answer 202 with its id, or
+    with wait=true block until it finishes and return its result inline.
+    A wait longer than JOB_WAIT_TIMEOUT seconds answers 202 as well.
+    """
+    profile = current_profile()
+    job, coalesced = job_runner.submit(kind, profile=profile is not None, **params)
+    if profile is not None:
+        profile.meta.setdefault("jobs", []).append({"job_id": job.job_id, "coalesced": coalesced})
+    if not wait or not job_runner.wait(job, JOB_WAIT_TIMEOUT):
+        return JSONResponse(
+            status_code=202,
+            content={"status": "accepted", "coalesced": coalesced, "job": job.to_dict()}
+        )
+    if profile is not None:
+        profile.meta["jobs"][-1]["profile_id"] = job.profile_id
+    if job.status != "succeeded":
+        return {"status": "error", "message": job.error, "job_id": job.job_id}
+    return {"status": "success", "job_id": job.job_id, **job.result}
+
 @app.post("/run-validation")
-def run_validation():
+@profiled
+def run_validation(wait: bool = False, summary_only: bool = False, full: bool = False):
     """
     Run validation on discrepancy reasons by checking against actual data files.
+    Enqueues a background job and returns its id; poll /jobs/{job_id}.
+    Only POs whose reason or document rows changed since the last run are
+    re-evaluated (result["incremental"] has the counts) unless full=true.
+    With wait=true the response carries the summary and a result handle for
+    /export/validation, plus every validated row unless summary_only=true.
     """
-    print("\n=== Starting Discrepancy Validation ===")
-    
     try:
-        current_dir = os.path.dirname(os.path.abspath(__file__))
-        parent_dir = os.path.dirname(current_dir)
-        uploads_path = os.path.join(parent_dir, "uploads")
-        
-        # File paths
-        reasons_file = os.path.join(uploads_path, "reasons.csv")
-        
-        if not os.path.exists(reasons_file):
-            return {"status": "error", "message": "Reasons file not found"}
-        
-        # Load all data files
-        reasons_df = pd.read_csv(reasons_file)
-        print(f"✓ Loaded {len(reasons_df)} records from reasons.csv")
-        
-        # Load supporting data files
-        pos_df = pd.read_csv(os.path.join(uploads_path, "pos.csv")) if os.path.exists(os.path.join(uploads_path, "pos.csv")) else pd.DataFrame()
-        asns_df = pd.read_csv(os.path.join(uploads_path, "asns.csv")) if os.path.exists(os.path.join(uploads_path, "asns.csv")) else pd.DataFrame()
-        grns_df = pd.read_csv(os.path.join(uploads_path, "grns.csv")) if os.path.exists(os.path.join(uploads_path, "grns.csv")) else pd.DataFrame()
-        invoices_df = pd.read_csv(os.path.join(uploads_path, "invoices.csv")) if os.path.exists(os.path.join(uploads_path, "invoices.csv")) else pd.DataFrame()
-        payments_df = pd.read_csv(os.path.join(uploads_path, "payments.csv")) if os.path.exists(os.path.join(uploads_path, "payments.csv")) else pd.DataFrame()
-        
-        print(f"✓ Loaded supporting data files")
-        
-        # Rule-based validation logic
-        final_results = []
-        
-        for _, row in reasons_df.iterrows():
-            po_id = str(row['PO_ID']).strip()
-            reason = str(row.get('reason', '')).strip().lower()
-            penalty = float(row.get('penalty', 0))
-            
-            match = True  # Default: assume valid
-            comment = "Valid reason"
-            
-            # Rule 1: No reason = Match (True)
-            if reason in ['no reason', 'no issues', 'none', '']:
-                match = True
-                comment = "No discrepancy"
-            
-            # Rule 2: Check for "arrived late" or "late delivery" or "delivered late"
-            elif 'late' in reason or 'delivered' in reason:
-                po_data = pos_df[pos_df['PO_ID'] == po_id] if not pos_df.empty else None
-                if po_data is not None and not po_data.empty:
-                    po_date = po_data['PO_Date'].iloc[0] if 'PO_Date' in pos_df.columns else None
-                    grn_data = grns_df[grns_df['PO_ID'] == po_id] if not grns_df.empty else None
-                    if grn_data is not None and not grn_data.empty:
-                        grn_date = grn_data['Received_Date'].iloc[0] if 'Received_Date' in grns_df.columns else None
-                        if po_date and grn_date:
-                            # If GRN date > PO date, it's late
-                            match = False if grn_date > po_date else True
-                            comment = f"Late delivery: GRN date {grn_date} > PO date {po_date}" if not match else "On time delivery"
-                        else:
-                            match = False
-                            comment = "Date data incomplete"
-                    else:
-                        match = False
-                        comment = "No GRN found for this PO"
-                else:
-                    match = False
-                    comment = "No PO data found"
-            
-            # Rule 3: Check for quantity mismatches
-            elif 'quantity' in reason or 'qty' in reason or 'mismatch' in reason:
-                po_data = pos_df[pos_df['PO_ID'] == po_id] if not pos_df.empty else None
-                grn_data = grns_df[grns_df['PO_ID'] == po_id] if not grns_df.empty else None
-                
-                if po_data is not None and not po_data.empty and grn_data is not None and not grn_data.empty:
-                    po_qty = po_data['Quantity'].iloc[0] if 'Quantity' in pos_df.columns else None
-                    grn_qty = grn_data['Quantity_Received'].iloc[0] if 'Quantity_Received' in grns_df.columns else None
-                    
-                    if po_qty is not None and grn_qty is not None:
-                        # If quantities don't match, it's a valid discrepancy
-                        match = False if po_qty != grn_qty else True
-                        comment = f"Qty mismatch: PO={po_qty}, GRN={grn_qty}" if not match else f"Qty match: {po_qty}"
-                    else:
-                        match = False
-                        comment = "Quantity data incomplete"
-                else:
-                    match = False
-                    comment = "PO or GRN data not found"
-            
-            # Rule 4: Check for price/currency mismatches
-            elif 'price' in reason or 'currency' in reason:
-                po_data = pos_df[pos_df['PO_ID'] == po_id] if not pos_df.empty else None
-                invoices_data = invoices_df[invoices_df['PO_ID'] == po_id] if not invoices_df.empty else None
-                
-                if po_data is not None and not po_data.empty and invoices_data is not None and not invoices_data.empty:
-                    po_price = po_data['Unit_Price'].iloc[0] if 'Unit_Price' in pos_df.columns else None
-                    inv_price = invoices_data['Unit_Price'].iloc[0] if 'Unit_Price' in invoices_df.columns else None
-                    
-                    if po_price is not None and inv_price is not None:
-                        # If prices don't match, it's a valid discrepancy
-                        match = False if po_price != inv_price else True
-                        comment = f"Price mismatch: PO={po_price}, Invoice={inv_price}" if not match else f"Price match: {po_price}"
-                    else:
-                        match = False
-                        comment = "Price data incomplete"
-                else:
-                    match = False
-                    comment = "PO or Invoice data not found"
-            
-            # Rule 5: Check for ASN/GRN mismatches
-            elif 'asn' in reason or 'grn' in reason or 'shipment' in reason:
-                asn_data = asns_df[asns_df['PO_ID'] == po_id] if not asns_df.empty else None
-                grn_data = grns_df[grns_df['PO_ID'] == po_id] if not grns_df.empty else None
-                
-                if asn_data is not None and not asn_data.empty and grn_data is not None and not grn_data.empty:
-                    asn_qty = asn_data['Quantity_Shipped'].iloc[0] if 'Quantity_Shipped' in asns_df.columns else None
-                    grn_qty = grn_data['Quantity_Received'].iloc[0] if 'Quantity_Received' in grns_df.columns else None
-                    
-                    if asn_qty is not None and grn_qty is not None:
-                        # If ASN and GRN quantities don't match, it's a valid discrepancy
-                        match = False if asn_qty != grn_qty else True
-                        comment = f"ASN/GRN mismatch: ASN={asn_qty}, GRN={grn_qty}" if not match else f"ASN/GRN match: {grn_qty}"
-                    else:
-                        match = False
-                        comment = "ASN/GRN quantity data incomplete"
-                else:
-                    match = False
-                    comment = "ASN or GRN data not found"
-            
-            # Rule 6: Check for over/under delivery or more/less received
-            elif any(x in reason for x in ['delivered', 'received', 'over', 'under', 'more', 'less']):
-                po_data = pos_df[pos_df['PO_ID'] == po_id] if not pos_df.empty else None
-                grn_data = grns_df[grns_df['PO_ID'] == po_id] if not grns_df.empty else None
-                
-                if po_data is not None and not po_data.empty and grn_data is not None and not grn_data.empty:
-                    po_qty = po_data['Quantity'].iloc[0] if 'Quantity' in pos_df.columns else None
-                    grn_qty = grn_data['Quantity_Received'].iloc[0] if 'Quantity_Received' in grns_df.columns else None
-                    
-                    if po_qty is not None and grn_qty is not None:
-                        if 'over' in reason or 'more' in reason:
-                            # Over/more delivery if GRN > PO
-                            match = False if grn_qty > po_qty else True
-                            comment = f"Over-delivery: PO={po_qty}, GRN={grn_qty}" if grn_qty > po_qty else f"Normal delivery: {grn_qty}"
-                        elif 'under' in reason or 'less' in reason:
-                            # Under/less delivery if GRN < PO
-                            match = False if grn_qty < po_qty else True
-                            comment = f"Under-delivery: PO={po_qty}, GRN={grn_qty}" if grn_qty < po_qty else f"Normal delivery: {grn_qty}"
-                        else:
-                            match = grn_qty == po_qty
-                            comment = f"Qty comparison: PO={po_qty}, GRN={grn_qty}"
-                    else:
-                        match = False
-                        comment = "Quantity data incomplete"
-                else:
-                    match = False
-                    comment = "PO or GRN data not found"
-            
-            # Rule 7: Check for missing/no GRN
-            elif 'missing' in reason or 'no grn' in reason:
-                grn_data = grns_df[grns_df['PO_ID'] == po_id] if not grns_df.empty else None
-                match = False if grn_data is None or grn_data.empty else True
-                comment = "Missing GRN - discrepancy confirmed" if not match else "GRN exists"
-            
-            # Rule 8: Check for multiple GRNs or split shipments
-            elif 'multiple' in reason or 'split' in reason:
-                grn_data = grns_df[grns_df['PO_ID'] == po_id] if not grns_df.empty else None
-                grn_count = len(grn_data) if grn_data is not None else 0
-                match = False if grn_count > 1 else True
-                comment = f"Multiple GRNs: {grn_count}" if grn_count > 1 else f"Single GRN: {grn_count}"
-            
-            else:
-                # Unknown reason - mark as invalid discrepancy
-                match = False
-                comment = f"Unknown reason: {reason}"
-            
-            final_results.append({
-                "PO_ID": po_id,
-                "stated_reason": reason if reason else "No reason",
-                "Match/Not": match,
-                "Comments": comment
-            })
-        
-        # Create results DataFrame
-        final_df = pd.DataFrame(final_results)
-        
-        # Calculate statistics
-        match_count = final_df['Match/Not'].sum()
-        total_count = len(final_df)
-        mismatch_count = total_count - match_count
-        
-        summary_stats = {
-            'total_validations': int(total_count),
-            'match_count': int(match_count),
-            'mismatch_count': int(mismatch_count),
-            'match_rate': round((match_count / total_count * 100) if total_count > 0 else 0, 2),
-            'unique_po_count': int(final_df['PO_ID'].nunique()),
-        }
-        
-        # Reason-wise summary
-        reason_summary = []
-        for reason in final_df['stated_reason'].unique():
-            reason_data = final_df[final_df['stated_reason'] == reason]
-            reason_match_count = reason_data['Match/Not'].sum()
-            reason_total_count = len(reason_data)
-            
-            reason_summary.append({
-                'reason': reason,
-                'total_occurrences': int(reason_total_count),
-                'matched_count': int(reason_match_count),
-                'not_matched_count': int(reason_total_count - reason_match_count),
-                'match_rate': round((reason_match_count / reason_total_count * 100) if reason_total_count > 0 else 0, 2)
-            })
-        
-        # Sort by occurrences
-        reason_summary.sort(key=lambda x: x['total_occurrences'], reverse=True)
-        
-        # Save results
-        final_df.to_csv("final_reason_validation_results.csv", index=False)
-        print(f"✓ Validation results saved")
-        print(f"  Total Validations: {total_count}")
-        print(f"  Valid Reasons (Match): {match_count}")
-        print(f"  Invalid Reasons (Discrepancies): {mismatch_count}")
-        print(f"  Match Rate: {summary_stats['match_rate']}%")
-        print("=== Discrepancy Validation Completed ===\n")
-        
-        return {
-            "status": "success",
-            "summary_stats": summary_stats,
-            "reason_summary": reason_summary,
-            "validation_results": final_df.to_dict(orient='records')
-        }
+        response = submit_job("run-validation", wait, full=full, workers=VALIDATION_WORKERS)
+        if isinstance(response, dict) and response.get("status") == "success" and not summary_only:
+            with STAGE_SECONDS.time("serialization"):
+                response["validation_results"] = documents.get("validation").to_dict(orient='records')
+        return response
     
     except Exception as e:
         print(f"Error: {str(e)}")
@@ -952,111 +619,51 @@ def run_validation():
 
 
 @app.post("/calculate-penalties")
-def calculate_penalties():
+@profiled
+def calculate_penalties(wait: bool = False):
     """
     Calculate penalty metrics based on validation results.
     Shows total penalties and recoverable amounts.
+    Enqueues a background job and returns its id; wait=true returns the metrics.
     """
-    print("\n=== Calculating Penalties ===")
-    
     try:
-        current_dir = os.path.dirname(os.path.abspath(__file__))
-        parent_dir = os.path.dirname(current_dir)
-        uploads_path = os.path.join(parent_dir, "uploads")
-        
-        reasons_path = os.path.join(uploads_path, "reasons.csv")
-        validation_path = os.path.join(current_dir, "final_reason_validation_results.csv")
-        
-        if not os.path.exists(reasons_path):
-            return {"status": "error", "message": "Reasons file not found"}
-        
-        if not os.path.exists(validation_path):
-            return {"status": "error", "message": "Validation results not found. Run validation first."}
-        
-        # Load data
-        reasons_df = pd.read_csv(reasons_path)
-        validation_df = pd.read_csv(validation_path)
-        
-        print(f"✓ Loaded reasons.csv with {len(reasons_df)} records")
-        print(f"✓ Loaded validation results with {len(validation_df)} records")
-        
-        # Ensure penalty column is numeric
-        reasons_df['penalty'] = pd.to_numeric(reasons_df['penalty'], errors='coerce').fillna(0)
-        
-        total_penalty = float(reasons_df['penalty'].sum())
-        print(f"  Total penalty sum: ${total_penalty:.2f}")
-        
-        # Simple merge on PO_ID only (left join to keep all reasons)
-        merged_df = pd.merge(
-            reasons_df,
-            validation_df[['PO_ID', 'Match/Not']],
-            on='PO_ID',
-            how='left'
-        )
-        
-        # Fill NaN values for Match/Not (in case some POs don't have validation)
-        merged_df['Match/Not'] = merged_df['Match/Not'].fillna(True)
-        merged_df.to_csv('merged.csv')
-        print(f"  Merged records: {len(merged_df)}")
-        print(f"  Matched (Match/Not=True): {len(merged_df[merged_df['Match/Not'] == True])}")
-        print(f"  Not Matched (Match/Not=False): {len(merged_df[merged_df['Match/Not'] == False])}")
-        print(merged_df.columns)
-        # Recoverable = penalties where Match/Not is False (discrepancies)
-        recoverable_df = merged_df[merged_df['Match/Not'] == False]
-        recoverable_penalty = float(recoverable_df['penalty'].sum())
-        
-        print(f"  Recoverable penalty sum: ${recoverable_penalty:.2f}")
-        total_penalty = merged_df['penalty'].sum()
-        recovery_rate = (recoverable_penalty / total_penalty * 100) if total_penalty > 0 else 0
-        
-        pos_with_discrepancy = int(merged_df[merged_df['Match/Not'] == False]['PO_ID'].nunique())
-        
-        metrics = {
-            "total_penalty_claimed": round(total_penalty, 2),
-            "total_penalty_exposure": round(total_penalty, 2),
-            "penalty_that_can_be_saved": round(recoverable_penalty, 2),
-            "recoverable_amount": round(recoverable_penalty, 2),
-            "recovery_rate": round(recovery_rate, 2),
-            "percentage_saveable": round(recovery_rate, 1),
-            "pos_with_discrepancy": pos_with_discrepancy,
-            "total_pos": int(reasons_df['PO_ID'].nunique())
-        }
-        
-        print("✓ Penalties calculated")
-        print(f"  Total Exposure: ${metrics['total_penalty_exposure']}")
-        print(f"  Recoverable: ${metrics['recoverable_amount']}")
-        print(f"  Recovery Rate: {metrics['recovery_rate']}%")
-        print("=== Penalties Calculation Completed ===\n")
-        
-        return {
-            "status": "success",
-            "metrics": metrics
-        }
-        
+        return submit_job("calculate-penalties", wait)
+    
     except Exception as e:
         print(f"Error: {str(e)}")
         import traceback
         traceback.print_exc()
         return {"status": "error", "message": str(e)}
 
+@app.get("/jobs")
+def list_jobs():
+    """Recent background jobs, newest first"""
+    return {"status": "success", "jobs": job_runner.jobs()}
+
+@app.get("/jobs/{job_id}")
+def get_job(job_id: str):
+    """Status, stage, progress and (once finished) result or error of a background job"""
+    job = job_runner.get(job_id)
+    if job is None:
+        return JSONResponse(
+            status_code=404,
+            content={"status": "error", "message": "Job not found"}
+        )
+    return job.to_dict()
+
 @app.get("/penalties-by-po/{po_id}")
 def get_penalties_by_po(po_id: str):
     """Get all penalties associated with a specific PO"""
     try:
-        current_dir = os.path.dirname(os.path.abspath(__file__))
-        parent_dir = os.path.dirname(current_dir)
-        uploads_path = os.path.join(parent_dir, "uploads")
-        reasons_path = os.path.join(uploads_path, "reasons.csv")
+        # Hash lookup on the PO_ID index instead of scanning reasons.csv
+        filtered_df = documents.rows_for_po("reasons", po_id)
         
-        if not os.path.exists(reasons_path):
+        if filtered_df is None:
             return JSONResponse(
                 status_code=404,
                 content={"status": "error", "message": "Penalties data not found"}
             )
         
-        penalty_df = pd.read_csv(reasons_path)
-        filtered_df = penalty_df[penalty_df['PO_ID'] == po_id]
-        
         if filtered_df.empty:
             return {
                 "status": "success",
@@ -1067,7 +674,7 @@ def get_penalties_by_po(po_id: str):
         return {
             "status": "success",
             "po_id": po_id,
-            "penalties": filtered_df.to_dict('records')
+            "penalties": json_records(filtered_df)
         }
         
     except Exception as e:
@@ -1076,30 +683,64 @@ def get_penalties_by_po(po_id: str):
             content={"status": "error", "message": str(e)}
         )
 
+def penalty_index():
+    """Filter/sort index over reasons.csv, rebuilt when it or the reason classifier's files change"""
+    classifier_signature = reason_source_signature()
+    version = f"{documents.signature('reasons')}:{classifier_signature}"
+    return documents.derived(
+        "reasons",
+        ("penalty_index", classifier_signature),
+        lambda frame: PenaltyIndex(frame, bucket_categories(frame['reason'], default_classifier()), version),
+    )
+
 @app.get("/all-penalties")
-def get_all_penalties():
-    """Get all penalties data"""
+def get_all_penalties(
+    category: str = None,
+    approved: bool = None,
+    min_penalty: float = None,
+    max_penalty: float = None,
+    sort: str = None,
+    fields: str = None,
+    limit: int = DEFAULT_PAGE_SIZE,
+    cursor: str = None,
+):
+    """
+    Get a page of penalties.
+    Filter by reason category, approval state and penalty range; sort by a
+    field ("-field" for descending); project with fields=a,b; pass
+    next_cursor back as cursor for the following page.
+    """
     try:
-        current_dir = os.path.dirname(os.path.abspath(__file__))
-        parent_dir = os.path.dirname(current_dir)
-        uploads_path = os.path.join(parent_dir, "uploads")
-        reasons_path = os.path.join(uploads_path, "reasons.csv")
+        index = penalty_index()
         
-        if not os.path.exists(reasons_path):
+        if index is None:
             return JSONResponse(
                 status_code=404,
                 content={"status": "error", "message": "Penalties data not found"}
             )
         
-        penalty_df = pd.read_csv(reasons_path)
-        penalty_df['penalty'] = pd.to_numeric(penalty_df['penalty'], errors='coerce').fillna(0)
+        projection = parse_fields(fields, PenaltyIndex.FIELDS)
+        positions = index.query(
+            category=category, approved=approved, min_penalty=min_penalty, max_penalty=max_penalty, sort=sort
+        )
+        query = {
+            "category": category, "approved": approved, "min_penalty": min_penalty,
+            "max_penalty": max_penalty, "sort": sort,
+        }
+        page, next_cursor = paginate(positions, cursor, limit, index.version, query)
         
         return {
             "status": "success",
-            "total_records": len(penalty_df),
-            "penalties": penalty_df.to_dict(orient="records")
+            "total_records": len(positions),
+            "penalties": [project(record, projection) for record in index.records(page)],
+            "next_cursor": next_cursor
         }
         
+    except QueryError as e:
+        return JSONResponse(
+            status_code=400,
+            content={"status": "error", "message": str(e)}
+        )
     except Exception as e:
         return JSONResponse(
             status_code=500,
@@ -1127,7 +768,7 @@ def get_result_file(filename: str):
         parent_dir = os.path.dirname(current_dir)
         file_path = os.path.join(parent_dir, "uploads", filename)
     else:
-        file_path = filename
+        file_path = documents.path("validation")
     
     if not os.path.exists(file_path):
         return JSONResponse(
@@ -1137,14 +778,60 @@ def get_result_file(filename: str):
     
     return FileResponse(file_path, media_type="text/csv", filename=filename)
 
+@app.get("/export/{dataset}")
+def export_dataset(dataset: str, format: str = "ndjson", gzip: bool = False, result_id: str = None):
+    """
+    Stream validation results, penalties or merged data as NDJSON or CSV,
+    optionally gzipped. Rows are encoded chunk by chunk as the client reads.
+    Pass the result_id from /run-validation to make sure the export matches
+    that run (409 once newer results were written).
+    """
+    if format not in EXPORT_FORMATS:
+        return JSONResponse(
+            status_code=400,
+            content={"status": "error", "message": f"format must be one of: {', '.join(EXPORT_FORMATS)}"}
+        )
+    
+    if dataset == "validation":
+        if result_id and result_id != validation_result_id():
+            return JSONResponse(
+                status_code=409,
+                content={"status": "error", "message": "Validation results have changed since this result was produced"}
+            )
+        frame = documents.get("validation")
+        chunks = frame_chunks(frame) if frame is not None else None
+    elif dataset == "penalties":
+        frame = documents.get("reasons")
+        chunks = frame_chunks(frame) if frame is not None else None
+    elif dataset == "merged":
+        reasons_df, validation_df = documents.get("reasons"), documents.get("validation")
+        chunks = merged_chunks(reasons_df, validation_df) if reasons_df is not None and validation_df is not None else None
+    else:
+        return JSONResponse(
+            status_code=404,
+            content={"status": "error", "message": "Unknown dataset. Use validation, penalties or merged"}
+        )
+    
+    if chunks is None:
+        return JSONResponse(
+            status_code=404,
+            content={"status": "error", "message": f"No {dataset} data available"}
+        )
+    
+    filename = f"{dataset}.{format}" + (".gz" if gzip else "")
+    return StreamingResponse(
+        export_stream(chunks, format, gzip=gzip),
+        media_type="application/gzip" if gzip else EXPORT_FORMATS[format],
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
+
 @app.get("/results/unique-reasons")
 def get_unique_reasons():
     """Get unique reasons from validation results"""
     try:
-        current_dir = os.path.dirname(os.path.abspath(__file__))
-        results_file = os.path.join(current_dir, "final_reason_validation_results.csv")
-        
-        df = pd.read_csv(results_file)
+        df = documents.get("validation")
+        if df is None:
+            raise FileNotFoundError(documents.path("validation"))
         unique_reasons = sorted(df['stated_reason'].dropna().unique().tolist())
         
         return {"reasons": unique_reasons}
@@ -1158,39 +845,16 @@ def get_unique_reasons():
 
 @app.post("/save-penalty-approvals")
 def save_penalty_approvals(approvals: dict, username: str = Depends(verify_token)):
-    """Save admin penalty approvals to CSV"""
+    """Save admin penalty approvals (one transaction, reasons.csv is left untouched)"""
     try:
         # Check if user is admin
         user = get_user_by_username(username)
         if not user or user.get("role") != "admin":
             raise HTTPException(status_code=403, detail="Only admins can approve penalties")
         
-        current_dir = os.path.dirname(os.path.abspath(__file__))
-        parent_dir = os.path.dirname(current_dir)
-        
-        # Load existing reasons data
-        reasons_path = os.path.join(parent_dir, "uploads", "reasons.csv")
-        reasons_df = pd.read_csv(reasons_path)
-        
-        # Create approval tracking columns if they don't exist
-        if "admin_approved" not in reasons_df.columns:
-            reasons_df["admin_approved"] = False
-        if "admin_comments" not in reasons_df.columns:
-            reasons_df["admin_comments"] = ""
-        if "admin_username" not in reasons_df.columns:
-            reasons_df["admin_username"] = ""
-        
-        # Update approvals from the request
-        for po_id_str, approval_data in approvals.items():
-            # Find matching row
-            mask = reasons_df["PO_ID"] == po_id_str
-            if mask.any():
-                reasons_df.loc[mask, "admin_approved"] = approval_data.get("approved", False)
-                reasons_df.loc[mask, "admin_comments"] = approval_data.get("comments", "")
-                reasons_df.loc[mask, "admin_username"] = username
-        
-        # Save updated CSV
-        reasons_df.to_csv(reasons_path, index=False)
+        approvals_store.save(approvals, username)
+        if CHAT_RETRIEVAL:
+            retrieval.schedule_sync()
         
         print(f"Saved penalty approvals from {username}")
         
@@ -1205,91 +869,146 @@ def save_penalty_approvals(approvals: dict, username: str = Depends(verify_token
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
-@app.post("/chat")
-def chat(request: ChatRequest, username: str = Depends(verify_token)):
-    """Chat endpoint with validation results context"""
-    try:
-        print(f"[CHAT] Received message from {username}: {request.message[:50]}...")
-        
-        # Validate API key
-        if not GEMINI_API_KEY:
-            print("[CHAT ERROR] Gemini API key not configured")
-            raise HTTPException(status_code=500, detail="Gemini API key not configured")
-        
-        # Load context from validation results
-        validation_context = load_validation_context()
-        print("[CHAT] Validation context loaded")
-        
-        # Get conversation history (last 10 messages)
-        history_messages = get_context_window(request.session_id)
-        print(f"[CHAT] Loaded {len(history_messages)} history messages")
-        
-        # Build system prompt with validation data
-        system_prompt = f"""You are a helpful assistant for a Reconciliation system. 
+@app.get("/penalty-approvals/history")
+def penalty_approval_history(po_id: str = None, limit: int = 100, username: str = Depends(verify_token)):
+    """Audit trail of approval changes, newest first, optionally for one PO"""
+    user = get_user_by_username(username)
+    if not user or user.get("role") != "admin":
+        raise HTTPException(status_code=403, detail="Only admins can view approval history")
+    return {"status": "success", "history": approvals_store.history(po_id, max(1, min(limit, 1000)))}
+
+async def build_chat_prompt(request: ChatRequest) -> str:
+    """Build the Gemini prompt for a chat turn from validation context and history"""
+    # Load context from validation results (pandas work, kept off the event loop)
+    validation_context = await run_in_threadpool(load_validation_context)
+    print("[CHAT] Validation context loaded")
+    retrieved_records = await run_in_threadpool(load_retrieved_records, request.message)
+    if retrieved_records:
+        validation_context = f"""{validation_context}
+
+Records Relevant to This Question:
+{retrieved_records}"""
+    
+    # Get conversation history (last 10 messages)
+    history_messages = await get_context_window(request.session_id)
+    print(f"[CHAT] Loaded {len(history_messages)} history messages")
+    
+    # Build system prompt with validation data
+    system_prompt = f"""You are a helpful assistant for a Reconciliation system. 
 You have access to validation results for purchase orders and can help users understand discrepancies, penalties, and reconciliation issues.
 
 {validation_context}
 
 Help users understand the validation results, identify discrepancies, and explain penalties. Be concise and specific."""
-        
-        # Build messages for Gemini
-        # Gemini doesn't have a system role, so we'll prepend the system prompt to the user's message
-        conversation_history = []
-        for msg in history_messages:
-            conversation_history.append({
-                "role": msg["role"],
-                "parts": [{"text": msg["content"]}]
-            })
-        
-        # Create the full prompt with context
-        full_prompt = f"""{system_prompt}
+    
+    # Build messages for Gemini
+    # Gemini doesn't have a system role, so we'll prepend the system prompt to the user's message
+    conversation_history = []
+    for msg in history_messages:
+        conversation_history.append({
+            "role": msg["role"],
+            "parts": [{"text": msg["content"]}]
+        })
+    
+    # Create the full prompt with context
+    full_prompt = f"""{system_prompt}
 
 User Question: {request.message}"""
+    
+    print(f"[CHAT] Calling Gemini API with {len(conversation_history)} history messages...")
+    return full_prompt
+
+async def generate_chat_response(full_prompt: str, stream: bool = False):
+    """Call Gemini with the chat generation settings; returns an async chunk iterator when streaming"""
+    return await model.generate_content_async(
+        full_prompt,
+        stream=stream,
+        generation_config=genai.types.GenerationConfig(
+            max_output_tokens=4096,
+            temperature=0.7,
+        ),
+        safety_settings=[
+            {
+                "category": genai.types.HarmCategory.HARM_CATEGORY_HARASSMENT,
+                "threshold": genai.types.HarmBlockThreshold.BLOCK_NONE,
+            },
+            {
+                "category": genai.types.HarmCategory.HARM_CATEGORY_HATE_SPEECH,
+                "threshold": genai.types.HarmBlockThreshold.BLOCK_NONE,
+            },
+            {
+                "category": genai.types.HarmCategory.HARM_CATEGORY_SEXUALLY_EXPLICIT,
+                "threshold": genai.types.HarmBlockThreshold.BLOCK_NONE,
+            },
+            {
+                "category": genai.types.HarmCategory.HARM_CATEGORY_DANGEROUS_CONTENT,
+                "threshold": genai.types.HarmBlockThreshold.BLOCK_NONE,
+            },
+        ],
+    )
+
+async def persist_chat_turn(session_id: str, user_message: str, assistant_message: str):
+    """Save a completed turn to chat history and update the context cache"""
+    await run_in_threadpool(save_chat_message, session_id, user_message, assistant_message)
+    await save_chat_message_to_cache(session_id, user_message, assistant_message)
+    print("[CHAT] Message saved to history and cache")
+
+def sse_event(data: dict, event: str = None) -> str:
+    """Format one server-sent event"""
+    prefix = f"event: {event}\n" if event else ""
+    return f"{prefix}data: {json.dumps(data)}\n\n"
+
+def llm_busy_error(e: LLMQueueFull) -> HTTPException:
+    print(f"[CHAT] {e}")
+    return HTTPException(
+        status_code=429,
+        detail="Chat is busy, please retry shortly",
+        headers={"Retry-After": str(e.retry_after)}
+    )
+
+@app.post("/chat")
+async def chat(request: ChatRequest, username: str = Depends(verify_token)):
+    """Chat endpoint with validation results context"""
+    try:
+        print(f"[CHAT] Received message from {username}: {request.message[:50]}...")
         
-        print(f"[CHAT] Calling Gemini API with {len(conversation_history)} history messages...")
-        
-        # Call Gemini API with proper safety settings
-        response = model.generate_content(
-            full_prompt,
-            generation_config=genai.types.GenerationConfig(
-                max_output_tokens=4096,
-                temperature=0.7,
-            ),
-            safety_settings=[
-                {
-                    "category": genai.types.HarmCategory.HARM_CATEGORY_HARASSMENT,
-                    "threshold": genai.types.HarmBlockThreshold.BLOCK_NONE,
-                },
-                {
-                    "category": genai.types.HarmCategory.HARM_CATEGORY_HATE_SPEECH,
-                    "threshold": genai.types.HarmBlockThreshold.BLOCK_NONE,
-                },
-                {
-                    "category": genai.types.HarmCategory.HARM_CATEGORY_SEXUALLY_EXPLICIT,
-                    "threshold": genai.types.HarmBlockThreshold.BLOCK_NONE,
-                },
-                {
-                    "category": genai.types.HarmCategory.HARM_CATEGORY_DANGEROUS_CONTENT,
-                    "threshold": genai.types.HarmBlockThreshold.BLOCK_NONE,
-                },
-            ],
-        )
+        # Validate API key
+        if not GEMINI_API_KEY and not USE_FAKE_LLM:
+            print("[CHAT ERROR] Gemini API key not configured")
+            raise HTTPException(status_code=500, detail="Gemini API key not configured")
         
-        assistant_message = response.text
-        print(f"[CHAT] Received response: {assistant_message[:50]}...")
+        # Repeated questions against unchanged results are answered from the cache
+        cache_version = await run_in_threadpool(chat_cache_version)
+        assistant_message, cache_info = await response_cache.lookup(request.message, cache_version)
+        if assistant_message is not None:
+            print(f"[CHAT] Response cache hit ({cache_info['tier']})")
+        else:
+            # Shed load before doing any work if the LLM queue is already full
+            llm_limiter.ensure_capacity()
+            full_prompt = await build_chat_prompt(request)
+            
+            # Call Gemini API with proper safety settings
+            async with llm_limiter.slot():
+                with STAGE_SECONDS.time("llm_call"):
+                    response = await generate_chat_response(full_prompt)
+            
+            assistant_message = response.text
+            print(f"[CHAT] Received response: {assistant_message[:50]}...")
+            await response_cache.store(request.message, cache_version, assistant_message)
         
         # Save to chat history and update cache
-        save_chat_message(request.session_id, request.message, assistant_message)
-        save_chat_message_to_cache(request.session_id, request.message, assistant_message)
-        print("[CHAT] Message saved to history and cache")
+        await persist_chat_turn(request.session_id, request.message, assistant_message)
         
         return ChatResponse(
             session_id=request.session_id,
             user_message=request.message,
             assistant_message=assistant_message,
-            timestamp=datetime.utcnow().isoformat()
+            timestamp=datetime.utcnow().isoformat(),
+            cache=cache_info or {"hit": False}
         )
     
+    except LLMQueueFull as e:
+        raise llm_busy_error(e)
     except HTTPException:
         raise
     except Exception as e:
@@ -1299,6 +1018,93 @@ User Question: {request.message}"""
         traceback.print_exc()
         raise HTTPException(status_code=500, detail=f"Chat error: {error_msg}")
 
+@app.post("/chat/stream")
+async def chat_stream(request: ChatRequest, http_request: Request, username: str = Depends(verify_token)):
+    """
+    Streaming chat endpoint. Emits server-sent events:
+    `data: {"delta": ...}` per generated chunk, then `event: done` with the
+    full ChatResponse, or `event: error` if generation fails mid-stream.
+    The turn is persisted only after the stream completes.
+    """
+    print(f"[CHAT] Received streaming message from {username}: {request.message[:50]}...")
+    
+    if not GEMINI_API_KEY and not USE_FAKE_LLM:
+        print("[CHAT ERROR] Gemini API key not configured")
+        raise HTTPException(status_code=500, detail="Gemini API key not configured")
+    
+    try:
+        cache_version = await run_in_threadpool(chat_cache_version)
+        cached_message, cache_info = await response_cache.lookup(request.message, cache_version)
+        if cached_message is None:
+            llm_limiter.ensure_capacity()
+            full_prompt = await build_chat_prompt(request)
+    except LLMQueueFull as e:
+        raise llm_busy_error(e)
+    except Exception as e:
+        print(f"[CHAT ERROR] {e}")
+        raise HTTPException(status_code=500, detail=f"Chat error: {str(e)}")
+    
+    async def event_stream():
+        chunks = []
+        completed = failed = False
+        if cached_message is not None:
+            print(f"[CHAT] Response cache hit ({cache_info['tier']})")
+            chunks.append(cached_message)
+            completed = True
+            yield sse_event({"delta": cached_message})
+        else:
+            try:
+                # The LLM slot is held for the whole stream, not just the first byte
+                async with llm_limiter.slot():
+                    with STAGE_SECONDS.time("llm_call"):
+                        stream = await generate_chat_response(full_prompt, stream=True)
+                        async for chunk in stream:
+                            if await http_request.is_disconnected():
+                                break
+                            text = chunk.text
+                            if text:
+                                chunks.append(text)
+                                yield sse_event({"delta": text})
+                        else:
+                            completed = True
+            except LLMQueueFull as e:
+                failed = True
+                yield sse_event({"detail": "Chat is busy, please retry shortly", "retry_after": e.retry_after}, event="error")
+                return
+            except Exception as e:
+                failed = True
+                print(f"[CHAT ERROR] Stream failed: {e}")
+                yield sse_event({"detail": f"Chat error: {str(e)}"}, event="error")
+                return
+            finally:
+                if not completed and not failed:
+                    print(f"[CHAT] Client disconnected from session {request.session_id}; turn not saved")
+        if not completed:
+            return
+        
+        assistant_message = "".join(chunks)
+        print(f"[CHAT] Streamed response: {assistant_message[:50]}...")
+        if cached_message is None:
+            await response_cache.store(request.message, cache_version, assistant_message)
+        await persist_chat_turn(request.session_id, request.message, assistant_message)
+        
+        yield sse_event(
+            ChatResponse(
+                session_id=request.session_id,
+                user_message=request.message,
+                assistant_message=assistant_message,
+                timestamp=datetime.utcnow().isoformat(),
+                cache=cache_info or {"hit": False}
+            ).model_dump(),
+            event="done"
+        )
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 @app.get("/chat-history/{session_id}")
 def get_chat_history(session_id: str, username: str = Depends(verify_token)):
     """Get chat history for a session"""
@@ -1326,6 +1132,71 @@ def health_check():
     """Public health check endpoint (no authentication required)"""
     return {"status": "ok"}
 
+def cache_lookups() -> dict:
+    """(hits, misses) of each cache, by the name used in the cache label"""
+    local = chat_cache.local.stats()
+    responses = response_cache.stats()
+    context = validation_context.stats()
+    return {
+        "chat_local": (local["hits"], local["misses"]),
+        "chat_response": (responses["exact_hits"] + responses["similar_hits"], responses["misses"]),
+        "validation_context": (context["hits"], context["rebuilds"]),
+    }
+
+# Read at scrape time from the components' own counters, so the hot paths pay nothing extra
+GaugeCallback("chat_llm_in_flight", "Chat LLM calls currently running", lambda: llm_limiter.in_flight)
+GaugeCallback("chat_llm_waiting", "Chat LLM calls waiting for a slot", lambda: llm_limiter.waiting)
+GaugeCallback(
+    "cache_hit_ratio", "Hits over lookups since startup",
+    lambda: {(name,): hits / (hits + misses) if hits + misses else 0.0
+             for name, (hits, misses) in cache_lookups().items()},
+    ("cache",),
+)
+CounterCallback(
+    "cache_lookups_total", "Cache lookups since startup",
+    lambda: {(name, result): count for name, counts in cache_lookups().items()
+             for result, count in zip(("hit", "miss"), counts)},
+    ("cache", "result"),
+)
+GaugeCallback("redis_circuit_open", "1 while Redis is skipped by the circuit breaker",
+              lambda: 0 if redis_breaker.available else 1)
+
+@app.get("/metrics", include_in_schema=False)
+def metrics():
+    """Prometheus text exposition of the metrics above (no authentication, like /health)"""
+    return Response(REGISTRY.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+@app.get("/profiles")
+def list_profiles(username: str = Depends(verify_token)):
+    """Stored request and job profiles, newest first (admins only)"""
+    user = get_user_by_username(username)
+    if not user or user.get("role") != "admin":
+        raise HTTPException(status_code=403, detail="Only admins can view profiles")
+    return {"status": "success", "profiles": profiles.list()}
+
+@app.get("/profiles/{profile_id}")
+def get_profile(profile_id: str, username: str = Depends(verify_token)):
+    """Summary of a profile: duration, memory peak and top allocation sites, hottest functions"""
+    user = get_user_by_username(username)
+    if not user or user.get("role") != "admin":
+        raise HTTPException(status_code=403, detail="Only admins can view profiles")
+    try:
+        return {"status": "success", "profile": profiles.get(profile_id)}
+    except KeyError:
+        return JSONResponse(status_code=404, content={"status": "error", "message": "Profile not found"})
+
+@app.get("/profiles/{profile_id}/folded")
+def download_profile(profile_id: str, username: str = Depends(verify_token)):
+    """Sampled stacks in the collapsed format read by flamegraph.pl, speedscope and inferno"""
+    user = get_user_by_username(username)
+    if not user or user.get("role") != "admin":
+        raise HTTPException(status_code=403, detail="Only admins can view profiles")
+    try:
+        path = profiles.folded_path(profile_id)
+    except KeyError:
+        return JSONResponse(status_code=404, content={"status": "error", "message": "Profile not found"})
+    return FileResponse(path, media_type="text/plain", filename=f"profile-{profile_id}.folded")
+
 @app.get("/chat/health")
 def chat_health_check(username: str = Depends(verify_token)):
     """Check if chat system is healthy"""
@@ -1339,6 +1210,10 @@ def chat_health_check(username: str = Depends(verify_token)):
             "status": "healthy",
             "api_key_configured": api_key_present,
             "validation_file_exists": validation_file_exists,
+            "context_cache": validation_context.stats(),
+            "retrieval": dict(retrieval.stats(), enabled=CHAT_RETRIEVAL, top_k=CHAT_RETRIEVAL_TOP_K),
+            "response_cache": response_cache.stats(),
+            "cache": chat_cache.stats(),
             "model": "gemini-2.5-flash",
             "message": "Chat system is ready with Gemini 2.5 Flash"
         }
@@ -0,0 +1,115 @@
+# Sharded validation: reasons and documents partitioned by PO_ID across processes
+import multiprocessing
+import multiprocessing.util
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from backend.validation_engine import VALIDATION_COLUMNS, normalize_po_ids, validate_reasons
+
+# Below this many reasons the pickling and IPC cost outweighs the speedup
+PARALLEL_MIN_ROWS = 50_000
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def _pool(workers: int) -> ProcessPoolExecutor:
+    """Process pool of `workers` processes, started once and reused"""
+    with _pools_lock:
+        pool = _pools.get(workers)
+        if pool is None:
+            pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+            _pools[workers] = pool
+            print(f"[VALIDATION] Started {workers} shard workers")
+        return pool
+
+
+def shutdown_pools():
+    with _pools_lock:
+        for pool in _pools.values():
+            pool.shutdown(wait=True, cancel_futures=True)
+        _pools.clear()
+
+
+# A multiprocessing finalizer rather than atexit: job worker processes skip
+# atexit handlers but join their children on exit, which would never return
+# while the shard workers are still waiting for work. It has to run (and
+# finish) before the pool's own queues are closed at priority 10.
+multiprocessing.util.Finalize(None, shutdown_pools, exitpriority=100)
+
+
+def shard_keys(keys: list, shards: int) -> list:
+    """
+    Shard number for every PO_ID in each key array. Keys are factorized
+    together and only the unique values are hashed, so equal PO_IDs land in
+    the same shard whichever table they come from.
+    """
+    codes, uniques = pd.factorize(np.concatenate(keys))
+    hashes = pd.util.hash_array(np.asarray(uniques, dtype=object)) % np.uint64(shards)
+    # Missing PO_IDs (code -1) never match anything; park them in shard 0
+    shard_ids = np.append(hashes.astype(np.int64), 0)[codes]
+    return np.split(shard_ids, np.cumsum([len(k) for k in keys])[:-1])
+
+
+def _split(df: pd.DataFrame, name: str, shard_ids: np.ndarray, shards: int):
+    """
+    (row positions per shard, table per shard) holding only the columns the
+    engine reads. A stable sort keeps input row order inside each shard, so
+    the first document row per PO is the same one the serial engine picks.
+    """
+    df = df[[column for column in VALIDATION_COLUMNS[name] if column in df.columns]]
+    order = np.argsort(shard_ids, kind="stable")
+    bounds = np.searchsorted(shard_ids[order], np.arange(shards + 1))
+    df = df.take(order)
+    positions = [order[bounds[i]:bounds[i + 1]] for i in range(shards)]
+    return positions, [df.iloc[bounds[i]:bounds[i + 1]] for i in range(shards)]
+
+
+def partition(reasons_df, pos_df, asns_df, grns_df, invoices_df, shards: int):
+    """[(reason positions, shard tables)] with every row in the shard of its PO_ID"""
+    documents = {"pos": pos_df, "asns": asns_df, "grns": grns_df, "invoices": invoices_df}
+    present = [name for name, df in documents.items() if not df.empty]
+    reason_shards, *document_shards = shard_keys(
+        [normalize_po_ids(reasons_df['PO_ID'])] + [documents[name]['PO_ID'].to_numpy(dtype=object) for name in present],
+        shards,
+    )
+
+    positions, reason_parts = _split(reasons_df, "reasons", reason_shards, shards)
+    document_parts = {name: [df] * shards for name, df in documents.items()}
+    for name, shard_ids in zip(present, document_shards):
+        document_parts[name] = _split(documents[name], name, shard_ids, shards)[1]
+
+    return [
+        (positions[shard], [reason_parts[shard]] + [parts[shard] for parts in document_parts.values()])
+        for shard in range(shards) if len(positions[shard])
+    ]
+
+
+def validate_sharded(reasons_df, pos_df, asns_df, grns_df, invoices_df, workers: int = 1,
+                     min_rows: int = PARALLEL_MIN_ROWS) -> pd.DataFrame:
+    """
+    validate_reasons() split into one shard per worker by a hash of PO_ID.
+
+    Shard results are put back in the original reason order, so the frame
+    (and the reason-wise summary computed from it) is identical to a serial
+    run for any worker count. Runs serially for small inputs or workers <= 1.
+    """
+    if workers <= 1 or len(reasons_df) < min_rows:
+        return validate_reasons(reasons_df, pos_df, asns_df, grns_df, invoices_df)
+
+    parts = partition(reasons_df, pos_df, asns_df, grns_df, invoices_df, workers)
+    pool = _pool(workers)
+    futures = [pool.submit(validate_reasons, *tables) for _, tables in parts]
+
+    n = len(reasons_df)
+    columns = {column: np.empty(n, dtype=bool if column == "Match/Not" else object)
+               for column in ("PO_ID", "stated_reason", "Match/Not", "Comments")}
+    for (positions, _), future in zip(parts, futures):
+        shard_df = future.result()
+        for column, values in columns.items():
+            values[positions] = shard_df[column].to_numpy()
+    print(f"[VALIDATION] Validated {n} reasons in {len(parts)} shards")
+    return pd.DataFrame(columns)
@@ -0,0 +1,65 @@
+# Argon2 password hashing on its own bounded thread pool
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from passlib.context import CryptContext
+
+
+class HasherBusy(Exception):
+    """Raised when every hashing thread is busy and the wait queue is at capacity"""
+
+    def __init__(self, retry_after: int):
+        super().__init__(f"Password hashing queue is full, retry after {retry_after}s")
+        self.retry_after = retry_after
+
+
+class PasswordHasher:
+    """
+    Argon2 hash/verify off the event loop and off the shared request
+    thread pool.
+
+    Work runs on `max_workers` dedicated threads (argon2 releases the GIL
+    while hashing). Up to `max_queue` further calls wait for a thread;
+    beyond that HasherBusy is raised so signup/login can answer 429 instead
+    of a login storm starving every other endpoint. Cost parameters left as
+    None keep passlib's defaults; hashes made with other parameters verify
+    as before and are reported for rehashing by verify_and_update().
+    """
+
+    def __init__(self, time_cost: int = None, memory_cost: int = None, parallelism: int = None,
+                 max_workers: int = 2, max_queue: int = 32, retry_after: int = 2):
+        costs = {"time_cost": time_cost, "memory_cost": memory_cost, "parallelism": parallelism}
+        self.context = CryptContext(
+            schemes=["argon2"], deprecated="auto",
+            **{f"argon2__{name}": value for name, value in costs.items() if value is not None}
+        )
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self.retry_after = retry_after
+        self.pending = 0
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="argon2")
+
+    def _done(self, _future):
+        with self._lock:
+            self.pending -= 1
+
+    async def _run(self, fn, *args):
+        with self._lock:
+            if self.pending >= self.max_workers + self.max_queue:
+                raise HasherBusy(self.retry_after)
+            self.pending += 1
+        future = self._executor.submit(fn, *args)
+        future.add_done_callback(self._done)
+        return await asyncio.wrap_future(future)
+
+    async def hash(self, password: str) -> str:
+        return await self._run(self.context.hash, password)
+
+    async def verify_and_update(self, password: str, hashed: str):
+        """(matches, new hash or None); a new hash means the stored one uses outdated parameters"""
+        return await self._run(self.context.verify_and_update, password, hashed)
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
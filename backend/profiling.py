@@ -0,0 +1,369 @@
+# Opt-in request profiling: sampled stacks (flamegraph-ready) and a tracemalloc peak summary
+import json
+import os
+import sys
+import threading
+import time
+import tracemalloc
+import uuid
+from collections import Counter
+from contextvars import ContextVar
+from datetime import datetime
+from functools import wraps
+from urllib.parse import parse_qs
+
+from fastapi.concurrency import run_in_threadpool
+
+# The event loop waiting in its selector for I/O: idle, not part of any request
+IDLE_FRAMES = {"select"}
+
+_active = ContextVar("active_profile", default=None)
+
+
+def _frame_name(code) -> str:
+    path = code.co_filename.replace("\\", "/").split("/")
+    return f"{code.co_qualname} ({'/'.join(path[-2:])}:{code.co_firstlineno})"
+
+
+def _collapse(frame, names: dict) -> str:
+    """`outermost;...;innermost` frame names, as flamegraph.pl, speedscope and inferno read them"""
+    stack = []
+    while frame is not None:
+        code = frame.f_code
+        name = names.get(code)
+        if name is None:
+            name = names[code] = _frame_name(code)
+        stack.append(name)
+        frame = frame.f_back
+    stack.reverse()
+    return ";".join(stack)
+
+
+class StackSampler:
+    """
+    Samples the Python stacks of a set of threads every `interval` seconds.
+
+    Sampling instead of cProfile keeps the overhead to well under a
+    percent at the default interval, does not inflate tight pure-Python
+    loops (iterrows, apply) the way per-call tracing does, and records
+    whole stacks, which is what a flamegraph needs. A sample is wall-clock
+    time of a thread, so time spent waiting (on a job, a lock, I/O) shows
+    up too, under the frame that waits.
+    """
+
+    def __init__(self, interval: float = 0.005):
+        self.interval = interval
+        self.stacks = Counter()
+        self.samples = 0
+        self._threads = Counter()
+        self._names = {}
+        self._stop = threading.Event()
+        self._thread = None
+
+    def add_thread(self, thread_id: int):
+        self._threads[thread_id] += 1
+
+    def remove_thread(self, thread_id: int):
+        self._threads[thread_id] -= 1
+        if self._threads[thread_id] <= 0:
+            del self._threads[thread_id]
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="profile-sampler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frames = sys._current_frames()
+            for thread_id in list(self._threads):
+                frame = frames.get(thread_id)
+                if frame is None or frame.f_code.co_name in IDLE_FRAMES:
+                    continue
+                self.stacks[_collapse(frame, self._names)] += 1
+                self.samples += 1
+
+
+class _Tracemalloc:
+    """tracemalloc is process-wide: traced while at least one profile runs"""
+
+    def __init__(self):
+        self._users = 0
+        self._lock = threading.Lock()
+
+    def start(self) -> int:
+        """Traced bytes at the start, with the peak reset to them"""
+        with self._lock:
+            self._users += 1
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+            tracemalloc.reset_peak()
+            return tracemalloc.get_traced_memory()[0]
+
+    def stop(self, baseline: int, top: int = 15) -> dict:
+        current, peak = tracemalloc.get_traced_memory()
+        snapshot = tracemalloc.take_snapshot().filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, __file__),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap*>"),
+        ))
+        with self._lock:
+            self._users -= 1
+            if self._users == 0:
+                tracemalloc.stop()
+        return {
+            "peak_bytes": max(peak - baseline, 0),
+            "net_bytes": current - baseline,
+            "concurrent_profiles": self._users,
+            "top_allocations": [
+                {"site": str(stat.traceback[0]), "bytes": stat.size, "blocks": stat.count}
+                for stat in snapshot.statistics("lineno")[:top]
+            ],
+        }
+
+
+TRACEMALLOC = _Tracemalloc()
+
+
+class Profile:
+    """
+    One profiled unit of work: a request, or a job in a worker process.
+
+    Samples the threads registered with it (the one that started it, and
+    any that enter it with `profiled`) and traces allocations meanwhile.
+    Memory figures are process-wide, so profiles that overlap in time share
+    their peak; `concurrent_profiles` in the summary says when that happened.
+    Tracing allocations slows allocation-heavy code (iterrows) by up to
+    about 2.5x, so profiled durations read high; compare them with each
+    other rather than with unprofiled requests.
+    """
+
+    def __init__(self, interval: float = 0.005, **meta):
+        self.profile_id = uuid.uuid4().hex[:12]
+        self.meta = dict(meta)
+        self.sampler = StackSampler(interval)
+        self._baseline = 0
+        self._started = 0.0
+
+    def start(self):
+        self.meta["started_at"] = datetime.utcnow().isoformat()
+        self._started = time.perf_counter()
+        self._baseline = TRACEMALLOC.start()
+        self.sampler.add_thread(threading.get_ident())
+        self.sampler.start()
+
+    def stop(self) -> dict:
+        """Summary and stacks; a plain dict, so it can be returned from a worker process"""
+        self.sampler.stop()
+        duration = time.perf_counter() - self._started
+        memory = TRACEMALLOC.stop(self._baseline)
+        return {
+            **self.meta,
+            "profile_id": self.profile_id,
+            "duration_ms": round(duration * 1000, 2),
+            "interval_ms": self.sampler.interval * 1000,
+            "samples": self.sampler.samples,
+            "memory": memory,
+            "stacks": dict(self.sampler.stacks),
+        }
+
+    def __enter__(self):
+        self.start()
+        self._token = _active.set(self)
+        return self
+
+    def __exit__(self, *exc_info):
+        _active.reset(self._token)
+
+
+def current_profile():
+    """The profile of the running request, or None"""
+    return _active.get()
+
+
+def profiled(func):
+    """
+    Let the request profile sample a sync endpoint's own thread.
+
+    Sync endpoints run on the threadpool, which the sampler would not
+    otherwise watch; the profile itself comes from ProfilingMiddleware
+    through the copied request context.
+    """
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        profile = _active.get()
+        if profile is None:
+            return func(*args, **kwargs)
+        thread_id = threading.get_ident()
+        profile.sampler.add_thread(thread_id)
+        try:
+            return func(*args, **kwargs)
+        finally:
+            profile.sampler.remove_thread(thread_id)
+    return wrapper
+
+
+def run_profiled(name: str, task, *args, **kwargs):
+    """Run a job task under a Profile in its worker process; the result gains a "profile" entry"""
+    profile = Profile(name=name)
+    profile.start()
+    try:
+        result = task(*args, **kwargs)
+    finally:
+        data = profile.stop()
+    return dict(result, profile=data)
+
+
+def top_frames(stacks: dict, limit: int = 20) -> list:
+    """Functions by sampled self and total time, from collapsed stacks"""
+    own, total = Counter(), Counter()
+    for stack, count in stacks.items():
+        frames = stack.split(";")
+        own[frames[-1]] += count
+        for frame in set(frames):
+            total[frame] += count
+    samples = sum(stacks.values()) or 1
+    return [
+        {"frame": frame, "self": count, "self_pct": round(100 * count / samples, 1),
+         "total_pct": round(100 * total[frame] / samples, 1)}
+        for frame, count in own.most_common(limit)
+    ]
+
+
+class ProfileStore:
+    """
+    Finished profiles on disk, newest `max_profiles` kept.
+
+    Each profile is `<id>.json` (the summary) next to `<id>.folded`, its
+    stacks in the collapsed format: one `frame;frame;frame count` line per
+    distinct stack, ready for flamegraph.pl, speedscope or inferno.
+    """
+
+    def __init__(self, directory: str, max_profiles: int = 50):
+        self.directory = directory
+        self.max_profiles = max_profiles
+        self._lock = threading.Lock()
+
+    def _path(self, profile_id: str, extension: str) -> str:
+        if not profile_id.isalnum():
+            raise KeyError(profile_id)
+        return os.path.join(self.directory, f"{profile_id}.{extension}")
+
+    def save(self, data: dict) -> dict:
+        stacks = data.pop("stacks")
+        summary = dict(data, top_frames=top_frames(stacks))
+        with self._lock:
+            os.makedirs(self.directory, exist_ok=True)
+            with open(self._path(summary["profile_id"], "folded"), "w") as f:
+                for stack, count in sorted(stacks.items()):
+                    f.write(f"{stack} {count}\n")
+            with open(self._path(summary["profile_id"], "json"), "w") as f:
+                json.dump(summary, f)
+            self._trim()
+        print(f"[PROFILE] Saved {summary['profile_id']} ({summary.get('name')}): "
+              f"{summary['duration_ms']}ms, {summary['samples']} samples, "
+              f"peak {summary['memory']['peak_bytes'] / 1e6:.1f}MB")
+        return summary
+
+    def _ids(self) -> list:
+        """Stored ids, oldest first"""
+        if not os.path.isdir(self.directory):
+            return []
+        names = [name for name in os.listdir(self.directory) if name.endswith(".json")]
+        names.sort(key=lambda name: os.path.getmtime(os.path.join(self.directory, name)))
+        return [name[:-len(".json")] for name in names]
+
+    def _trim(self):
+        for profile_id in self._ids()[:-self.max_profiles or None]:
+            for extension in ("json", "folded"):
+                try:
+                    os.remove(self._path(profile_id, extension))
+                except FileNotFoundError:
+                    pass
+
+    def list(self) -> list:
+        """Summaries, newest first, without their top frames and allocation sites"""
+        summaries = []
+        for profile_id in reversed(self._ids()):
+            try:
+                summary = self.get(profile_id)
+            except KeyError:
+                continue
+            summary.pop("top_frames", None)
+            summary["memory"] = {key: summary["memory"][key] for key in ("peak_bytes", "net_bytes")}
+            summaries.append(summary)
+        return summaries
+
+    def get(self, profile_id: str) -> dict:
+        try:
+            with open(self._path(profile_id, "json")) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            raise KeyError(profile_id)
+
+    def folded_path(self, profile_id: str) -> str:
+        path = self._path(profile_id, "folded")
+        if not os.path.exists(path):
+            raise KeyError(profile_id)
+        return path
+
+
+class ProfilingMiddleware:
+    """
+    ASGI middleware profiling requests to `paths` (prefixes).
+
+    A request is profiled when `always` is set, or when it asks with an
+    `X-Profile: 1` header or a `profile=1` query parameter and
+    `authorize(authorization header)` (run on the threadpool) allows it.
+    The event loop thread is sampled for the whole request, covering
+    response encoding; sync endpoints decorated with `profiled` add their
+    own thread. The response carries the stored profile's id in an
+    X-Profile-Id header.
+    """
+
+    def __init__(self, app, store: ProfileStore, authorize, paths: tuple = ("/api/",), always: bool = False,
+                 interval: float = 0.005):
+        self.app = app
+        self.store = store
+        self.authorize = authorize
+        self.paths = tuple(paths)
+        self.always = always
+        self.interval = interval
+
+    async def _requested(self, scope) -> bool:
+        if self.always:
+            return True
+        headers = dict(scope["headers"])
+        query = parse_qs(scope.get("query_string", b"").decode())
+        flag = headers.get(b"x-profile", b"").decode() or query.get("profile", [""])[0]
+        if flag.lower() not in ("1", "true", "yes"):
+            return False
+        return await run_in_threadpool(self.authorize, headers.get(b"authorization", b"").decode())
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not scope["path"].startswith(self.paths) or not await self._requested(scope):
+            await self.app(scope, receive, send)
+            return
+        profile = Profile(
+            self.interval, name=f"{scope['method']} {scope['path']}",
+            query=scope.get("query_string", b"").decode(), status=None,
+        )
+
+        async def send_with_id(message):
+            if message["type"] == "http.response.start":
+                profile.meta["status"] = message["status"]
+                message = dict(message, headers=[
+                    *message.get("headers", []), (b"x-profile-id", profile.profile_id.encode())
+                ])
+            await send(message)
+
+        with profile:
+            try:
+                await self.app(scope, receive, send_with_id)
+            finally:
+                data = profile.stop()
+                await run_in_threadpool(self.store.save, data)
@@ -0,0 +1,146 @@
+# Stated-reason classifier shared by the validation engine and the analytics endpoints
+#
+# reason_buckets.json (reason -> dashboard category), uploads/raw_reason_map.json
+# (alias -> canonical reason) and the validation rule keywords are compiled
+# into one exact-match table. Every reason those files name is resolved when
+# the classifier is built; any other text falls back to the keyword chain.
+# Raw values are memoized in front of both, so each distinct reason is
+# normalized and classified once per classifier.
+import json
+import os
+import threading
+from typing import NamedTuple
+
+import numpy as np
+import pandas as pd
+
+from backend.document_store import BACKEND_DIR, file_signature
+
+REASON_BUCKETS_FILE = os.path.join(os.path.dirname(BACKEND_DIR), "reasons_validation", "reason_buckets.json")
+RAW_REASON_MAP_FILE = os.path.join(os.path.dirname(BACKEND_DIR), "uploads", "raw_reason_map.json")
+
+UNSPECIFIED_CATEGORY = "Unspecified Issue"
+
+# Stated reasons that mean "nothing to validate"
+NO_REASON_VALUES = ['no reason', 'no issues', 'none', '']
+
+# Keyword rules in evaluation order. A reason belongs to the first rule
+# whose keywords it contains, exactly like the original if/elif chain.
+RULE_KEYWORDS = [
+    ("late", ['late', 'delivered']),
+    ("quantity", ['quantity', 'qty', 'mismatch']),
+    ("price", ['price', 'currency']),
+    ("asn_grn", ['asn', 'grn', 'shipment']),
+    ("over_under", ['delivered', 'received', 'over', 'under', 'more', 'less']),
+    ("missing_grn", ['missing', 'no grn']),
+    ("split", ['multiple', 'split']),
+]
+
+# Raw reasons memoized per classifier, so a file of unique comments can't
+# grow the memo without bound
+MEMO_LIMIT = 100_000
+
+
+class ReasonClass(NamedTuple):
+    reason: str     # stripped, lower-cased text
+    rule: str       # validation rule, "none" or "unknown"
+    direction: str  # over/under/equal comparison for the over_under rule
+    canonical: str  # raw_reason_map label, or the reason itself
+    bucket: str     # dashboard category
+
+
+def normalize_reason(reason) -> str:
+    return str(reason).strip().lower()
+
+
+def read_json(path: str) -> dict:
+    if not os.path.exists(path):
+        return {}
+    with open(path, 'r') as f:
+        return json.load(f)
+
+
+class ReasonClassifier:
+    def __init__(self, reason_buckets: dict = None, raw_reason_map: dict = None, rule_keywords=RULE_KEYWORDS):
+        self.reason_buckets = {normalize_reason(k): v for k, v in (reason_buckets or {}).items()}
+        self.raw_reason_map = {normalize_reason(k): v for k, v in (raw_reason_map or {}).items()}
+        self.rule_keywords = rule_keywords
+
+        known = set(NO_REASON_VALUES) | set(self.reason_buckets) | set(self.raw_reason_map)
+        known |= {normalize_reason(label) for label in self.raw_reason_map.values()}
+        self._table = {reason: self._compile(reason) for reason in known}
+        self._memo = {}
+
+    def _rule(self, reason: str) -> str:
+        if reason in NO_REASON_VALUES:
+            return "none"
+        for rule, keywords in self.rule_keywords:
+            for keyword in keywords:
+                if keyword in reason:
+                    return rule
+        return "unknown"
+
+    def _compile(self, reason: str) -> ReasonClass:
+        rule = self._rule(reason)
+        if 'over' in reason or 'more' in reason:
+            direction = "over"
+        elif 'under' in reason or 'less' in reason:
+            direction = "under"
+        else:
+            direction = "equal"
+
+        # Aliases missing from reason_buckets.json take their canonical reason's bucket
+        canonical = self.raw_reason_map.get(reason, reason)
+        bucket = self.reason_buckets.get(reason)
+        if bucket is None:
+            bucket = self.reason_buckets.get(normalize_reason(canonical), UNSPECIFIED_CATEGORY)
+        return ReasonClass(reason, rule, direction, canonical, bucket)
+
+    def classify(self, reason) -> ReasonClass:
+        """Classification of one raw stated reason"""
+        entry = self._memo.get(reason)
+        if entry is None:
+            key = normalize_reason(reason)
+            entry = self._table.get(key) or self._compile(key)
+            if len(self._memo) < MEMO_LIMIT:
+                self._memo[reason] = entry
+        return entry
+
+    def classify_series(self, reasons: pd.Series, fields=ReasonClass._fields) -> pd.DataFrame:
+        """
+        The given ReasonClass fields for a column of raw reasons, as
+        categoricals on the same index. Distinct reasons are classified once
+        (a categorical column reuses its categories) and broadcast by code.
+        """
+        if isinstance(reasons.dtype, pd.CategoricalDtype):
+            codes, uniques = reasons.cat.codes.to_numpy(), reasons.cat.categories
+        else:
+            codes, uniques = pd.factorize(reasons)
+        # Missing reasons (code -1) classify like the text "nan", as str() would
+        entries = [self.classify(reason) for reason in uniques] + [self.classify(np.nan)]
+        columns = {}
+        for field in fields:
+            index = ReasonClass._fields.index(field)
+            label_codes, categories = pd.factorize(np.array([entry[index] for entry in entries], dtype=object))
+            columns[field] = pd.Categorical.from_codes(label_codes[codes], categories=pd.Index(categories, dtype=object))
+        return pd.DataFrame(columns, index=reasons.index)
+
+
+_default = None
+_default_lock = threading.Lock()
+
+
+def source_signature(buckets_path: str = REASON_BUCKETS_FILE, raw_map_path: str = RAW_REASON_MAP_FILE) -> tuple:
+    """Signatures of the files a classifier is compiled from, for cache keys"""
+    return file_signature(buckets_path), file_signature(raw_map_path)
+
+
+def default_classifier(buckets_path: str = REASON_BUCKETS_FILE,
+                       raw_map_path: str = RAW_REASON_MAP_FILE) -> ReasonClassifier:
+    """Classifier for the files on disk, recompiled when either of them changes"""
+    global _default
+    key = (buckets_path, raw_map_path, source_signature(buckets_path, raw_map_path))
+    with _default_lock:
+        if _default is None or _default[0] != key:
+            _default = (key, ReasonClassifier(read_json(buckets_path), read_json(raw_map_path)))
+        return _default[1]
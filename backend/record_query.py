@@ -0,0 +1,148 @@
+# Cursor pagination, filtering, sorting and projection over in-memory record sets
+import base64
+import hashlib
+import json
+
+import numpy as np
+import pandas as pd
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+
+TRUE_VALUES = ("true", "1", "yes")
+
+
+class QueryError(ValueError):
+    """Invalid cursor, sort key or field list; endpoints answer 400"""
+
+
+def query_hash(query: dict) -> str:
+    """Short hash of the filters and sort behind a result set; unset parameters are left out"""
+    normalized = {name: value for name, value in (query or {}).items() if value is not None and value != ""}
+    return hashlib.sha1(json.dumps(normalized, sort_keys=True, default=str).encode()).hexdigest()[:12]
+
+
+def encode_cursor(offset: int, version: str, query: str = "") -> str:
+    payload = json.dumps({"o": offset, "v": version, "q": query}, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(payload).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, version: str, query: str = "") -> int:
+    """
+    Offset encoded in a cursor; cursors from an older version of the data,
+    or from a query with other filters or sort, are rejected
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        offset, cursor_version, cursor_query = int(payload["o"]), payload["v"], payload.get("q", "")
+    except Exception:
+        raise QueryError("Invalid cursor")
+    if cursor_version != version:
+        raise QueryError("Cursor expired: the underlying data changed, restart from the first page")
+    if cursor_query != query:
+        raise QueryError("Cursor does not match this query: keep the filters and sort it was issued for")
+    return offset
+
+
+def parse_fields(fields: str, allowed) -> list:
+    """Requested projection as a list, or None for all fields"""
+    if not fields:
+        return None
+    requested = [f.strip() for f in fields.split(",") if f.strip()]
+    unknown = [f for f in requested if f not in allowed]
+    if unknown:
+        raise QueryError(f"Unknown fields: {', '.join(unknown)}. Allowed: {', '.join(allowed)}")
+    return requested
+
+
+def sort_positions(positions: np.ndarray, sort: str, columns: dict) -> np.ndarray:
+    """
+    Order row positions by `sort` ("field" ascending, "-field" descending).
+    Ties keep file order in both directions.
+    """
+    if not sort:
+        return positions
+    descending = sort.startswith("-")
+    name = sort.lstrip("-+")
+    if name not in columns:
+        raise QueryError(f"Cannot sort by {name}. Allowed: {', '.join(columns)}")
+    keys = columns[name][positions]
+    if descending:
+        # Stable descending order: rank the keys, then sort on the negated rank
+        keys = -pd.factorize(keys, sort=True)[0]
+    return positions[np.argsort(keys, kind="stable")]
+
+
+def paginate(positions: np.ndarray, cursor: str, limit: int, version: str, query: dict = None):
+    """
+    (positions of this page, cursor for the next page or None). `query` is
+    the filters and sort that produced `positions`; cursors are only
+    accepted back with the same ones.
+    """
+    if not 1 <= limit <= MAX_PAGE_SIZE:
+        raise QueryError(f"limit must be between 1 and {MAX_PAGE_SIZE}")
+    fingerprint = query_hash(query)
+    offset = decode_cursor(cursor, version, fingerprint) if cursor else 0
+    end = offset + limit
+    next_cursor = encode_cursor(end, version, fingerprint) if end < len(positions) else None
+    return positions[offset:end], next_cursor
+
+
+def project(record: dict, fields: list) -> dict:
+    return record if fields is None else {f: record[f] for f in fields}
+
+
+def truthy(values: pd.Series) -> np.ndarray:
+    """Boolean array from a column holding bools or "True"/"False" strings"""
+    return values.astype(str).str.strip().str.lower().isin(TRUE_VALUES).to_numpy()
+
+
+def json_records(frame: pd.DataFrame) -> list:
+    """to_dict('records') with NaN turned into None so the page is valid JSON"""
+    return frame.astype(object).where(frame.notna(), None).to_dict(orient="records")
+
+
+class PenaltyIndex:
+    """
+    Column arrays over reasons.csv used to filter and sort /all-penalties.
+
+    Built once per version of the file (see DocumentStore.derived), so a
+    request only evaluates boolean masks and materializes the rows of the
+    page it returns.
+    """
+
+    FIELDS = ("PO_ID", "reason", "penalty", "admin_approved", "admin_comments", "admin_username", "category")
+    SORTABLE = ("PO_ID", "reason", "penalty", "category")
+
+    def __init__(self, frame: pd.DataFrame, categories: pd.Series, version: str):
+        self.frame = frame
+        self.version = version
+        self.penalty = pd.to_numeric(frame['penalty'], errors='coerce').fillna(0).to_numpy()
+        self.approved = truthy(frame['admin_approved']) if 'admin_approved' in frame else np.zeros(len(frame), bool)
+        self.category = categories.to_numpy(dtype=object)
+        self.columns = {
+            "PO_ID": frame['PO_ID'].astype(str).to_numpy(dtype=object),
+            "reason": frame['reason'].astype(str).to_numpy(dtype=object),
+            "penalty": self.penalty,
+            "category": self.category,
+        }
+
+    def query(self, category: str = None, approved: bool = None, min_penalty: float = None,
+              max_penalty: float = None, sort: str = None) -> np.ndarray:
+        mask = np.ones(len(self.frame), dtype=bool)
+        if category:
+            mask &= self.category == category
+        if approved is not None:
+            mask &= self.approved == approved
+        if min_penalty is not None:
+            mask &= self.penalty >= min_penalty
+        if max_penalty is not None:
+            mask &= self.penalty <= max_penalty
+        return sort_positions(np.flatnonzero(mask), sort, self.columns)
+
+    def records(self, positions: np.ndarray) -> list:
+        page = self.frame.iloc[positions].copy()
+        page['penalty'] = self.penalty[positions]
+        page['category'] = self.category[positions]
+        return json_records(page)
@@ -0,0 +1,164 @@
+# Redis access with bounded latency: timeouts, a circuit breaker and a reconnect probe
+import asyncio
+import time
+
+import redis.asyncio as aioredis
+from redis.asyncio.retry import Retry
+from redis.backoff import NoBackoff
+
+from backend.metrics import STAGE_SECONDS
+
+REDIS_SECONDS = STAGE_SECONDS.labels("redis")
+
+
+class RedisUnavailable(Exception):
+    """Redis was skipped (circuit open) or the call failed or timed out"""
+
+
+def connect(host: str, port: int, db: int = 0, connect_timeout: float = 0.2, timeout: float = 0.2,
+            max_connections: int = 32) -> aioredis.Redis:
+    """
+    An asyncio client on a shared, bounded connection pool.
+
+    Connecting and every socket read/write give up after their timeout, a
+    request waits at most `timeout` for a free pooled connection, and
+    failed commands are not retried: the circuit breaker decides when to
+    try again, not each request.
+    """
+    pool = aioredis.BlockingConnectionPool(
+        host=host, port=port, db=db, decode_responses=True,
+        max_connections=max_connections, timeout=timeout,
+        socket_connect_timeout=connect_timeout, socket_timeout=timeout,
+        retry=Retry(NoBackoff(), 0),
+    )
+    return aioredis.Redis(connection_pool=pool)
+
+
+class ResilientRedis:
+    """
+    Circuit breaker around a redis.asyncio client.
+
+    After `failure_threshold` consecutive failures the circuit opens and
+    call() raises RedisUnavailable at once instead of waiting on a slow or
+    dead server. While it is open, the probe started with start() pings
+    Redis every `probe_interval` seconds once `cooldown` has passed, and
+    closes the circuit on the first answer, so a Redis that comes back (or
+    starts late) is used again without any request paying for the check.
+    Without a running probe, the first call after the cooldown is let
+    through as the trial instead. Every call is also bounded by
+    `call_timeout`, which covers what socket timeouts don't (DNS, waiting
+    for a pooled connection).
+    """
+
+    def __init__(self, client: aioredis.Redis, failure_threshold: int = 3, cooldown: float = 5.0,
+                 probe_interval: float = 1.0, call_timeout: float = 0.5):
+        self.client = client
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.probe_interval = probe_interval
+        self.call_timeout = call_timeout
+        self.state = "closed"
+        self.failures = 0
+        self.opened_at = 0.0
+        self._trial = False
+        self._probe = None
+        self.calls = 0
+        self.errors = 0
+        self.skipped = 0
+        self.opens = 0
+        self.last_error = None
+
+    @property
+    def available(self) -> bool:
+        return self.state == "closed"
+
+    def _allow(self) -> bool:
+        if self.state == "closed":
+            return True
+        if self._probe is None and not self._trial and time.monotonic() - self.opened_at >= self.cooldown:
+            self._trial = True
+            return True
+        return False
+
+    def _record_success(self):
+        if self.state != "closed":
+            print("[REDIS] Reachable again, circuit closed")
+        self.state = "closed"
+        self.failures = 0
+        self._trial = False
+
+    def _record_failure(self, error: Exception):
+        self.errors += 1
+        self.failures += 1
+        self.last_error = f"{type(error).__name__}: {error}"
+        self._trial = False
+        if self.state == "open":
+            self.opened_at = time.monotonic()
+        elif self.failures >= self.failure_threshold:
+            self.open(error)
+
+    def open(self, error: Exception = None):
+        """Skip Redis for the next `cooldown` seconds"""
+        self.state = "open"
+        self.opened_at = time.monotonic()
+        self.opens += 1
+        print(f"[REDIS] Circuit open for {self.cooldown:g}s after: {error}")
+
+    async def call(self, operation):
+        """Result of `await operation(client)`, or RedisUnavailable"""
+        if not self._allow():
+            self.skipped += 1
+            raise RedisUnavailable(self.last_error or "circuit open")
+        self.calls += 1
+        start = time.perf_counter()
+        try:
+            async with asyncio.timeout(self.call_timeout):
+                result = await operation(self.client)
+        except Exception as e:
+            self._record_failure(e)
+            raise RedisUnavailable(str(e)) from e
+        finally:
+            REDIS_SECONDS.observe(time.perf_counter() - start)
+        self._record_success()
+        return result
+
+    async def ping(self) -> bool:
+        """Check Redis now, updating the circuit; used at startup and by the probe"""
+        try:
+            async with asyncio.timeout(self.call_timeout):
+                await self.client.ping()
+        except Exception as e:
+            self.last_error = f"{type(e).__name__}: {e}"
+            if self.state == "closed":
+                self.open(e)
+            return False
+        self._record_success()
+        return True
+
+    async def _probe_loop(self):
+        while True:
+            await asyncio.sleep(self.probe_interval)
+            if self.state != "closed" and time.monotonic() - self.opened_at >= self.cooldown:
+                await self.ping()
+
+    def start(self):
+        """Run the reconnect probe on the current event loop"""
+        if self._probe is None:
+            self._probe = asyncio.get_running_loop().create_task(self._probe_loop())
+
+    async def close(self):
+        if self._probe is not None:
+            self._probe.cancel()
+            self._probe = None
+        await self.client.aclose()
+
+    def stats(self) -> dict:
+        return {
+            "state": self.state,
+            "consecutive_failures": self.failures,
+            "calls": self.calls,
+            "errors": self.errors,
+            "skipped": self.skipped,
+            "opens": self.opens,
+            "last_error": self.last_error,
+        }
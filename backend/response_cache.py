@@ -0,0 +1,150 @@
+# Cache of chat answers for repeated questions
+import hashlib
+import re
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+from backend.chat_retrieval import HashingEmbeddingFunction
+from backend.tiered_cache import TieredCache
+
+CONTRACTIONS = {
+    "what's": "what is",
+    "whats": "what is",
+    "who's": "who is",
+    "where's": "where is",
+    "how's": "how is",
+    "it's": "it is",
+    "isn't": "is not",
+    "aren't": "are not",
+    "don't": "do not",
+    "doesn't": "does not",
+}
+CONTRACTION_PATTERN = re.compile(r"\b(" + "|".join(re.escape(c) for c in CONTRACTIONS) + r")\b")
+
+
+def normalize_question(question: str) -> str:
+    """Lowercase, expand common contractions, drop punctuation and extra whitespace"""
+    text = question.lower().replace("’", "'")
+    text = CONTRACTION_PATTERN.sub(lambda m: CONTRACTIONS[m.group(1)], text)
+    text = re.sub(r"[^\w\s/-]", " ", text)
+    return " ".join(text.split())
+
+
+class ChatResponseCache:
+    """
+    Answers keyed by (context version, normalized question).
+
+    The exact tier lives in a TieredCache (in-process LRU, then Redis);
+    entries expire after `ttl` seconds. Because the key contains the
+    context version, new validation results make old answers unreachable
+    on their own, and clear() drops the in-process copies.
+
+    With a `similarity_threshold` above 0, a miss on the exact key falls
+    back to the closest previously answered question of the same context
+    version, if its cosine similarity reaches the threshold. The question
+    vectors for that tier are kept in process, at most `max_entries` of
+    them.
+    """
+
+    KEY_PREFIX = "chat_response:"
+
+    def __init__(self, cache: TieredCache, max_entries: int = 512, ttl: int = 86400,
+                 similarity_threshold: float = 0.0):
+        self.cache = cache
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.similarity_threshold = similarity_threshold
+        self.embedding_function = HashingEmbeddingFunction()
+        self._vectors = {}
+        self._lock = threading.Lock()
+        self.exact_hits = 0
+        self.similar_hits = 0
+        self.misses = 0
+        self.stores = 0
+
+    @staticmethod
+    def _key(version: str, normalized: str) -> str:
+        digest = hashlib.sha1(normalized.encode('utf-8')).hexdigest()
+        return f"{ChatResponseCache.KEY_PREFIX}{version[:16]}:{digest}"
+
+    async def _read(self, key: str):
+        return await self.cache.get(key)
+
+    async def _write(self, key: str, value: dict):
+        await self.cache.set(key, value, self.ttl)
+
+    def _nearest(self, version: str, normalized: str):
+        """(key, similarity) of the closest cached question for this version"""
+        with self._lock:
+            index = self._vectors.get(version)
+            if not index:
+                return None, 0.0
+            keys = list(index)
+            matrix = np.stack([index[k] for k in keys])
+        scores = matrix @ self.embedding_function.embed_text(normalized)
+        best = int(np.argmax(scores))
+        return keys[best], float(scores[best])
+
+    async def lookup(self, question: str, version: str):
+        """Cached answer and hit metadata for a question, or (None, None) on a miss"""
+        normalized = normalize_question(question)
+        cached = await self._read(self._key(version, normalized))
+        if cached is not None:
+            self.exact_hits += 1
+            return cached["answer"], {"hit": True, "tier": "exact"}
+
+        if self.similarity_threshold > 0:
+            key, similarity = self._nearest(version, normalized)
+            if key is not None and similarity >= self.similarity_threshold:
+                cached = await self._read(key)
+                if cached is not None:
+                    self.similar_hits += 1
+                    return cached["answer"], {
+                        "hit": True,
+                        "tier": "similar",
+                        "similarity": round(similarity, 4),
+                        "matched_question": cached["question"],
+                    }
+
+        self.misses += 1
+        return None, None
+
+    async def store(self, question: str, version: str, answer: str):
+        if not answer:
+            return
+        normalized = normalize_question(question)
+        key = self._key(version, normalized)
+        await self._write(key, {"question": question, "answer": answer})
+        self.stores += 1
+        if self.similarity_threshold > 0:
+            vector = self.embedding_function.embed_text(normalized)
+            with self._lock:
+                # Vectors of older context versions can never match again
+                index = self._vectors.setdefault(version, OrderedDict())
+                for stale in [v for v in self._vectors if v != version]:
+                    del self._vectors[stale]
+                index[key] = vector
+                index.move_to_end(key)
+                while len(index) > self.max_entries:
+                    index.popitem(last=False)
+
+    def clear(self):
+        """Drop in-process entries; Redis entries of older versions expire via their TTL"""
+        self.cache.clear_local(self.KEY_PREFIX)
+        with self._lock:
+            self._vectors.clear()
+
+    def stats(self) -> dict:
+        hits = self.exact_hits + self.similar_hits
+        lookups = hits + self.misses
+        return {
+            "backend": "redis" if self.cache.redis_available else "memory",
+            "similarity_threshold": self.similarity_threshold,
+            "exact_hits": self.exact_hits,
+            "similar_hits": self.similar_hits,
+            "misses": self.misses,
+            "stores": self.stores,
+            "hit_rate": round(hits / lookups, 4) if lookups else 0.0,
+        }
@@ -3,6 +3,8 @@ from fastapi import APIRouter
 from datetime import datetime, timedelta
 import random
 
+from backend.profiling import profiled
+
 router = APIRouter()
 
 # Mock data for demonstration
@@ -86,6 +88,7 @@ def generate_mock_po_risk(n=20):
 
 
 @router.get('/api/po-risk-analysis')
+@profiled
 def po_risk_analysis():
     """Return mock PO risk analysis data"""
     return generate_mock_po_risk(30)
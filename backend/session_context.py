@@ -0,0 +1,66 @@
+# Per-session chat context (the last turns fed back into each prompt)
+from backend.tiered_cache import TieredCache
+
+
+class SessionContextCache:
+    """
+    The last `window` turns of each chat session, as role/content messages.
+
+    Each session is one list in the TieredCache: in Redis a list with one
+    JSON message per element, in memory only while Redis is unreachable.
+    A turn is appended with TieredCache.append_list, a single atomic Lua
+    call in Redis, so appends from several workers each land as an
+    adjacent user/assistant pair and never grow the list past the window,
+    and every worker reads the list back from Redis, so a turn answered by
+    another worker is in the next prompt. A session that is not cached is
+    rebuilt from `load_recent(session_id, window)`, which already contains
+    the new turn because the history store is written first.
+    """
+
+    KEY_PREFIX = "chat_context_list:"
+
+    def __init__(self, cache: TieredCache, load_recent, window: int = 15, ttl: int = 86400):
+        self.cache = cache
+        self.load_recent = load_recent
+        self.window = window
+        self.ttl = ttl
+
+    def _key(self, session_id: str) -> str:
+        return f"{self.KEY_PREFIX}{session_id}"
+
+    @staticmethod
+    def _turn_messages(turns: list) -> list:
+        messages = []
+        for turn in turns:
+            messages.append({"role": "user", "content": turn['user_message']})
+            messages.append({"role": "assistant", "content": turn['assistant_message']})
+        return messages
+
+    async def _rebuild(self, session_id: str) -> list:
+        messages = self._turn_messages(await self.load_recent(session_id, self.window))
+        if messages:
+            await self.cache.set_list(self._key(session_id), messages, self.ttl)
+            print(f"[CACHE] Cached context for session {session_id}")
+        return messages
+
+    async def get(self, session_id: str) -> list:
+        """Context messages of a session, oldest first"""
+        messages = await self.cache.get_list(self._key(session_id))
+        if messages:
+            return messages
+        return await self._rebuild(session_id)
+
+    async def append(self, session_id: str, user_message: str, assistant_message: str):
+        """Add a turn that has already been saved to the history store"""
+        appended = await self.cache.append_list(
+            self._key(session_id),
+            [{"role": "user", "content": user_message}, {"role": "assistant", "content": assistant_message}],
+            2 * self.window,
+            self.ttl,
+        )
+        if not appended:
+            await self._rebuild(session_id)
+
+    async def clear(self, session_id: str):
+        await self.cache.delete(self._key(session_id))
+        print(f"[CACHE] Cleared cache for session {session_id}")
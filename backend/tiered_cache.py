@@ -0,0 +1,285 @@
+# Two-tier cache: a bounded in-process LRU in front of an optional Redis
+import json
+import threading
+import time
+from collections import OrderedDict
+
+from backend.redis_client import RedisUnavailable, ResilientRedis
+
+# A whole list as one JSON array, so a read is one reply and one json.loads.
+# Redis drops empty lists, so "[]" always means the key is not cached.
+READ_LIST_SCRIPT = "return '[' .. table.concat(redis.call('LRANGE', KEYS[1], 0, -1), ',') .. ']'"
+
+# Append ARGV[3..] to a cached list, keep its last ARGV[1] elements and
+# refresh the TTL to ARGV[2]; 0 (nothing appended) if the list is not cached
+APPEND_LIST_SCRIPT = """
+local length = redis.call('RPUSHX', KEYS[1], unpack(ARGV, 3))
+if length == 0 then
+    return 0
+end
+redis.call('LTRIM', KEYS[1], -tonumber(ARGV[1]), -1)
+redis.call('EXPIRE', KEYS[1], ARGV[2])
+return length
+"""
+
+
+class LocalCache:
+    """
+    Bounded LRU of decoded values with per-entry expiry.
+
+    Least recently used entries are evicted once there are more than
+    `max_entries` of them or their encoded sizes (as reported by the
+    caller) add up to more than `max_bytes`. No entry outlives `max_ttl`
+    seconds, whatever TTL it was stored with, so values another worker
+    changed in Redis are picked up within that time.
+    """
+
+    def __init__(self, max_entries: int = 2048, max_bytes: int = 64 * 1024 * 1024, max_ttl: float = 60.0):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.max_ttl = max_ttl
+        self.bytes = 0
+        self._entries = OrderedDict()  # key -> (expires, size, value)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key: str):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] < time.monotonic():
+                self._drop(key)
+                self.expirations += 1
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[2]
+
+    def peek(self, key: str):
+        """Like get(), without touching recency or the counters"""
+        with self._lock:
+            entry = self._entries.get(key)
+            return entry[2] if entry is not None and entry[0] >= time.monotonic() else None
+
+    def set(self, key: str, value, size: int, ttl: float = None):
+        if self.max_entries <= 0 or size > self.max_bytes:
+            return
+        ttl = self.max_ttl if ttl is None else min(ttl, self.max_ttl)
+        with self._lock:
+            self._drop(key)
+            self._entries[key] = (time.monotonic() + ttl, size, value)
+            self.bytes += size
+            while len(self._entries) > self.max_entries or self.bytes > self.max_bytes:
+                oldest = next(iter(self._entries))
+                self._drop(oldest)
+                self.evictions += 1
+
+    def _drop(self, key: str):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self.bytes -= entry[1]
+
+    def pop(self, key: str):
+        with self._lock:
+            self._drop(key)
+
+    def clear(self, prefix: str = None):
+        """Drop every entry, or only those whose key starts with `prefix`"""
+        with self._lock:
+            if prefix is None:
+                self._entries.clear()
+                self.bytes = 0
+                return
+            for key in [key for key in self._entries if key.startswith(prefix)]:
+                self._drop(key)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "bytes": self.bytes,
+            "max_entries": self.max_entries,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+        }
+
+
+class TieredCache:
+    """
+    JSON values and lists behind a LocalCache, with Redis as second tier.
+
+    Reads try the local tier first and fill it from Redis; writes go to
+    both. Redis calls go through a ResilientRedis, so a failing or slow
+    Redis costs a call at most its timeout and is skipped altogether while
+    the circuit is open; the cache keeps working from memory alone. Keys
+    written or deleted meanwhile are remembered, and the first Redis call
+    that succeeds afterwards promotes their local values (or deletions) to
+    Redis, so it catches up once it is reachable again instead of serving
+    what it had before the outage. Without Redis only the local tier is
+    used.
+
+    Lists are different: every worker appends to them, so a local copy
+    goes stale as soon as another worker appends. They are read from and
+    appended to in Redis whenever it answers, and the local copy only
+    serves while Redis is unreachable (or holds writes not promoted yet).
+    """
+
+    def __init__(self, redis: ResilientRedis = None, local: LocalCache = None):
+        self.redis = redis
+        self.local = local if local is not None else LocalCache()
+        self._pending = {}  # key -> ("value" | "list" | "delete", redis ttl)
+        self._promoting = False
+        self.promoted = 0
+        if redis:
+            # Sent with EVALSHA, falling back to EVAL once per server after a restart
+            self._read_list_script = redis.client.register_script(READ_LIST_SCRIPT)
+            self._append_list_script = redis.client.register_script(APPEND_LIST_SCRIPT)
+
+    @property
+    def redis_available(self) -> bool:
+        return self.redis is not None and self.redis.available
+
+    def _defer(self, key: str, kind: str, ttl: int):
+        """Remember a write Redis missed; only as many as the local tier can hold"""
+        self._pending.pop(key, None)
+        self._pending[key] = (kind, ttl)
+        while len(self._pending) > max(self.local.max_entries, 0):
+            del self._pending[next(iter(self._pending))]
+
+    async def _redis(self, operation):
+        """(True, result) of `operation(client)`, or (False, None) if Redis is skipped or fails"""
+        if self.redis is None:
+            return False, None
+        try:
+            result = await self.redis.call(operation)
+        except RedisUnavailable:
+            return False, None
+        if self._pending and not self._promoting:
+            await self._promote()
+        return True, result
+
+    async def _promote(self):
+        self._promoting = True
+        try:
+            while self._pending:
+                key, (kind, ttl) = next(iter(self._pending.items()))
+                del self._pending[key]
+                value = self.local.peek(key)
+                if kind != "delete" and value is None:
+                    continue  # Gone from memory too; nothing to restore
+                try:
+                    if kind == "delete":
+                        await self.redis.call(lambda client: client.delete(key))
+                    elif kind == "list":
+                        await self.redis.call(lambda client: self._write_list(client, key, value, ttl))
+                    else:
+                        await self.redis.call(lambda client: client.setex(key, ttl, json.dumps(value)))
+                except RedisUnavailable:
+                    self._pending[key] = (kind, ttl)
+                    return
+                self.promoted += 1
+            print("[CACHE] Redis reachable again, in-memory writes promoted")
+        finally:
+            self._promoting = False
+
+    @staticmethod
+    async def _write_list(client, key: str, items: list, ttl: int):
+        async with client.pipeline(transaction=True) as pipe:
+            pipe.delete(key)
+            if items:
+                pipe.rpush(key, *[json.dumps(item) for item in items])
+                pipe.expire(key, ttl)
+            await pipe.execute()
+
+    async def get(self, key: str):
+        value = self.local.get(key)
+        if value is not None:
+            return value
+        ok, cached = await self._redis(lambda client: client.get(key))
+        if not ok or not cached:
+            return None
+        value = json.loads(cached)
+        self.local.set(key, value, len(cached))
+        return value
+
+    async def set(self, key: str, value, ttl: int):
+        encoded = json.dumps(value)
+        self.local.set(key, value, len(encoded), ttl)
+        ok, _ = await self._redis(lambda client: client.setex(key, ttl, encoded))
+        if not ok and self.redis:
+            self._defer(key, "value", ttl)
+
+    async def delete(self, key: str):
+        self.local.pop(key)
+        ok, _ = await self._redis(lambda client: client.delete(key))
+        if not ok and self.redis:
+            self._defer(key, "delete", 0)
+
+    async def get_list(self, key: str):
+        """A cached list (stored as a Redis list), or None"""
+        pending = key in self._pending
+        ok, cached = await self._redis(lambda client: self._read_list_script(keys=[key]))
+        if ok and not pending:
+            items = json.loads(cached)
+            if not items:
+                self.local.pop(key)
+                return None
+            self.local.set(key, items, len(cached))
+            return list(items)
+        items = self.local.get(key)
+        return list(items) if items is not None else None
+
+    async def set_list(self, key: str, items: list, ttl: int):
+        self.local.set(key, list(items), sum(len(json.dumps(item)) for item in items), ttl)
+        ok, _ = await self._redis(lambda client: self._write_list(client, key, items, ttl))
+        if not ok and self.redis:
+            self._defer(key, "list", ttl)
+
+    async def append_list(self, key: str, items: list, max_length: int, ttl: int) -> bool:
+        """
+        Append to a cached list, keeping its last `max_length` items.
+        False if the list is not cached (in Redis, or in memory while Redis
+        is unreachable), in which case nothing is stored and the caller
+        should rebuild it with set_list().
+        """
+        if key not in self._pending:
+            encoded = [json.dumps(item) for item in items]
+            ok, length = await self._redis(
+                lambda client: self._append_list_script(keys=[key], args=[max_length, ttl, *encoded])
+            )
+            if ok:
+                # The local copy lacks other workers' appends; the next read refills it from Redis
+                self.local.pop(key)
+                return bool(length)
+
+        # Redis is unreachable, or still has to receive this list's earlier local writes
+        local_items = self.local.peek(key)
+        if local_items is None:
+            return False
+        local_items = (local_items + items)[-max_length:]
+        self.local.set(key, local_items, sum(len(json.dumps(item)) for item in local_items), ttl)
+        if self.redis:
+            self._defer(key, "list", ttl)
+        return True
+
+    def clear_local(self, prefix: str = None):
+        self.local.clear(prefix)
+
+    def stats(self) -> dict:
+        return {
+            "local": self.local.stats(),
+            "redis": {
+                **(self.redis.stats() if self.redis else {"state": "disabled"}),
+                "pending_promotions": len(self._pending),
+                "promoted": self.promoted,
+            },
+        }
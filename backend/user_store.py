@@ -0,0 +1,122 @@
+# Users and roles in SQLite, behind persistent connections and a role cache
+import sqlite3
+import sys
+import threading
+import time
+
+
+class UserStore:
+    """
+    Account lookups for signup, login and authorization checks.
+
+    Each thread keeps one connection open in WAL mode, so a lookup is a
+    single indexed SELECT through sqlite3's prepared-statement cache rather
+    than a connect/close. get() answers from a per-username cache for
+    `role_ttl` seconds; writes through this store (create, set_role)
+    invalidate the affected user immediately, changes made by other
+    processes show up once the TTL expires.
+    """
+
+    def __init__(self, db_path: str, role_ttl: float = 60.0):
+        self.db_path = db_path
+        self.role_ttl = role_ttl
+        self._local = threading.local()
+        self._cache = {}
+        self._init_schema()
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _init_schema(self):
+        conn = self._connection()
+        conn.execute("""
+        CREATE TABLE IF NOT EXISTS users (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            username TEXT UNIQUE NOT NULL,
+            email TEXT UNIQUE NOT NULL,
+            password TEXT NOT NULL,
+            role TEXT DEFAULT 'user',
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+        """)
+        # Databases from before roles existed
+        columns = [row["name"] for row in conn.execute("PRAGMA table_info(users)")]
+        if 'role' not in columns:
+            conn.execute("ALTER TABLE users ADD COLUMN role TEXT DEFAULT 'user'")
+        conn.commit()
+
+    def exists(self, username: str, email: str) -> bool:
+        """Whether the username or the email is already taken"""
+        row = self._connection().execute(
+            "SELECT 1 FROM users WHERE username = ? OR email = ?", (username, email)
+        ).fetchone()
+        return row is not None
+
+    def create(self, username: str, email: str, password_hash: str, role: str = "user"):
+        conn = self._connection()
+        with conn:
+            conn.execute(
+                "INSERT INTO users (username, email, password, role) VALUES (?, ?, ?, ?)",
+                (username, email, password_hash, role)
+            )
+        self.invalidate(username)
+
+    def credentials(self, username: str):
+        """User with its password hash, for login; never cached"""
+        row = self._connection().execute(
+            "SELECT id, username, email, password, role FROM users WHERE username = ?", (username,)
+        ).fetchone()
+        return dict(row) if row else None
+
+    def get(self, username: str):
+        """id, username, email and role of a user (None if unknown), cached for role_ttl seconds"""
+        cached = self._cache.get(username)
+        now = time.monotonic()
+        if cached is not None and cached[0] > now:
+            user = cached[1]
+        else:
+            row = self._connection().execute(
+                "SELECT id, username, email, role FROM users WHERE username = ?", (username,)
+            ).fetchone()
+            user = dict(row) if row else None
+            if self.role_ttl > 0:
+                self._cache[username] = (now + self.role_ttl, user)
+        return dict(user) if user else None
+
+    def set_password(self, username: str, password_hash: str):
+        """Replace a stored hash, e.g. one rehashed with the current Argon2 parameters"""
+        conn = self._connection()
+        with conn:
+            conn.execute("UPDATE users SET password = ? WHERE username = ?", (password_hash, username))
+
+    def set_role(self, username: str, role: str) -> bool:
+        """Change a user's role; False if there is no such user"""
+        conn = self._connection()
+        with conn:
+            updated = conn.execute("UPDATE users SET role = ? WHERE username = ?", (role, username)).rowcount
+        self.invalidate(username)
+        return updated > 0
+
+    def invalidate(self, username: str = None):
+        """Drop cached users (all of them when no username is given)"""
+        if username is None:
+            self._cache.clear()
+        else:
+            self._cache.pop(username, None)
+
+
+if __name__ == "__main__":
+    # python -m backend.user_store <users.db> <username> <role>
+    if len(sys.argv) != 4:
+        print("usage: python -m backend.user_store <users.db> <username> <role>")
+        sys.exit(1)
+    if not UserStore(sys.argv[1]).set_role(sys.argv[2], sys.argv[3]):
+        print(f"No user named {sys.argv[2]}")
+        sys.exit(1)
@@ -0,0 +1,350 @@
+# Vectorized rule engine behind /run-validation
+import numpy as np
+import pandas as pd
+
+from backend.columnar_store import parse_dates
+from backend.reason_classifier import default_classifier
+
+# Columns validate_reasons() reads from each of its input tables
+VALIDATION_COLUMNS = {
+    "reasons": ("PO_ID", "reason"),
+    "pos": ("PO_ID", "PO_Date", "Quantity", "Unit_Price"),
+    "asns": ("PO_ID", "Quantity_Shipped"),
+    "grns": ("PO_ID", "Received_Date", "Quantity_Received"),
+    "invoices": ("PO_ID", "Unit_Price"),
+}
+
+
+def _per_unique(series: pd.Series, transform) -> np.ndarray:
+    """Apply a Python-level transform once per unique value and broadcast it back"""
+    codes, uniques = pd.factorize(series, use_na_sentinel=False)
+    mapped = np.array([transform(value) for value in uniques] + [None], dtype=object)
+    return mapped[codes]
+
+
+def normalize_po_ids(series: pd.Series) -> np.ndarray:
+    """Vectorized `str(po_id).strip()` for the reasons PO_ID column"""
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        categories = series.cat.categories.astype(str).str.strip().to_numpy(dtype=object)
+        return np.append(categories, 'nan')[series.cat.codes.to_numpy()]
+    if pd.api.types.is_string_dtype(series):
+        return series.str.strip().fillna('nan').to_numpy(dtype=object)
+    return _per_unique(series, lambda x: str(x).strip())
+
+
+def _key_codes(values):
+    """(codes, distinct keys) for a PO_ID column; categoricals reuse their own codes"""
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        return values.cat.codes.to_numpy(dtype=np.int64), values.cat.categories.to_numpy(dtype=object)
+    codes, uniques = pd.factorize(values)
+    return codes, np.asarray(uniques, dtype=object)
+
+
+class DocumentJoin:
+    """
+    Hash join of reasons against the PO, ASN, GRN and invoice tables.
+
+    Only the distinct PO_IDs of each table (the categories, for the typed
+    frames) are hashed into one shared integer key space; rows are then
+    mapped by integer code, so each reason finds the first row of every
+    document table (what the original `df[df['PO_ID'] == po_id][col].iloc[0]`
+    lookups saw) with a single array gather instead of a full-table scan.
+    """
+
+    def __init__(self, po_ids, pos_df, asns_df, grns_df, invoices_df):
+        tables = {"po": pos_df, "asn": asns_df, "grn": grns_df, "inv": invoices_df}
+        parts = [_key_codes(po_ids)] + [_key_codes(df['PO_ID']) for df in tables.values() if not df.empty]
+        shared, uniques = pd.factorize(np.concatenate([keys for _, keys in parts]))
+        n_keys = len(uniques)
+
+        table_codes = []
+        offset = 0
+        for codes, keys in parts:
+            # Code -1 (missing PO_ID) lands on the trailing -1
+            table_codes.append(np.append(shared[offset:offset + len(keys)], -1)[codes])
+            offset += len(keys)
+        reason_codes = table_codes.pop(0)
+        self.rows = {}
+        self.tables = {}
+        self.arrays = {}
+        self.grn_count = np.zeros(len(po_ids), dtype=np.int64)
+
+        for prefix, df in tables.items():
+            row_for_key = np.full(n_keys + 1, -1, dtype=np.int64)
+            if not df.empty:
+                codes = table_codes.pop(0)
+                valid = codes >= 0
+                # np.unique sorts stably with return_index, so this is the first row per key
+                unique_codes, first_rows = np.unique(codes[valid], return_index=True)
+                row_for_key[unique_codes] = np.flatnonzero(valid)[first_rows]
+                if prefix == "grn":
+                    counts = np.bincount(codes[valid], minlength=n_keys + 1)
+                    self.grn_count = counts[reason_codes]
+            # Unmatched reasons carry code -1, which lands on the trailing -1 slot
+            self.rows[prefix] = row_for_key[reason_codes]
+            self.tables[prefix] = df
+
+    def has(self, prefix) -> np.ndarray:
+        return self.rows[prefix] >= 0
+
+    def has_column(self, prefix, column) -> bool:
+        return column in self.tables[prefix].columns
+
+    def _array(self, prefix, column) -> np.ndarray:
+        """
+        A column as numpy, once: numbers stay numeric (nullable ints as float
+        with NaN), dates stay datetime64, anything else is object.
+        """
+        key = (prefix, column)
+        if key not in self.arrays:
+            series = self.tables[prefix][column]
+            if pd.api.types.is_datetime64_any_dtype(series):
+                array = series.to_numpy()
+            elif pd.api.types.is_numeric_dtype(series) and not pd.api.types.is_bool_dtype(series):
+                array = series.to_numpy(dtype=np.float64, na_value=np.nan) if series.hasnans else series.to_numpy()
+            else:
+                array = series.to_numpy(dtype=object)
+            self.arrays[key] = array
+        return self.arrays[key]
+
+    def values(self, prefix, column, sel) -> np.ndarray:
+        """First-row values for the selected reasons (all must have a row)"""
+        return self._array(prefix, column)[self.rows[prefix][sel]]
+
+    def dates(self, prefix, column, sel) -> np.ndarray:
+        """First-row values as datetime64, parsing text dates; NaT when missing or invalid"""
+        return parse_dates(self.values(prefix, column, sel)).to_numpy(dtype="datetime64[ns]")
+
+    def strings(self, prefix, column, sel) -> np.ndarray:
+        """
+        First-row values formatted for comments like the original f-strings
+        (str()); dates without a time of day print as YYYY-MM-DD, NA as nan.
+        """
+        values = self.tables[prefix][column].iloc[self.rows[prefix][sel]]
+        if pd.api.types.is_datetime64_any_dtype(values):
+            text = values.dt.strftime('%Y-%m-%d').where(values == values.dt.normalize(), values.astype(str))
+            return text.fillna('nan').to_numpy(dtype=object)
+        return np.array(['nan' if value is pd.NA else str(value) for value in values.to_numpy(dtype=object)],
+                        dtype=object)
+
+
+def validate_reasons(reasons_df, pos_df, asns_df, grns_df, invoices_df, classifier=None) -> pd.DataFrame:
+    """
+    Validate every stated reason against the supporting documents.
+
+    Returns a frame with PO_ID, stated_reason, Match/Not and Comments in the
+    same row order and with the same values as the original row-by-row loop.
+    Reasons are classified by `classifier`, default_classifier() if not given.
+    """
+    n = len(reasons_df)
+    po_ids = normalize_po_ids(reasons_df['PO_ID'])
+    raw_reasons = reasons_df['reason'] if 'reason' in reasons_df.columns else pd.Series([''] * n)
+
+    classes = (classifier or default_classifier()).classify_series(raw_reasons, ("reason", "rule", "direction"))
+    reasons = classes['reason'].to_numpy(dtype=object)
+    rules = classes['rule'].to_numpy(dtype=object)
+    directions = classes['direction'].to_numpy(dtype=object)
+
+    docs = DocumentJoin(po_ids, pos_df, asns_df, grns_df, invoices_df)
+    has_po, has_asn, has_grn, has_inv = docs.has("po"), docs.has("asn"), docs.has("grn"), docs.has("inv")
+
+    match = np.ones(n, dtype=bool)
+    comments = np.empty(n, dtype=object)
+
+    def assign(mask, match_value, comment):
+        match[mask] = match_value
+        comments[mask] = comment
+
+    def compare(mask, left, right, op, if_true, if_false, **columns):
+        """
+        Evaluate `left op right` on the masked rows. Each outcome is a
+        (match value, comment builder) pair; builders receive the str()
+        formatted columns named in `columns`.
+        """
+        sel = np.flatnonzero(mask)
+        if not len(sel):
+            return
+        with np.errstate(invalid='ignore'):
+            result = op(docs.values(*left, sel), docs.values(*right, sel)).astype(bool)
+        text = {name: docs.strings(*source, sel) for name, source in columns.items()}
+        match[sel] = np.where(result, if_true[0], if_false[0])
+        comments[sel] = np.where(result, if_true[1](**text), if_false[1](**text))
+
+    # Rule 1: No reason = Match (True)
+    assign(rules == "none", True, "No discrepancy")
+
+    # Rule 2: Late delivery, GRN received date after PO date (as dates, not strings)
+    in_rule = rules == "late"
+    assign(in_rule & ~has_po, False, "No PO data found")
+    assign(in_rule & has_po & ~has_grn, False, "No GRN found for this PO")
+    both = in_rule & has_po & has_grn
+    if docs.has_column("po", 'PO_Date') and docs.has_column("grn", 'Received_Date'):
+        sel = np.flatnonzero(both)
+        po_date = docs.dates("po", 'PO_Date', sel)
+        grn_date = docs.dates("grn", 'Received_Date', sel)
+        complete = ~(np.isnat(po_date) | np.isnat(grn_date))
+        assign(sel[~complete], False, "Date data incomplete")
+        sel, late = sel[complete], grn_date[complete] > po_date[complete]
+        grn, po = docs.strings("grn", 'Received_Date', sel), docs.strings("po", 'PO_Date', sel)
+        match[sel] = ~late
+        comments[sel] = np.where(late, "Late delivery: GRN date " + grn + " > PO date " + po, "On time delivery")
+    else:
+        assign(both, False, "Date data incomplete")
+
+    # Rule 3: Quantity mismatches, PO quantity vs GRN received quantity
+    in_rule = rules == "quantity"
+    both = in_rule & has_po & has_grn
+    assign(in_rule & ~both, False, "PO or GRN data not found")
+    if docs.has_column("po", 'Quantity') and docs.has_column("grn", 'Quantity_Received'):
+        compare(
+            both, ("po", 'Quantity'), ("grn", 'Quantity_Received'), np.not_equal,
+            (False, lambda po, grn: "Qty mismatch: PO=" + po + ", GRN=" + grn),
+            (True, lambda po, grn: "Qty match: " + po),
+            po=("po", 'Quantity'), grn=("grn", 'Quantity_Received'),
+        )
+    else:
+        assign(both, False, "Quantity data incomplete")
+
+    # Rule 4: Price/currency mismatches, PO unit price vs invoice unit price
+    in_rule = rules == "price"
+    both = in_rule & has_po & has_inv
+    assign(in_rule & ~both, False, "PO or Invoice data not found")
+    if docs.has_column("po", 'Unit_Price') and docs.has_column("inv", 'Unit_Price'):
+        compare(
+            both, ("po", 'Unit_Price'), ("inv", 'Unit_Price'), np.not_equal,
+            (False, lambda po, inv: "Price mismatch: PO=" + po + ", Invoice=" + inv),
+            (True, lambda po, inv: "Price match: " + po),
+            po=("po", 'Unit_Price'), inv=("inv", 'Unit_Price'),
+        )
+    else:
+        assign(both, False, "Price data incomplete")
+
+    # Rule 5: ASN/GRN mismatches, shipped vs received quantity
+    in_rule = rules == "asn_grn"
+    both = in_rule & has_asn & has_grn
+    assign(in_rule & ~both, False, "ASN or GRN data not found")
+    if docs.has_column("asn", 'Quantity_Shipped') and docs.has_column("grn", 'Quantity_Received'):
+        compare(
+            both, ("asn", 'Quantity_Shipped'), ("grn", 'Quantity_Received'), np.not_equal,
+            (False, lambda asn, grn: "ASN/GRN mismatch: ASN=" + asn + ", GRN=" + grn),
+            (True, lambda asn, grn: "ASN/GRN match: " + grn),
+            asn=("asn", 'Quantity_Shipped'), grn=("grn", 'Quantity_Received'),
+        )
+    else:
+        assign(both, False, "ASN/GRN quantity data incomplete")
+
+    # Rule 6: Over/under delivery or more/less received
+    in_rule = rules == "over_under"
+    both = in_rule & has_po & has_grn
+    assign(in_rule & ~both, False, "PO or GRN data not found")
+    if docs.has_column("po", 'Quantity') and docs.has_column("grn", 'Quantity_Received'):
+        quantities = {"po": ("po", 'Quantity'), "grn": ("grn", 'Quantity_Received')}
+        compare(
+            both & (directions == "over"), ("grn", 'Quantity_Received'), ("po", 'Quantity'), np.greater,
+            (False, lambda po, grn: "Over-delivery: PO=" + po + ", GRN=" + grn),
+            (True, lambda po, grn: "Normal delivery: " + grn),
+            **quantities,
+        )
+        compare(
+            both & (directions == "under"), ("grn", 'Quantity_Received'), ("po", 'Quantity'), np.less,
+            (False, lambda po, grn: "Under-delivery: PO=" + po + ", GRN=" + grn),
+            (True, lambda po, grn: "Normal delivery: " + grn),
+            **quantities,
+        )
+        compare(
+            both & (directions == "equal"), ("grn", 'Quantity_Received'), ("po", 'Quantity'), np.equal,
+            (True, lambda po, grn: "Qty comparison: PO=" + po + ", GRN=" + grn),
+            (False, lambda po, grn: "Qty comparison: PO=" + po + ", GRN=" + grn),
+            **quantities,
+        )
+    else:
+        assign(both, False, "Quantity data incomplete")
+
+    # Rule 7: Missing/no GRN
+    in_rule = rules == "missing_grn"
+    assign(in_rule & has_grn, True, "GRN exists")
+    assign(in_rule & ~has_grn, False, "Missing GRN - discrepancy confirmed")
+
+    # Rule 8: Multiple GRNs or split shipments
+    sel = np.flatnonzero(rules == "split")
+    counts = docs.grn_count[sel]
+    count_text = counts.astype(str).astype(object)
+    match[sel] = counts <= 1
+    comments[sel] = np.where(counts > 1, "Multiple GRNs: " + count_text, "Single GRN: " + count_text)
+
+    # Unknown reason - mark as invalid discrepancy
+    in_rule = rules == "unknown"
+    assign(in_rule, False, "Unknown reason: " + reasons[in_rule])
+
+    return pd.DataFrame({
+        "PO_ID": po_ids,
+        "stated_reason": np.where(reasons == '', "No reason", reasons).astype(object),
+        "Match/Not": match,
+        "Comments": comments,
+    })
+
+
+def summarize_results(final_df: pd.DataFrame):
+    """Overall and reason-wise statistics for a validation result frame"""
+    match_count = final_df['Match/Not'].sum()
+    total_count = len(final_df)
+    mismatch_count = total_count - match_count
+
+    summary_stats = {
+        'total_validations': int(total_count),
+        'match_count': int(match_count),
+        'mismatch_count': int(mismatch_count),
+        'match_rate': round((match_count / total_count * 100) if total_count > 0 else 0, 2),
+        'unique_po_count': int(final_df['PO_ID'].nunique()),
+    }
+
+    # Reason-wise summary, in first-appearance order before the stable sort
+    grouped = final_df.groupby('stated_reason', sort=False)['Match/Not'].agg(['size', 'sum'])
+    reason_summary = []
+    for reason, reason_total_count, reason_match_count in grouped.itertuples():
+        reason_summary.append({
+            'reason': reason,
+            'total_occurrences': int(reason_total_count),
+            'matched_count': int(reason_match_count),
+            'not_matched_count': int(reason_total_count - reason_match_count),
+            'match_rate': round((reason_match_count / reason_total_count * 100) if reason_total_count > 0 else 0, 2)
+        })
+
+    # Sort by occurrences
+    reason_summary.sort(key=lambda x: x['total_occurrences'], reverse=True)
+    return summary_stats, reason_summary
+
+
+def merge_penalties(reasons_df: pd.DataFrame, validation_df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Reasons left-joined with their validation verdict, penalty as a number.
+    POs without a validation row count as matched. Row-wise, so it can be
+    applied to consecutive chunks of reasons_df with the same result.
+    """
+    merged = pd.merge(
+        reasons_df.assign(penalty=pd.to_numeric(reasons_df['penalty'], errors='coerce').fillna(0)),
+        validation_df[['PO_ID', 'Match/Not']],
+        on='PO_ID',
+        how='left'
+    )
+    merged['Match/Not'] = merged['Match/Not'].fillna(True)
+    return merged
+
+
+def penalty_metrics(reasons_df: pd.DataFrame, merged_df: pd.DataFrame) -> dict:
+    """Penalty exposure and the recoverable share (penalties on discrepancies)"""
+    recoverable_penalty = float(merged_df.loc[merged_df['Match/Not'] == False, 'penalty'].sum())
+    total_penalty = float(merged_df['penalty'].sum())
+    recovery_rate = (recoverable_penalty / total_penalty * 100) if total_penalty > 0 else 0
+    pos_with_discrepancy = int(merged_df.loc[merged_df['Match/Not'] == False, 'PO_ID'].nunique())
+
+    return {
+        "total_penalty_claimed": round(total_penalty, 2),
+        "total_penalty_exposure": round(total_penalty, 2),
+        "penalty_that_can_be_saved": round(recoverable_penalty, 2),
+        "recoverable_amount": round(recoverable_penalty, 2),
+        "recovery_rate": round(recovery_rate, 2),
+        "percentage_saveable": round(recovery_rate, 1),
+        "pos_with_discrepancy": pos_with_discrepancy,
+        "total_pos": int(reasons_df['PO_ID'].nunique())
+    }
@@ -0,0 +1,102 @@
+# Benchmark: admin authorization check latency, per-call connections vs UserStore
+#
+# Usage (from the repository root):
+#   python -m benchmarks.bench_auth
+#   python -m benchmarks.bench_auth --users 100000 --checks 50000 --threads 1 8 32
+#
+# An authorization check is what /save-penalty-approvals does per request:
+# decode the JWT, look the user up and compare the role. Variants:
+#   connect     sqlite3.connect("users.db") + SELECT + close per check, as
+#               get_user_by_username used to do
+#   persistent  UserStore with the role cache off (one connection per thread)
+#   cached      UserStore with the default role TTL
+# Each runs in a temporary database of --users accounts, from 1 and more
+# threads (the sync endpoints run on a thread pool).
+import argparse
+import os
+import sqlite3
+import statistics
+import tempfile
+import threading
+import time
+
+import jwt
+
+from backend.user_store import UserStore
+
+SECRET = "bench-secret-with-at-least-32-bytes!"
+
+
+def legacy_get_user(db_path: str, username: str):
+    conn = sqlite3.connect(db_path)
+    cursor = conn.cursor()
+    cursor.execute("SELECT id, username, email, role FROM users WHERE username = ?", (username,))
+    result = cursor.fetchone()
+    conn.close()
+    if result:
+        return {"id": result[0], "username": result[1], "email": result[2], "role": result[3]}
+    return None
+
+
+def run(check, token: str, checks: int, threads: int) -> list:
+    """Per-check latencies in microseconds, `checks` split over `threads` threads"""
+    latencies = []
+    lock = threading.Lock()
+
+    def worker(count):
+        samples = []
+        for _ in range(count):
+            start = time.perf_counter()
+            username = jwt.decode(token, SECRET, algorithms=["HS256"])["sub"]
+            user = check(username)
+            assert user is not None and user["role"] == "admin"
+            samples.append((time.perf_counter() - start) * 1e6)
+        with lock:
+            latencies.extend(samples)
+
+    pool = [threading.Thread(target=worker, args=(checks // threads,)) for _ in range(threads)]
+    for thread in pool:
+        thread.start()
+    for thread in pool:
+        thread.join()
+    return latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--users", type=int, default=10_000)
+    parser.add_argument("--checks", type=int, default=20_000)
+    parser.add_argument("--threads", type=int, nargs="+", default=[1, 8])
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        db_path = os.path.join(directory, "users.db")
+        store = UserStore(db_path, role_ttl=0)
+        conn = sqlite3.connect(db_path)
+        with conn:
+            conn.executemany(
+                "INSERT INTO users (username, email, password, role) VALUES (?, ?, ?, ?)",
+                [(f"user{i}", f"user{i}@example.com", "x", "admin" if i == 0 else "user") for i in range(args.users)]
+            )
+        conn.close()
+        token = jwt.encode({"sub": "user0"}, SECRET, algorithm="HS256")
+
+        variants = {
+            "connect": lambda username: legacy_get_user(db_path, username),
+            "persistent": store.get,
+            "cached": UserStore(db_path).get,
+        }
+        print(f"{args.users:,} users, {args.checks:,} checks per run\n")
+        print(f"{'variant':>10} {'threads':>8} {'p50 (us)':>9} {'p99 (us)':>9} {'checks/s':>10}")
+        for threads in args.threads:
+            for name, check in variants.items():
+                start = time.perf_counter()
+                latencies = run(check, token, args.checks, threads)
+                elapsed = time.perf_counter() - start
+                p99 = statistics.quantiles(latencies, n=100)[98]
+                print(f"{name:>10} {threads:>8} {statistics.median(latencies):>9.1f} {p99:>9.1f} "
+                      f"{len(latencies) / elapsed:>10,.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+# Load test: login throughput and dashboard latency during a login storm
+#
+# Usage (from the repository root):
+#   python -m benchmarks.bench_login
+#   python -m benchmarks.bench_login --login-clients 64 --duration 10 --time-cost 2 --memory-cost 32768
+#
+# Starts the API under uvicorn with the local fake model (USE_FAKE_LLM=1),
+# measures /health and /api/po-analytics latency on an idle server, then
+# again while login clients keep POSTing /login. Reports logins/s and the
+# responses by status (429 = hashing queue full). The Argon2 cost and the
+# hashing pool are passed through the ARGON2_* / PASSWORD_HASH_* variables.
+# Run from a scratch working directory if you don't want users.db /
+# chat_history.db created here.
+import argparse
+import asyncio
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+import httpx
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PROBE_PATHS = ["/health", "/api/po-analytics"]
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+async def probe(client, stop_at):
+    """Sequentially hit the dashboard endpoints until stop_at, returning latencies in ms"""
+    latencies = {path: [] for path in PROBE_PATHS}
+    while time.perf_counter() < stop_at:
+        for path in PROBE_PATHS:
+            start = time.perf_counter()
+            response = await client.get(path)
+            response.raise_for_status()
+            latencies[path].append((time.perf_counter() - start) * 1000)
+        await asyncio.sleep(0.01)
+    return latencies
+
+
+async def login_client(client, stop_at, outcomes, login_ms):
+    while time.perf_counter() < stop_at:
+        start = time.perf_counter()
+        response = await client.post("/login", json={"username": "admin", "password": "admin"})
+        outcomes[response.status_code] = outcomes.get(response.status_code, 0) + 1
+        if response.status_code == 200:
+            login_ms.append((time.perf_counter() - start) * 1000)
+        elif response.status_code == 429:
+            # Honour Retry-After, capped so short runs still keep the hashing pool saturated
+            await asyncio.sleep(min(float(response.headers.get("Retry-After", 1)), 1.0))
+
+
+def report(label, latencies):
+    for path, samples in latencies.items():
+        print(f"{label:>11} {path:<20} n={len(samples):>5} "
+              f"p50={statistics.median(samples):7.2f}ms p99={percentile(samples, 99):7.2f}ms")
+
+
+async def run(args):
+    async with httpx.AsyncClient(base_url=args.url, timeout=120) as client:
+        for _ in range(100):
+            try:
+                if (await client.get("/health")).status_code == 200:
+                    break
+            except httpx.TransportError:
+                await asyncio.sleep(0.2)
+
+        idle = await probe(client, time.perf_counter() + args.duration)
+
+        outcomes, login_ms = {}, []
+        start = time.perf_counter()
+        stop_at = start + args.duration
+        logins = [
+            asyncio.create_task(login_client(client, stop_at, outcomes, login_ms))
+            for _ in range(args.login_clients)
+        ]
+        loaded = await probe(client, stop_at)
+        await asyncio.gather(*logins)
+        elapsed = time.perf_counter() - start
+
+    report("idle", idle)
+    report("login storm", loaded)
+    print(f"logins: {len(login_ms) / elapsed:.1f}/s, p50={statistics.median(login_ms):.0f}ms "
+          f"p99={percentile(login_ms, 99):.0f}ms" if login_ms else "logins: none succeeded")
+    print(f"login responses by status: {dict(sorted(outcomes.items()))}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Dashboard latency and login throughput under login load")
+    parser.add_argument("--login-clients", type=int, default=64)
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--time-cost", type=int, default=3, help="ARGON2_TIME_COST")
+    parser.add_argument("--memory-cost", type=int, default=65536, help="ARGON2_MEMORY_COST (KiB)")
+    parser.add_argument("--parallelism", type=int, default=4, help="ARGON2_PARALLELISM")
+    parser.add_argument("--workers", type=int, default=2, help="PASSWORD_HASH_WORKERS")
+    parser.add_argument("--queue", type=int, default=32, help="PASSWORD_HASH_QUEUE")
+    parser.add_argument("--port", type=int, default=8798)
+    args = parser.parse_args()
+    args.url = f"http://127.0.0.1:{args.port}"
+
+    env = dict(
+        os.environ, USE_FAKE_LLM="1", PYTHONPATH=ROOT,
+        ARGON2_TIME_COST=str(args.time_cost), ARGON2_MEMORY_COST=str(args.memory_cost),
+        ARGON2_PARALLELISM=str(args.parallelism),
+        PASSWORD_HASH_WORKERS=str(args.workers), PASSWORD_HASH_QUEUE=str(args.queue),
+    )
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "backend.main:app", "--port", str(args.port), "--log-level", "warning"],
+        env=env, stdout=subprocess.DEVNULL,
+    )
+    try:
+        asyncio.run(run(args))
+    finally:
+        server.terminate()
+        server.wait()
+
+
+if __name__ == "__main__":
+    main()
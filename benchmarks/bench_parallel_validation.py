@@ -0,0 +1,56 @@
+# Benchmark: sharded validation scaling over 1, 2, 4 and 8 worker processes
+#
+# Usage (from the repository root):
+#   python -m benchmarks.bench_parallel_validation
+#   python -m benchmarks.bench_parallel_validation --size 4000000 --workers 1 2 4 8 16 --repeat 5
+#
+# Uses the same synthetic uploads/-shaped dataset as bench_validation. Each
+# pool is started and warmed up before timing, so the numbers cover
+# partitioning, pickling shards to the workers and reassembling the result,
+# which is what a long-lived job worker pays per run.
+import argparse
+import os
+import time
+
+import pandas as pd
+
+from backend.parallel_validation import shutdown_pools, validate_sharded
+from backend.validation_engine import summarize_results, validate_reasons
+from benchmarks.bench_validation import load_uploads, synthesize
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--size", type=int, default=1_000_000)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--repeat", type=int, default=3, help="Timed runs per worker count (best is reported)")
+    args = parser.parse_args()
+
+    tables = synthesize(load_uploads(), args.size)
+    serial = validate_reasons(*tables)
+    serial_summary = summarize_results(serial)
+    print(f"{args.size:,} reasons, {os.cpu_count()} CPUs available")
+
+    print(f"{'workers':>8} {'best (s)':>10} {'speedup':>9} {'efficiency':>11}")
+    baseline = None
+    for workers in args.workers:
+        validate_sharded(*(df.head(1_000) for df in tables), workers=workers, min_rows=0)
+
+        timings = []
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            result = validate_sharded(*tables, workers=workers, min_rows=0)
+            timings.append(time.perf_counter() - start)
+        pd.testing.assert_frame_equal(result, serial)
+        assert summarize_results(result) == serial_summary
+
+        best = min(timings)
+        baseline = baseline or best
+        print(f"{workers:>8} {best:>10.3f} {baseline / best:>8.2f}x {baseline / best / workers:>10.0%}")
+
+    print("✓ Every worker count matches the serial engine row for row")
+    shutdown_pools()
+
+
+if __name__ == "__main__":
+    main()
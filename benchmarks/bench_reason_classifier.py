@@ -0,0 +1,107 @@
+# Benchmark: per-row keyword chains vs the compiled reason classifier
+#
+# Usage (from the repository root):
+#   python -m benchmarks.bench_reason_classifier
+#   python -m benchmarks.bench_reason_classifier --size 5000000 --free-text 0.2 --repeat 5
+#
+# Reasons are sampled from uploads/reasons.csv; a --free-text fraction gets
+# a per-row suffix ("late delivery #1234") so the keyword fallback and the
+# memo see many distinct reasons. Variants:
+#   per-row     the original if/elif chain and bucket lambda on every row
+#   per-unique  the same chain once per distinct reason, broadcast by code
+#   compiled    ReasonClassifier.classify_series, first call on a fresh
+#               classifier (cold) and repeated calls (warm)
+#   categorical compiled on the categorical column load_document() returns
+import argparse
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+from backend.reason_classifier import (
+    NO_REASON_VALUES, RULE_KEYWORDS, UNSPECIFIED_CATEGORY, RAW_REASON_MAP_FILE, REASON_BUCKETS_FILE,
+    ReasonClassifier, read_json,
+)
+from benchmarks.bench_validation import UPLOADS_PATH
+
+
+def chain_rule(reason: str) -> str:
+    """The keyword chain the validation loop used to run per row"""
+    if reason in NO_REASON_VALUES:
+        return "none"
+    for rule, keywords in RULE_KEYWORDS:
+        if any(keyword in reason for keyword in keywords):
+            return rule
+    return "unknown"
+
+
+def per_row(reasons: pd.Series, reason_buckets: dict):
+    normalized = reasons.apply(lambda x: str(x).strip().lower())
+    rules = normalized.apply(chain_rule)
+    buckets = reasons.apply(lambda x: reason_buckets.get(str(x).strip().lower(), UNSPECIFIED_CATEGORY))
+    return rules.to_numpy(dtype=object), buckets.to_numpy(dtype=object)
+
+
+def per_unique(reasons: pd.Series, reason_buckets: dict):
+    codes, uniques = pd.factorize(reasons, use_na_sentinel=False)
+    normalized = [str(x).strip().lower() for x in uniques]
+    rules = np.array([chain_rule(r) for r in normalized], dtype=object)
+    buckets = np.array([reason_buckets.get(r, UNSPECIFIED_CATEGORY) for r in normalized], dtype=object)
+    return rules[codes], buckets[codes]
+
+
+def compiled(reasons: pd.Series, classifier: ReasonClassifier):
+    classes = classifier.classify_series(reasons, ("rule", "bucket"))
+    return classes['rule'].to_numpy(dtype=object), classes['bucket'].to_numpy(dtype=object)
+
+
+def best_of(repeat: int, run):
+    timings, result = [], None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = run()
+        timings.append(time.perf_counter() - start)
+    return min(timings), result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--size", type=int, default=1_000_000)
+    parser.add_argument("--free-text", type=float, default=0.05, help="Fraction of rows with a unique suffix")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    pool = pd.read_csv(os.path.join(UPLOADS_PATH, "reasons.csv"))['reason'].to_numpy(dtype=object)
+    reasons = pool[rng.integers(0, len(pool), args.size)]
+    free = rng.random(args.size) < args.free_text
+    reasons[free] = [f"{reason} #{i}" for reason, i in zip(reasons[free], np.flatnonzero(free))]
+    reasons = pd.Series(reasons, dtype="str")
+
+    reason_buckets, raw_reason_map = read_json(REASON_BUCKETS_FILE), read_json(RAW_REASON_MAP_FILE)
+    print(f"{args.size:,} reasons, {reasons.nunique():,} distinct ({args.free_text:.0%} free text)\n")
+
+    row_time, expected = best_of(1, lambda: per_row(reasons, reason_buckets))
+    unique_time, result = best_of(args.repeat, lambda: per_unique(reasons, reason_buckets))
+    assert all((a == b).all() for a, b in zip(result, expected))
+    cold_time, result = best_of(1, lambda: compiled(reasons, ReasonClassifier(reason_buckets, raw_reason_map)))
+    assert all((a == b).all() for a, b in zip(result, expected))
+    classifier = ReasonClassifier(reason_buckets, raw_reason_map)
+    compiled(reasons, classifier)
+    warm_time, result = best_of(args.repeat, lambda: compiled(reasons, classifier))
+    assert all((a == b).all() for a, b in zip(result, expected))
+    categorical = reasons.astype("category")
+    categorical_time, result = best_of(args.repeat, lambda: compiled(categorical, classifier))
+    assert all((a == b).all() for a, b in zip(result, expected))
+
+    print(f"{'variant':>16} {'best (s)':>9} {'speedup':>8}")
+    for name, elapsed in (("per-row", row_time), ("per-unique", unique_time),
+                          ("compiled (cold)", cold_time), ("compiled (warm)", warm_time),
+                          ("categorical", categorical_time)):
+        print(f"{name:>16} {elapsed:>9.3f} {row_time / elapsed:>7.1f}x")
+    print("✓ Rules and buckets match the per-row chain")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+# Benchmark: latency a cache lookup adds while Redis is down or hanging
+#
+# Usage (from the repository root):
+#   python -m benchmarks.bench_redis_faults
+#   python -m benchmarks.bench_redis_faults --redis-url redis://localhost:6379/15 --budget 30
+#
+# Runs TieredCache lookups that miss the in-process tier (so each one goes
+# to Redis, as a cold /chat context or response lookup does) against:
+#   refused    nothing listening on the port
+#   blackhole  a local TCP server that accepts connections and never replies,
+#              like a Redis stuck on a fork or a half-dead network path
+#   healthy    a real Redis, when --redis-url is given
+# with two clients:
+#   default    redis.asyncio.Redis with the library's timeouts and retries and
+#              no circuit breaker, as main.py used to create it
+#   resilient  redis_client.connect() + ResilientRedis with main.py's defaults
+# Each scenario runs until --ops lookups or --budget seconds, whichever
+# comes first, and reports lookup latency percentiles.
+import argparse
+import asyncio
+import socket
+import statistics
+import time
+from urllib.parse import urlparse
+
+import redis.asyncio as aioredis
+
+from backend.redis_client import ResilientRedis, connect
+from backend.tiered_cache import LocalCache, TieredCache
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+async def blackhole(port: int):
+    """A server that takes connections and never answers"""
+    async def swallow(reader, writer):
+        try:
+            while await reader.read(65536):
+                pass
+        finally:
+            writer.close()
+    return await asyncio.start_server(swallow, "127.0.0.1", port)
+
+
+def clients(host: str, port: int, db: int) -> dict:
+    return {
+        "default": ResilientRedis(
+            aioredis.Redis(host=host, port=port, db=db, decode_responses=True),
+            failure_threshold=10 ** 9, call_timeout=None,
+        ),
+        "resilient": ResilientRedis(connect(host, port, db)),
+    }
+
+
+async def run(redis, ops: int, budget: float) -> list:
+    cache = TieredCache(redis, LocalCache(max_entries=0))
+    latencies = []
+    stop_at = time.perf_counter() + budget
+    for i in range(ops):
+        if time.perf_counter() >= stop_at:
+            break
+        start = time.perf_counter()
+        await cache.get(f"bench:fault:{i}")
+        latencies.append((time.perf_counter() - start) * 1000)
+    return latencies
+
+
+def report(scenario: str, name: str, latencies: list):
+    if not latencies:
+        print(f"{scenario:>10} {name:>10}  no lookup finished")
+        return
+    ordered = sorted(latencies)
+    p99 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.99))]
+    print(f"{scenario:>10} {name:>10} {len(latencies):>6} {statistics.median(latencies):>10.2f} "
+          f"{p99:>10.2f} {ordered[-1]:>10.2f} {sum(latencies) / 1000:>9.2f}")
+
+
+async def main_async(args):
+    scenarios = {"refused": ("127.0.0.1", free_port(), 0)}
+    hole_port = free_port()
+    server = await blackhole(hole_port)
+    scenarios["blackhole"] = ("127.0.0.1", hole_port, 0)
+    if args.redis_url:
+        url = urlparse(args.redis_url)
+        scenarios["healthy"] = (url.hostname, url.port or 6379, int(url.path.strip("/") or 0))
+
+    print(f"up to {args.ops} lookups or {args.budget:g}s per run\n")
+    print(f"{'scenario':>10} {'client':>10} {'ops':>6} {'p50 (ms)':>10} {'p99 (ms)':>10} "
+          f"{'max (ms)':>10} {'total (s)':>9}")
+    for scenario, (host, port, db) in scenarios.items():
+        for name, redis in clients(host, port, db).items():
+            report(scenario, name, await run(redis, args.ops, args.budget))
+            try:
+                await redis.close()
+            except Exception:
+                pass
+    server.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Cache lookup latency under Redis faults")
+    parser.add_argument("--redis-url", help="Also measure a healthy Redis")
+    parser.add_argument("--ops", type=int, default=500)
+    parser.add_argument("--budget", type=float, default=20.0, help="Seconds per scenario and client")
+    args = parser.parse_args()
+    asyncio.run(main_async(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,211 @@
+# Benchmark: per-turn chat context cache cost, JSON blob vs Redis list
+#
+# Usage (from the repository root):
+#   python -m benchmarks.bench_session_context                      # fakeredis[lua]
+#   python -m benchmarks.bench_session_context --redis-url redis://localhost:6379/15
+#
+# A chat turn reads the session context for the prompt and, once answered,
+# appends the turn to it. Variants:
+#   blob  the previous scheme: GET + json.loads for the prompt, then GET +
+#         json.loads + append + trim + json.dumps + SETEX of the whole context
+#   list    SessionContextCache on Redis alone: one Lua LRANGE that returns
+#           a JSON array for the prompt, then one Lua RPUSHX + LTRIM + EXPIRE
+#   tiered  the same with the in-process LocalCache in front, as main.py runs
+#           it: the prompt read is served from memory
+# Every session starts with a full window, so both variants run warm. After
+# the timings, --writers concurrent appenders hit one session to check that
+# list appends stay atomic (pairs intact, window respected). fakeredis
+# emulates every command in Python, so its timings say little beyond the
+# round-trip counts; point --redis-url at a real server for latencies. The
+# database given is flushed.
+import argparse
+import asyncio
+import inspect
+import json
+import statistics
+import time
+
+import redis.asyncio as aioredis
+from redis.commands.core import AsyncScript
+
+from backend.session_context import SessionContextCache
+from backend.redis_client import ResilientRedis
+from backend.tiered_cache import LocalCache, TieredCache
+
+TTL = 86400
+
+
+class BlobContext:
+    """The JSON-blob context cache main.py used before SessionContextCache"""
+
+    def __init__(self, client, load_recent, window):
+        self.client = client
+        self.load_recent = load_recent
+        self.window = window
+
+    async def get(self, session_id):
+        key = f"chat_context:{session_id}"
+        cached = await self.client.get(key)
+        if cached:
+            return json.loads(cached)
+        messages = []
+        for turn in await self.load_recent(session_id, self.window):
+            messages.append({"role": "user", "content": turn['user_message']})
+            messages.append({"role": "assistant", "content": turn['assistant_message']})
+        await self.client.setex(key, TTL, json.dumps(messages))
+        return messages
+
+    async def append(self, session_id, user_message, assistant_message):
+        key = f"chat_context:{session_id}"
+        cached = await self.client.get(key)
+        messages = json.loads(cached) if cached else await self.get(session_id)
+        messages.append({"role": "user", "content": user_message})
+        messages.append({"role": "assistant", "content": assistant_message})
+        if len(messages) > self.window * 2:
+            messages = messages[-(self.window * 2):]
+        await self.client.setex(key, TTL, json.dumps(messages))
+
+
+class CountingClient:
+    """Counts round trips (a pipeline execute is one) and bytes of string arguments sent"""
+
+    def __init__(self, client):
+        self._client = client
+        self.round_trips = 0
+        self.bytes_sent = 0
+
+    def __getattr__(self, name):
+        attr = getattr(self._client, name)
+        if name == "register_script":
+            # Scripts call back into the client they were registered with
+            return lambda script: AsyncScript(self, script)
+        if name == "pipeline":
+            def pipeline(*args, **kwargs):
+                pipe = attr(*args, **kwargs)
+                execute = pipe.execute
+
+                async def counted_execute(*a, **k):
+                    self.round_trips += 1
+                    return await execute(*a, **k)
+                pipe.execute = counted_execute
+                return pipe
+            return pipeline
+        if not callable(attr):
+            return attr
+
+        def command(*args, **kwargs):
+            result = attr(*args, **kwargs)
+            if inspect.isawaitable(result):
+                self.round_trips += 1
+                self.bytes_sent += sum(len(arg) for arg in args if isinstance(arg, (str, bytes)))
+            return result
+        return command
+
+
+def make_history(sessions, window, message_size):
+    answer = "x" * message_size
+    return {
+        f"s{i}": [
+            {"user_message": f"question {t} about PO {i}", "assistant_message": f"{t} {answer}"}
+            for t in range(window)
+        ]
+        for i in range(sessions)
+    }
+
+
+async def run_turns(cache, history, turns, message_size):
+    latencies = []
+    sessions = list(history)
+    answer = "y" * message_size
+    for turn in range(turns):
+        session_id = sessions[turn % len(sessions)]
+        start = time.perf_counter()
+        await cache.get(session_id)
+        history[session_id].append({"user_message": f"q{turn}", "assistant_message": answer})
+        await cache.append(session_id, f"q{turn}", answer)
+        latencies.append((time.perf_counter() - start) * 1e6)
+    return latencies
+
+
+async def check_concurrent_appends(client, writers, window):
+    history = {"shared": make_history(1, window, 10)["s0"]}
+
+    async def load_recent(session_id, limit):
+        return history[session_id][-limit:]
+
+    # No local tier: every appender behaves like a separate worker
+    cache = SessionContextCache(
+        TieredCache(ResilientRedis(client), LocalCache(max_entries=0)), load_recent, window=window
+    )
+    await cache.get("shared")
+    await asyncio.gather(*[
+        cache.append("shared", f"user {w}", f"assistant {w}") for w in range(writers)
+    ])
+    messages = await cache.get("shared")
+    paired = all(
+        user["role"] == "user" and reply["role"] == "assistant"
+        and user["content"].split()[-1] == reply["content"].split()[-1]
+        for user, reply in zip(messages[::2], messages[1::2])
+    )
+    return len(messages), paired
+
+
+async def main_async(args):
+    if args.redis_url:
+        raw = aioredis.Redis.from_url(args.redis_url, decode_responses=True)
+        label = args.redis_url
+    else:
+        import fakeredis
+        raw = fakeredis.FakeAsyncRedis(decode_responses=True)
+        label = "fakeredis"
+    await raw.flushdb()
+    print(f"{label}: {args.sessions} sessions, {args.turns:,} turns, window {args.window}, "
+          f"{args.message_size}-byte answers\n")
+    print(f"{'variant':>8} {'p50 (us)':>9} {'p99 (us)':>9} {'turns/s':>9} {'round trips/turn':>17} "
+          f"{'bytes sent/turn':>16}")
+
+    variants = {
+        "blob": BlobContext,
+        "list": lambda client, load_recent, window: SessionContextCache(
+            TieredCache(ResilientRedis(client), LocalCache(max_entries=0)), load_recent, window=window),
+        "tiered": lambda client, load_recent, window: SessionContextCache(
+            TieredCache(ResilientRedis(client), LocalCache()), load_recent, window=window),
+    }
+    for name, make in variants.items():
+        history = make_history(args.sessions, args.window, args.message_size)
+
+        async def load_recent(session_id, limit):
+            return history[session_id][-limit:]
+
+        client = CountingClient(raw)
+        cache = make(client, load_recent, window=args.window)
+        for session_id in history:
+            await cache.get(session_id)
+        client.round_trips = client.bytes_sent = 0
+        start = time.perf_counter()
+        latencies = await run_turns(cache, history, args.turns, args.message_size)
+        elapsed = time.perf_counter() - start
+        p99 = statistics.quantiles(latencies, n=100)[98]
+        print(f"{name:>8} {statistics.median(latencies):>9.1f} {p99:>9.1f} {args.turns / elapsed:>9,.0f} "
+              f"{client.round_trips / args.turns:>17.1f} {client.bytes_sent / args.turns:>16,.0f}")
+
+    length, paired = await check_concurrent_appends(raw, args.writers, args.window)
+    print(f"\n{args.writers} concurrent appends: {length} messages kept "
+          f"(window {2 * args.window}), pairs intact: {paired}")
+    await raw.flushdb()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-turn chat context cache cost")
+    parser.add_argument("--redis-url", help="Redis to run against (default: in-process fakeredis)")
+    parser.add_argument("--sessions", type=int, default=200)
+    parser.add_argument("--turns", type=int, default=5000)
+    parser.add_argument("--window", type=int, default=15)
+    parser.add_argument("--message-size", type=int, default=800)
+    parser.add_argument("--writers", type=int, default=50)
+    args = parser.parse_args()
+    asyncio.run(main_async(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+# Benchmark: pd.read_csv vs the memory-mapped Arrow copies from columnar_store
+#
+# Usage (from the repository root):
+#   python -m benchmarks.bench_storage
+#   python -m benchmarks.bench_storage --size 2000000 --repeat 5
+#
+# Writes the synthetic uploads/-shaped tables from bench_validation to a
+# temporary directory, converts them once, then loads every table in a
+# fresh process per variant so memory is measured in isolation. Arrow
+# columns are paged in lazily, so each variant also hashes every loaded
+# value once ("scan") and RSS is taken after that:
+#   csv        pd.read_csv(path), what the endpoints and jobs used to do
+#   arrow      load_document(name, path), all columns
+#   projected  load_document(name, path, VALIDATION_COLUMNS[name]), what a
+#              validation job reads
+import argparse
+import multiprocessing
+import os
+import resource
+import tempfile
+import time
+
+from benchmarks.bench_validation import load_uploads, synthesize
+
+TABLES = ("reasons", "pos", "asns", "grns", "invoices")
+
+
+def _rss_mb() -> float:
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[1]) * resource.getpagesize() / 2**20
+
+
+def _load(variant: str, paths: dict, results):
+    import pandas as pd
+
+    from backend.columnar_store import load_document
+    from backend.validation_engine import VALIDATION_COLUMNS
+
+    baseline = _rss_mb()
+    start = time.perf_counter()
+    frames = []
+    for name, path in paths.items():
+        if variant == "csv":
+            frames.append(pd.read_csv(path))
+        elif variant == "arrow":
+            frames.append(load_document(name, path))
+        else:
+            frames.append(load_document(name, path, VALIDATION_COLUMNS[name]))
+    load = time.perf_counter() - start
+    for frame in frames:
+        pd.util.hash_pandas_object(frame, index=False).sum()
+    scan = time.perf_counter() - start
+    results.put((load, scan, _rss_mb() - baseline, sum(len(frame.columns) for frame in frames)))
+
+
+def measure(context, variant: str, paths: dict):
+    results = context.Queue()
+    process = context.Process(target=_load, args=(variant, paths, results))
+    process.start()
+    result = results.get()
+    process.join()
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--size", type=int, default=1_000_000)
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per variant (best times, max RSS)")
+    args = parser.parse_args()
+
+    from backend.columnar_store import convert, pa
+
+    if pa is None:
+        raise SystemExit("pyarrow is not installed; only the CSV path is available")
+
+    context = multiprocessing.get_context("spawn")
+    with tempfile.TemporaryDirectory() as directory:
+        paths = {}
+        for name, frame in zip(TABLES, synthesize(load_uploads(), args.size)):
+            paths[name] = os.path.join(directory, f"{name}.csv")
+            frame.to_csv(paths[name], index=False)
+        csv_mb = sum(os.path.getsize(path) for path in paths.values()) / 1e6
+
+        start = time.perf_counter()
+        for name, path in paths.items():
+            convert(name, path)
+        print(f"{args.size:,} reasons, {csv_mb:.0f} MB of CSV, one-time conversion "
+              f"{time.perf_counter() - start:.2f}s\n")
+
+        print(f"{'variant':>10} {'columns':>8} {'load (s)':>9} {'load+scan (s)':>14} {'RSS (MB)':>9} {'speedup':>8}")
+        baseline = None
+        for variant in ("csv", "arrow", "projected"):
+            runs = [measure(context, variant, paths) for _ in range(args.repeat)]
+            load, scan = min(run[0] for run in runs), min(run[1] for run in runs)
+            rss = max(run[2] for run in runs)
+            baseline = baseline or scan
+            print(f"{variant:>10} {runs[0][3]:>8} {load:>9.3f} {scan:>14.3f} {rss:>9.0f} {baseline / scan:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
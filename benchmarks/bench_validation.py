@@ -0,0 +1,217 @@
+# Benchmark: row-by-row /run-validation loop vs the vectorized validation engine
+#
+# Usage (from the repository root):
+#   python -m benchmarks.bench_validation
+#   python -m benchmarks.bench_validation --sizes 1000 100000 1000000 --legacy-sample 2000
+#
+# Synthetic datasets are generated from the uploads/ schemas with one PO per
+# reason. The legacy loop scans every document table per reason, so at large
+# sizes it is timed on a sample of reasons and extrapolated linearly.
+import argparse
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+from backend.validation_engine import validate_reasons
+
+UPLOADS_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "uploads")
+
+
+def legacy_validate(reasons_df, pos_df, asns_df, grns_df, invoices_df):
+    """The original per-row rule loop from run_validation, kept as the reference"""
+    final_results = []
+
+    for _, row in reasons_df.iterrows():
+        po_id = str(row['PO_ID']).strip()
+        reason = str(row.get('reason', '')).strip().lower()
+
+        match = True
+        comment = "Valid reason"
+
+        if reason in ['no reason', 'no issues', 'none', '']:
+            match = True
+            comment = "No discrepancy"
+
+        elif 'late' in reason or 'delivered' in reason:
+            po_data = pos_df[pos_df['PO_ID'] == po_id] if not pos_df.empty else None
+            if po_data is not None and not po_data.empty:
+                po_date = po_data['PO_Date'].iloc[0] if 'PO_Date' in pos_df.columns else None
+                grn_data = grns_df[grns_df['PO_ID'] == po_id] if not grns_df.empty else None
+                if grn_data is not None and not grn_data.empty:
+                    grn_date = grn_data['Received_Date'].iloc[0] if 'Received_Date' in grns_df.columns else None
+                    if po_date and grn_date:
+                        match = False if grn_date > po_date else True
+                        comment = f"Late delivery: GRN date {grn_date} > PO date {po_date}" if not match else "On time delivery"
+                    else:
+                        match = False
+                        comment = "Date data incomplete"
+                else:
+                    match = False
+                    comment = "No GRN found for this PO"
+            else:
+                match = False
+                comment = "No PO data found"
+
+        elif 'quantity' in reason or 'qty' in reason or 'mismatch' in reason:
+            po_data = pos_df[pos_df['PO_ID'] == po_id] if not pos_df.empty else None
+            grn_data = grns_df[grns_df['PO_ID'] == po_id] if not grns_df.empty else None
+            if po_data is not None and not po_data.empty and grn_data is not None and not grn_data.empty:
+                po_qty = po_data['Quantity'].iloc[0] if 'Quantity' in pos_df.columns else None
+                grn_qty = grn_data['Quantity_Received'].iloc[0] if 'Quantity_Received' in grns_df.columns else None
+                if po_qty is not None and grn_qty is not None:
+                    match = False if po_qty != grn_qty else True
+                    comment = f"Qty mismatch: PO={po_qty}, GRN={grn_qty}" if not match else f"Qty match: {po_qty}"
+                else:
+                    match = False
+                    comment = "Quantity data incomplete"
+            else:
+                match = False
+                comment = "PO or GRN data not found"
+
+        elif 'price' in reason or 'currency' in reason:
+            po_data = pos_df[pos_df['PO_ID'] == po_id] if not pos_df.empty else None
+            invoices_data = invoices_df[invoices_df['PO_ID'] == po_id] if not invoices_df.empty else None
+            if po_data is not None and not po_data.empty and invoices_data is not None and not invoices_data.empty:
+                po_price = po_data['Unit_Price'].iloc[0] if 'Unit_Price' in pos_df.columns else None
+                inv_price = invoices_data['Unit_Price'].iloc[0] if 'Unit_Price' in invoices_df.columns else None
+                if po_price is not None and inv_price is not None:
+                    match = False if po_price != inv_price else True
+                    comment = f"Price mismatch: PO={po_price}, Invoice={inv_price}" if not match else f"Price match: {po_price}"
+                else:
+                    match = False
+                    comment = "Price data incomplete"
+            else:
+                match = False
+                comment = "PO or Invoice data not found"
+
+        elif 'asn' in reason or 'grn' in reason or 'shipment' in reason:
+            asn_data = asns_df[asns_df['PO_ID'] == po_id] if not asns_df.empty else None
+            grn_data = grns_df[grns_df['PO_ID'] == po_id] if not grns_df.empty else None
+            if asn_data is not None and not asn_data.empty and grn_data is not None and not grn_data.empty:
+                asn_qty = asn_data['Quantity_Shipped'].iloc[0] if 'Quantity_Shipped' in asns_df.columns else None
+                grn_qty = grn_data['Quantity_Received'].iloc[0] if 'Quantity_Received' in grns_df.columns else None
+                if asn_qty is not None and grn_qty is not None:
+                    match = False if asn_qty != grn_qty else True
+                    comment = f"ASN/GRN mismatch: ASN={asn_qty}, GRN={grn_qty}" if not match else f"ASN/GRN match: {grn_qty}"
+                else:
+                    match = False
+                    comment = "ASN/GRN quantity data incomplete"
+            else:
+                match = False
+                comment = "ASN or GRN data not found"
+
+        elif any(x in reason for x in ['delivered', 'received', 'over', 'under', 'more', 'less']):
+            po_data = pos_df[pos_df['PO_ID'] == po_id] if not pos_df.empty else None
+            grn_data = grns_df[grns_df['PO_ID'] == po_id] if not grns_df.empty else None
+            if po_data is not None and not po_data.empty and grn_data is not None and not grn_data.empty:
+                po_qty = po_data['Quantity'].iloc[0] if 'Quantity' in pos_df.columns else None
+                grn_qty = grn_data['Quantity_Received'].iloc[0] if 'Quantity_Received' in grns_df.columns else None
+                if po_qty is not None and grn_qty is not None:
+                    if 'over' in reason or 'more' in reason:
+                        match = False if grn_qty > po_qty else True
+                        comment = f"Over-delivery: PO={po_qty}, GRN={grn_qty}" if grn_qty > po_qty else f"Normal delivery: {grn_qty}"
+                    elif 'under' in reason or 'less' in reason:
+                        match = False if grn_qty < po_qty else True
+                        comment = f"Under-delivery: PO={po_qty}, GRN={grn_qty}" if grn_qty < po_qty else f"Normal delivery: {grn_qty}"
+                    else:
+                        match = grn_qty == po_qty
+                        comment = f"Qty comparison: PO={po_qty}, GRN={grn_qty}"
+                else:
+                    match = False
+                    comment = "Quantity data incomplete"
+            else:
+                match = False
+                comment = "PO or GRN data not found"
+
+        elif 'missing' in reason or 'no grn' in reason:
+            grn_data = grns_df[grns_df['PO_ID'] == po_id] if not grns_df.empty else None
+            match = False if grn_data is None or grn_data.empty else True
+            comment = "Missing GRN - discrepancy confirmed" if not match else "GRN exists"
+
+        elif 'multiple' in reason or 'split' in reason:
+            grn_data = grns_df[grns_df['PO_ID'] == po_id] if not grns_df.empty else None
+            grn_count = len(grn_data) if grn_data is not None else 0
+            match = False if grn_count > 1 else True
+            comment = f"Multiple GRNs: {grn_count}" if grn_count > 1 else f"Single GRN: {grn_count}"
+
+        else:
+            match = False
+            comment = f"Unknown reason: {reason}"
+
+        final_results.append({
+            "PO_ID": po_id,
+            "stated_reason": reason if reason else "No reason",
+            "Match/Not": match,
+            "Comments": comment
+        })
+
+    return pd.DataFrame(final_results)
+
+
+def load_uploads():
+    """Load the bundled uploads/ tables used by validation"""
+    names = ["reasons", "pos", "asns", "grns", "invoices"]
+    return {name: pd.read_csv(os.path.join(UPLOADS_PATH, f"{name}.csv")) for name in names}
+
+
+def synthesize(uploads, n_reasons, seed=42):
+    """
+    Scale the uploads/ tables to n_reasons POs by resampling their rows and
+    re-keying PO_ID, keeping the real reason mix, column dtypes and the
+    occasional missing or repeated supporting document.
+    """
+    rng = np.random.default_rng(seed)
+    po_ids = np.array([f"PO{i:07d}" for i in range(n_reasons)], dtype=object)
+
+    def resample(df, keys):
+        rows = df.iloc[rng.integers(0, len(df), len(keys))].reset_index(drop=True)
+        rows['PO_ID'] = keys
+        return rows
+
+    reasons = resample(uploads["reasons"], po_ids)
+    pos = resample(uploads["pos"], po_ids[rng.random(n_reasons) < 0.95])
+    asns = resample(uploads["asns"], po_ids[rng.random(n_reasons) < 0.9])
+    invoices = resample(uploads["invoices"], po_ids[rng.random(n_reasons) < 0.9])
+    grn_keys = po_ids[rng.random(n_reasons) < 0.9]
+    grn_keys = np.concatenate([grn_keys, grn_keys[rng.random(len(grn_keys)) < 0.1]])
+    grns = resample(uploads["grns"], grn_keys)
+    return reasons, pos, asns, grns, invoices
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1_000, 100_000, 1_000_000])
+    parser.add_argument("--legacy-sample", type=int, default=2_000,
+                        help="Max reasons timed with the legacy loop before extrapolating")
+    args = parser.parse_args()
+
+    uploads = load_uploads()
+
+    # Equivalence check on the real uploads/ data
+    tables = (uploads["reasons"], uploads["pos"], uploads["asns"], uploads["grns"], uploads["invoices"])
+    pd.testing.assert_frame_equal(legacy_validate(*tables), validate_reasons(*tables))
+    print("✓ Engine output matches the legacy loop on uploads/")
+
+    print(f"{'reasons':>10} {'legacy (s)':>14} {'engine (s)':>12} {'speedup':>10}")
+    for size in args.sizes:
+        reasons, pos, asns, grns, invoices = synthesize(uploads, size)
+
+        start = time.perf_counter()
+        result = validate_reasons(reasons, pos, asns, grns, invoices)
+        engine_time = time.perf_counter() - start
+
+        sample = reasons.head(min(size, args.legacy_sample))
+        start = time.perf_counter()
+        legacy = legacy_validate(sample, pos, asns, grns, invoices)
+        legacy_time = (time.perf_counter() - start) * size / len(sample)
+        pd.testing.assert_frame_equal(legacy, result.head(len(sample)))
+
+        estimated = "~" if len(sample) < size else ""
+        print(f"{size:>10,} {estimated + format(legacy_time, '.2f'):>14} {engine_time:>12.3f} "
+              f"{legacy_time / engine_time:>9.0f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+# Load test: non-chat endpoint latency while /chat is saturated
+#
+# Usage (from the repository root):
+#   python -m benchmarks.load_chat
+#   python -m benchmarks.load_chat --chat-clients 64 --duration 10 --llm-delay 0.1
+#
+# Starts the API under uvicorn with the local fake model (USE_FAKE_LLM=1),
+# measures /health and /api/po-analytics latency on an idle server, then
+# again while chat clients keep the LLM limiter full. Run from a scratch
+# working directory if you don't want users.db / chat_history.db created here.
+import argparse
+import asyncio
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+import httpx
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PROBE_PATHS = ["/health", "/api/po-analytics"]
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+async def probe(client, stop_at):
+    """Sequentially hit the non-chat endpoints until stop_at, returning latencies in ms"""
+    latencies = {path: [] for path in PROBE_PATHS}
+    while time.perf_counter() < stop_at:
+        for path in PROBE_PATHS:
+            start = time.perf_counter()
+            response = await client.get(path)
+            response.raise_for_status()
+            latencies[path].append((time.perf_counter() - start) * 1000)
+        await asyncio.sleep(0.01)
+    return latencies
+
+
+async def chat_client(client, token, client_id, stop_at, outcomes):
+    headers = {"Authorization": f"Bearer {token}"}
+    turn = 0
+    while time.perf_counter() < stop_at:
+        response = await client.post(
+            "/chat",
+            json={"session_id": f"load-{client_id}", "message": f"question {turn} about recovery rate"},
+            headers=headers,
+        )
+        outcomes[response.status_code] = outcomes.get(response.status_code, 0) + 1
+        if response.status_code == 429:
+            # Honour Retry-After, capped so short runs still keep the limiter saturated
+            await asyncio.sleep(min(float(response.headers.get("Retry-After", 1)), 1.0))
+        turn += 1
+
+
+def report(label, latencies):
+    for path, samples in latencies.items():
+        print(f"{label:>10} {path:<20} n={len(samples):>5} "
+              f"p50={statistics.median(samples):7.2f}ms p99={percentile(samples, 99):7.2f}ms")
+
+
+async def run(args):
+    async with httpx.AsyncClient(base_url=args.url, timeout=60) as client:
+        for _ in range(100):
+            try:
+                if (await client.get("/health")).status_code == 200:
+                    break
+            except httpx.TransportError:
+                await asyncio.sleep(0.2)
+        login = await client.post("/login", json={"username": "admin", "password": "admin"})
+        token = login.json()["access_token"]
+
+        idle = await probe(client, time.perf_counter() + args.duration)
+
+        outcomes = {}
+        stop_at = time.perf_counter() + args.duration
+        chats = [
+            asyncio.create_task(chat_client(client, token, i, stop_at, outcomes))
+            for i in range(args.chat_clients)
+        ]
+        loaded = await probe(client, stop_at)
+        await asyncio.gather(*chats)
+
+    report("idle", idle)
+    report("chat load", loaded)
+    print(f"chat responses by status: {dict(sorted(outcomes.items()))}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Non-chat latency under chat load")
+    parser.add_argument("--chat-clients", type=int, default=64)
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--llm-delay", type=float, default=0.1, help="Fake model delay per streamed word (s)")
+    parser.add_argument("--port", type=int, default=8799)
+    args = parser.parse_args()
+    args.url = f"http://127.0.0.1:{args.port}"
+
+    env = dict(os.environ, USE_FAKE_LLM="1", FAKE_LLM_DELAY=str(args.llm_delay), PYTHONPATH=ROOT)
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "backend.main:app", "--port", str(args.port), "--log-level", "warning"],
+        env=env, stdout=subprocess.DEVNULL,
+    )
+    try:
+        asyncio.run(run(args))
+    finally:
+        server.terminate()
+        server.wait()
+
+
+if __name__ == "__main__":
+    main()
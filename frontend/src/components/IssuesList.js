@@ -66,12 +66,24 @@ const IssuesList = () => {
   useEffect(() => {
     const fetchPOIssues = async () => {
       try {
-        const response = await fetch("http://54.145.92.198:8000/api/po-level-issues");
+        // /api/po-level-issues is paginated; follow nextCursor until the last page
+        let poWithIssues = [];
+        let cursor = null;
+        let response;
+        let data;
+        do {
+          const query = cursor ? `?limit=1000&cursor=${encodeURIComponent(cursor)}` : "?limit=1000";
+          response = await fetch(`http://54.145.92.198:8000/api/po-level-issues${query}`);
+          if (!response.ok) break;
+          data = await response.json();
+          if (data.status !== "success") break;
+          poWithIssues = poWithIssues.concat(data.poWithIssues);
+          cursor = data.nextCursor;
+        } while (cursor);
         if (response.ok) {
-          const data = await response.json();
           if (data.status === "success") {
             // Transform PO-level data with random assignees
-            const poIssues = data.poWithIssues.map((po, idx) => ({
+            const poIssues = poWithIssues.map((po, idx) => ({
               id: idx,
               po_id: po.po_id,
               stated_reason: po.stated_reason,
@@ -3,7 +3,7 @@ import { Box, Typography, Button, Card, CardContent } from "@mui/material";
 import PlayCircleOutlineIcon from '@mui/icons-material/PlayCircleOutline';
 import ValidationKPIs from "./ValidationKPIs";
 import { BACKEND_URL } from "../utils/backend";
-import { apiCall } from "../utils/api";
+import { runJob } from "../utils/api";
 
 function Validation() {
   const [running, setRunning] = useState(false);
@@ -14,7 +14,7 @@ function Validation() {
     setRunning(true);
     setRunMsg("");
     try {
-      const data = await apiCall("/run-validation", { method: "POST" });
+      const data = await runJob("/run-validation");
       setRunMsg(data.status === "success" ? "Validation workflow completed successfully!" : "Workflow failed.");
       setRefresh(r => r + 1); // trigger refresh
     } catch (e) {
@@ -3,7 +3,7 @@ import { Box, Grid, Typography, CircularProgress, FormControl, InputLabel, Selec
 import { PieChart, Pie, Cell, Tooltip, Legend, BarChart, Bar, XAxis, YAxis, ResponsiveContainer, LineChart, Line, CartesianGrid, ComposedChart } from "recharts";
 import { AttachMoney as AttachMoneyIcon, ShowChart as ShowChartIcon, MonetizationOn as MonetizationOnIcon, Savings as SavingsIcon, FilterList as FilterListIcon } from '@mui/icons-material';
 import { BACKEND_URL } from "../utils/backend";
-import { apiCall } from "../utils/api";
+import { runJob } from "../utils/api";
 import PenaltyTable from "./PenaltyTable";
 
 const COLORS = ["#1976d2", "#43a047", "#fbc02d", "#e53935", "#8e24aa", "#00acc1"];
@@ -35,12 +35,19 @@ function ValidationKPIs({ refresh }) {
         let reasonsParsed = [];
         try {
 
-          const allPenaltiesRes = await fetch(`${BACKEND_URL}/all-penalties`);
-          if (allPenaltiesRes.ok) {
+          // /all-penalties is paginated; follow next_cursor until the last page
+          let allPenaltiesRes;
+          let cursor = null;
+          do {
+            const query = cursor ? `?limit=1000&cursor=${encodeURIComponent(cursor)}` : "?limit=1000";
+            allPenaltiesRes = await fetch(`${BACKEND_URL}/all-penalties${query}`);
+            if (!allPenaltiesRes.ok) break;
             const allPenaltiesData = await allPenaltiesRes.json();
-            reasonsParsed = allPenaltiesData.penalties;
+            reasonsParsed = reasonsParsed.concat(allPenaltiesData.penalties);
+            cursor = allPenaltiesData.next_cursor;
+          } while (cursor);
 
-          } else {
+          if (!allPenaltiesRes.ok) {
 
             // Fallback to direct CSV file
             const reasonsRes = await fetch(`${BACKEND_URL}/results/reasons.csv`);
@@ -113,10 +120,7 @@ function ValidationKPIs({ refresh }) {
         setReasonsData(reasonsWithNumberPenalty);
         
         // Fetch penalty metrics - this endpoint will use the existing penalty values
-        const penaltyData = await apiCall("/calculate-penalties", {
-          method: 'POST',
-          headers: { 'Content-Type': 'application/json' }
-        });
+        const penaltyData = await runJob("/calculate-penalties");
         
         if (penaltyData.status === 'success') {
           setPenaltyMetrics(penaltyData.metrics);
@@ -34,3 +34,19 @@ export const apiCall = async (endpoint, options = {}) => {
 
   return response.json();
 };
+
+// Submit a background job (/run-validation, /calculate-penalties) and poll
+// /jobs/{job_id} until it finishes. Resolves with the job result in the
+// same shape the endpoints used to return synchronously.
+export const runJob = async (endpoint, { interval = 1000 } = {}) => {
+  const submitted = await apiCall(endpoint, { method: 'POST' });
+  let job = submitted.job;
+  while (job.status === 'queued' || job.status === 'running') {
+    await new Promise(resolve => setTimeout(resolve, interval));
+    job = await apiCall(`/jobs/${job.job_id}`);
+  }
+  if (job.status !== 'succeeded') {
+    return { status: 'error', message: job.error, job_id: job.job_id };
+  }
+  return { status: 'success', job_id: job.job_id, ...job.result };
+};
@@ -0,0 +1,5 @@
+# Shared setup for the backend tests: run from the repository root with `python -m pytest`
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,97 @@
+# Incremental validation runs against full runs after the inputs change
+import os
+import shutil
+
+import pandas as pd
+import pytest
+
+from backend.document_store import UPLOADS_DIR
+from backend.incremental_validation import state_path_for
+from backend.job_tasks import run_validation_task
+
+DOCUMENTS = ("reasons", "pos", "asns", "grns", "invoices")
+
+
+@pytest.fixture
+def sources(tmp_path):
+    for name in DOCUMENTS:
+        shutil.copy(os.path.join(UPLOADS_DIR, f"{name}.csv"), tmp_path / f"{name}.csv")
+    paths = {name: str(tmp_path / f"{name}.csv") for name in DOCUMENTS}
+    paths["validation"] = str(tmp_path / "final_reason_validation_results.csv")
+    return paths
+
+
+def edit(sources: dict, name: str, change):
+    """Rewrite one input file through `change(frame)`, with a new mtime however fast the test runs"""
+    path = sources[name]
+    frame = pd.read_csv(path, keep_default_na=False)
+    change(frame)
+    frame.to_csv(path, index=False)
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+
+
+def validate(sources: dict, full: bool = False) -> dict:
+    return run_validation_task("test", sources, sources["validation"], full=full)
+
+
+def assert_matches_full_run(sources: dict, tmp_path):
+    with open(sources["validation"]) as f:
+        incremental = f.read()
+    full_sources = dict(sources, validation=str(tmp_path / "full.csv"))
+    validate(full_sources, full=True)
+    with open(full_sources["validation"]) as f:
+        assert incremental == f.read()
+
+
+def set_reason(frame):
+    frame.loc[frame["PO_ID"] == "PO1000", "reason"] = "price mismatch"
+
+
+def set_received_quantity(frame):
+    frame.loc[frame["PO_ID"] == "PO1112", "Quantity_Received"] = 1
+
+
+def test_first_run_is_full(sources):
+    result = validate(sources)
+    assert result["incremental"]["mode"] == "full"
+    assert os.path.exists(state_path_for(sources["validation"]))
+
+
+@pytest.mark.parametrize("name, change", [("reasons", set_reason), ("grns", set_received_quantity)])
+def test_one_edited_po_matches_full_run(sources, tmp_path, name, change):
+    validate(sources)
+    edit(sources, name, change)
+    result = validate(sources)
+    assert result["incremental"]["mode"] == "incremental"
+    assert result["incremental"]["pos_recomputed"] == 1
+    assert_matches_full_run(sources, tmp_path)
+
+
+def test_added_and_removed_pos_match_full_run(sources, tmp_path):
+    validate(sources)
+
+    def add_and_remove(frame):
+        frame.drop(frame.index[frame["PO_ID"] == "PO1001"], inplace=True)
+        frame.loc[len(frame) + 1] = {**frame.iloc[0].to_dict(), "PO_ID": "PO9999", "reason": "arrived late"}
+
+    edit(sources, "reasons", add_and_remove)
+    result = validate(sources)
+    assert result["incremental"]["mode"] == "incremental"
+    assert result["incremental"]["pos_recomputed"] == 1
+    assert result["incremental"]["pos_removed"] == 1
+    assert_matches_full_run(sources, tmp_path)
+
+
+def test_unchanged_inputs_recompute_nothing(sources, tmp_path):
+    validate(sources)
+    result = validate(sources)
+    assert result["incremental"]["pos_recomputed"] == 0
+    assert_matches_full_run(sources, tmp_path)
+
+
+def test_edited_results_fall_back_to_full_run(sources):
+    validate(sources)
+    with open(sources["validation"], "a") as f:
+        f.write("PO0000,tampered,True,x\n")
+    assert validate(sources)["incremental"]["mode"] == "full"
@@ -0,0 +1,130 @@
+# Job runner lifecycle: coalescing, artifact swaps and worker failures
+import os
+import time
+
+import pytest
+
+from backend.document_store import DocumentStore
+from backend.jobs import JobManager, JobSpec
+
+TIMEOUT = 60
+
+
+# Job bodies run in spawned worker processes, so they live at module level
+def write_task(job_id, sources, artifact_path, progress=None, gate=None, text="done"):
+    while gate and not os.path.exists(gate):
+        time.sleep(0.01)
+    with open(artifact_path, "w") as f:
+        f.write(text)
+    with open(companion_path(artifact_path), "w") as f:
+        f.write(text)
+    return {"text": text, "timings": {"serialization": 0.001}}
+
+
+def failing_task(job_id, sources, artifact_path, progress=None):
+    with open(artifact_path, "w") as f:
+        f.write("partial")
+    raise ValueError("bad input")
+
+
+def dying_task(job_id, sources, artifact_path, progress=None):
+    os._exit(1)
+
+
+def companion_path(path):
+    return f"{path}.state"
+
+
+@pytest.fixture
+def sources(tmp_path):
+    (tmp_path / "input.csv").write_text("a\n1\n")
+    return {"input": str(tmp_path / "input.csv"), "output": str(tmp_path / "output.txt")}
+
+
+@pytest.fixture
+def manager(sources):
+    manager = JobManager(DocumentStore(sources), max_workers=2)
+    for kind, task in (("write", write_task), ("fail", failing_task), ("die", dying_task)):
+        manager.register(JobSpec(kind=kind, task=task, inputs=("input",), artifact="output",
+                                 companion=companion_path))
+    yield manager
+    manager.shutdown()
+
+
+def finish(manager, job):
+    assert manager.wait(job, TIMEOUT), f"job {job.job_id} still {job.status}"
+    return job
+
+
+def leftovers(sources):
+    directory = os.path.dirname(sources["output"])
+    return [name for name in os.listdir(directory) if name.endswith((".tmp", ".tmp.state"))]
+
+
+def test_job_succeeds_and_swaps_artifact(manager, sources):
+    job, coalesced = manager.submit("write", text="hello")
+    assert not coalesced and job.status in ("queued", "running")
+    finish(manager, job)
+    assert job.status == "succeeded" and job.progress == 1.0
+    assert job.result == {"text": "hello"}
+    assert job.timings == {"serialization": 0.001}
+    with open(sources["output"]) as f:
+        assert f.read() == "hello"
+    with open(companion_path(sources["output"])) as f:
+        assert f.read() == "hello"
+    assert leftovers(sources) == []
+    assert manager.jobs()[0]["job_id"] == job.job_id
+
+
+def test_identical_submissions_coalesce(manager, sources, tmp_path):
+    gate = str(tmp_path / "gate")
+    first, _ = manager.submit("write", gate=gate)
+    second, coalesced = manager.submit("write", gate=gate)
+    assert coalesced and second is first
+
+    other, coalesced = manager.submit("write", gate=gate, text="other")
+    assert not coalesced and other is not first
+
+    open(gate, "w").close()
+    finish(manager, first)
+    finish(manager, other)
+    # The finished job stays current until its inputs or artifact change
+    assert manager.submit("write", gate=gate, text="other") == (other, True)
+
+    os.utime(sources["input"], ns=(0, os.stat(sources["input"]).st_mtime_ns + 1_000_000_000))
+    rerun, coalesced = manager.submit("write", gate=gate, text="other")
+    assert not coalesced
+    finish(manager, rerun)
+
+
+def test_older_run_does_not_overwrite_newer(manager, sources, tmp_path):
+    gate = str(tmp_path / "gate")
+    older, _ = manager.submit("write", gate=gate, text="older")
+    newer, _ = manager.submit("write", text="newer")
+    finish(manager, newer)
+    open(gate, "w").close()
+    finish(manager, older)
+    assert older.status == "succeeded" and older.superseded
+    assert not newer.superseded
+    with open(sources["output"]) as f:
+        assert f.read() == "newer"
+    assert leftovers(sources) == []
+
+
+def test_failed_task_discards_its_output(manager, sources):
+    job = finish(manager, manager.submit("fail")[0])
+    assert job.status == "failed" and job.error == "bad input"
+    assert not os.path.exists(sources["output"])
+    assert leftovers(sources) == []
+    # A failed job is not joined by the next submission
+    assert manager.submit("fail")[1] is False
+
+
+def test_dead_worker_fails_job_and_pool_recovers(manager, sources):
+    job = finish(manager, manager.submit("die")[0])
+    assert job.status == "failed"
+
+    job = finish(manager, manager.submit("write", text="after")[0])
+    assert job.status == "succeeded"
+    with open(sources["output"]) as f:
+        assert f.read() == "after"
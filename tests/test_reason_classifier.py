@@ -0,0 +1,70 @@
+# The compiled reason classifier against the keyword chain it replaced
+import numpy as np
+import pandas as pd
+import pytest
+
+from backend.reason_classifier import (
+    RAW_REASON_MAP_FILE, REASON_BUCKETS_FILE, UNSPECIFIED_CATEGORY, ReasonClassifier, read_json,
+)
+from benchmarks.bench_reason_classifier import chain_rule, compiled, per_row
+from benchmarks.bench_validation import load_uploads
+
+
+@pytest.fixture(scope="module")
+def reason_buckets():
+    return read_json(REASON_BUCKETS_FILE)
+
+
+@pytest.fixture(scope="module")
+def reasons():
+    """Every uploaded reason, plus free text, case and whitespace variants and missing values"""
+    uploaded = load_uploads()["reasons"]["reason"].tolist()
+    extra = [
+        "  Arrived LATE ", "price and qty mismatch", "no grn for shipment", "NONE", "", "   ",
+        "goods received were more than ordered", "split into multiple deliveries", "something else #42",
+        None, np.nan,
+    ]
+    return pd.Series(uploaded + extra, dtype="str")
+
+
+def test_matches_keyword_chain(reasons, reason_buckets):
+    classifier = ReasonClassifier(reason_buckets, read_json(RAW_REASON_MAP_FILE))
+    expected_rules, expected_buckets = per_row(reasons, reason_buckets)
+    rules, buckets = compiled(reasons, classifier)
+    np.testing.assert_array_equal(rules, expected_rules)
+    np.testing.assert_array_equal(buckets, expected_buckets)
+
+
+def test_categorical_input_matches(reasons, reason_buckets):
+    classifier = ReasonClassifier(reason_buckets, read_json(RAW_REASON_MAP_FILE))
+    expected = compiled(reasons, classifier)
+    result = compiled(reasons.astype("category"), classifier)
+    for a, b in zip(result, expected):
+        np.testing.assert_array_equal(a, b)
+
+
+def test_memoized_results_are_stable(reasons, reason_buckets):
+    classifier = ReasonClassifier(reason_buckets, read_json(RAW_REASON_MAP_FILE))
+    first = compiled(reasons, classifier)
+    second = compiled(reasons, classifier)
+    for a, b in zip(first, second):
+        np.testing.assert_array_equal(a, b)
+
+
+@pytest.mark.parametrize("reason", ["late delivery", "over delivered", "qty less than ordered", "no issues", "xyz"])
+def test_single_reason_matches_chain(reason):
+    assert ReasonClassifier().classify(f" {reason.upper()} ").rule == chain_rule(reason)
+
+
+def test_direction():
+    classifier = ReasonClassifier()
+    assert classifier.classify("received more than ordered").direction == "over"
+    assert classifier.classify("under delivered").direction == "under"
+    assert classifier.classify("received wrong items").direction == "equal"
+
+
+def test_alias_takes_canonical_bucket():
+    classifier = ReasonClassifier({"Late Delivery": "Timing"}, {"arrived late": "late delivery"})
+    assert classifier.classify("Arrived Late").canonical == "late delivery"
+    assert classifier.classify("Arrived Late").bucket == "Timing"
+    assert classifier.classify("unmapped reason").bucket == UNSPECIFIED_CATEGORY
@@ -0,0 +1,99 @@
+# Cursor pagination, filtering and sorting of record sets
+import numpy as np
+import pandas as pd
+import pytest
+
+from backend.record_query import (
+    MAX_PAGE_SIZE, PenaltyIndex, QueryError, decode_cursor, encode_cursor, paginate, sort_positions,
+)
+
+
+@pytest.fixture
+def index():
+    frame = pd.DataFrame({
+        "PO_ID": [f"PO{i}" for i in range(10)],
+        "reason": ["late", "price", "late", "none", "qty", "late", "price", "none", "late", "qty"],
+        "penalty": [5, 1, 3, 0, 2, 5, 4, 0, 1, "bad"],
+        "admin_approved": [True, "False", "true", False, "1", False, True, "no", False, True],
+    })
+    return PenaltyIndex(frame, frame["reason"].str.title(), version="v1")
+
+
+def pages(positions, limit, version, query):
+    """Every page of a result set, following the cursors"""
+    result, cursor = [], None
+    while True:
+        page, cursor = paginate(positions, cursor, limit, version, query)
+        result.append(page)
+        if cursor is None:
+            return result
+
+
+def test_cursor_round_trip():
+    cursor = encode_cursor(300, "v1", "abc")
+    assert decode_cursor(cursor, "v1", "abc") == 300
+
+
+def test_pages_cover_the_result_once(index):
+    query = {"category": "Late", "sort": "-penalty"}
+    positions = index.query(category="Late", sort="-penalty")
+    result = pages(positions, 3, index.version, query)
+    assert [len(page) for page in result] == [3, 1]
+    np.testing.assert_array_equal(np.concatenate(result), positions)
+
+
+def test_last_full_page_has_no_cursor():
+    _, cursor = paginate(np.arange(4), None, 4, "v1", {})
+    assert cursor is None
+
+
+@pytest.mark.parametrize("changed", [
+    {"category": "Price", "sort": "-penalty"},
+    {"category": "Late", "sort": "penalty"},
+    {"category": "Late"},
+    {"category": "Late", "sort": "-penalty", "min_penalty": 1},
+])
+def test_cursor_rejected_when_filters_or_sort_change(changed):
+    _, cursor = paginate(np.arange(10), None, 2, "v1", {"category": "Late", "sort": "-penalty"})
+    with pytest.raises(QueryError, match="does not match this query"):
+        paginate(np.arange(10), cursor, 2, "v1", changed)
+
+
+def test_unset_parameters_do_not_change_the_query():
+    _, cursor = paginate(np.arange(10), None, 2, "v1", {"category": "Late", "approved": None, "sort": ""})
+    page, _ = paginate(np.arange(10), cursor, 2, "v1", {"category": "Late"})
+    np.testing.assert_array_equal(page, [2, 3])
+
+
+def test_cursor_rejected_when_data_changes():
+    _, cursor = paginate(np.arange(10), None, 2, "v1", {})
+    with pytest.raises(QueryError, match="expired"):
+        paginate(np.arange(10), cursor, 2, "v2", {})
+
+
+@pytest.mark.parametrize("cursor", ["not-a-cursor", "e30", encode_cursor(0, "v1")[:-3]])
+def test_invalid_cursor(cursor):
+    with pytest.raises(QueryError):
+        paginate(np.arange(10), cursor, 2, "v1", {})
+
+
+@pytest.mark.parametrize("limit", [0, MAX_PAGE_SIZE + 1])
+def test_limit_bounds(limit):
+    with pytest.raises(QueryError, match="limit"):
+        paginate(np.arange(10), None, limit, "v1", {})
+
+
+def test_filters(index):
+    np.testing.assert_array_equal(index.query(approved=True), [0, 2, 4, 6, 9])
+    np.testing.assert_array_equal(index.query(min_penalty=2, max_penalty=4), [2, 4, 6])
+    np.testing.assert_array_equal(index.query(category="Qty", approved=False), [])
+
+
+def test_descending_sort_keeps_file_order_for_ties(index):
+    np.testing.assert_array_equal(index.query(sort="-penalty"), [0, 5, 6, 2, 4, 1, 8, 3, 7, 9])
+    np.testing.assert_array_equal(index.query(sort="penalty"), [3, 7, 9, 1, 8, 4, 2, 6, 0, 5])
+
+
+def test_unknown_sort_key(index):
+    with pytest.raises(QueryError, match="Cannot sort"):
+        sort_positions(np.arange(3), "admin_comments", index.columns)
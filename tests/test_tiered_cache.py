@@ -0,0 +1,106 @@
+# Tiered cache behaviour through a Redis outage and recovery
+import asyncio
+import json
+
+import fakeredis
+import pytest
+
+from backend.redis_client import ResilientRedis
+from backend.tiered_cache import LocalCache, TieredCache
+
+
+@pytest.fixture
+def server():
+    return fakeredis.FakeServer()
+
+
+def make_cache(server, cooldown: float = 0.0) -> TieredCache:
+    """A cache whose circuit opens on the first failure; with no probe running, the next call after `cooldown` retries"""
+    client = fakeredis.FakeAsyncRedis(server=server, decode_responses=True)
+    return TieredCache(ResilientRedis(client, failure_threshold=1, cooldown=cooldown), LocalCache())
+
+
+def test_deferred_value_is_promoted_when_redis_recovers(server):
+    async def scenario():
+        cache = make_cache(server)
+        server.connected = False
+        await cache.set("k", {"a": 1}, 60)
+        assert not cache.redis_available
+        assert await cache.get("k") == {"a": 1}
+
+        server.connected = True
+        await cache.get("unrelated")
+        assert cache.redis_available and cache.promoted == 1
+        assert json.loads(await cache.redis.client.get("k")) == {"a": 1}
+        assert await cache.redis.client.ttl("k") > 0
+
+    asyncio.run(scenario())
+
+
+def test_deferred_delete_is_promoted(server):
+    async def scenario():
+        cache = make_cache(server)
+        await cache.set("k", 1, 60)
+        server.connected = False
+        await cache.delete("k")
+        server.connected = True
+        await cache.get("unrelated")
+        assert await cache.redis.client.exists("k") == 0
+
+    asyncio.run(scenario())
+
+
+def test_list_appended_during_outage_is_promoted(server):
+    async def scenario():
+        cache = make_cache(server)
+        await cache.set_list("turns", [1, 2], 60)
+        server.connected = False
+        assert await cache.append_list("turns", [3], max_length=10, ttl=60)
+        assert await cache.get_list("turns") == [1, 2, 3]
+
+        server.connected = True
+        assert await cache.get_list("turns") == [1, 2, 3]
+        assert await cache.redis.client.lrange("turns", 0, -1) == ["1", "2", "3"]
+        # Promoted, so appends go to Redis again
+        assert await cache.append_list("turns", [4], max_length=3, ttl=60)
+        assert await cache.redis.client.lrange("turns", 0, -1) == ["2", "3", "4"]
+
+    asyncio.run(scenario())
+
+
+def test_lists_see_other_workers_appends(server):
+    async def scenario():
+        first, second = make_cache(server), make_cache(server)
+        await first.set_list("turns", [1], 60)
+        assert await second.get_list("turns") == [1]
+        assert await first.append_list("turns", [2], max_length=10, ttl=60)
+        assert await second.get_list("turns") == [1, 2]
+        assert await second.append_list("turns", [3], max_length=10, ttl=60)
+        assert await first.get_list("turns") == [1, 2, 3]
+
+    asyncio.run(scenario())
+
+
+def test_append_without_a_list_asks_for_a_rebuild(server):
+    async def scenario():
+        cache = make_cache(server)
+        assert not await cache.append_list("turns", [1], max_length=10, ttl=60)
+        server.connected = False
+        assert not await cache.append_list("turns", [1], max_length=10, ttl=60)
+        assert await cache.get_list("turns") is None
+
+    asyncio.run(scenario())
+
+
+def test_open_circuit_skips_redis(server):
+    async def scenario():
+        cache = make_cache(server, cooldown=60)
+        server.connected = False
+        await cache.set("k", 1, 60)
+        calls = cache.redis.calls
+        server.connected = True
+        assert await cache.get("other") is None
+        assert cache.redis.calls == calls and cache.redis.skipped == 1
+        assert cache.promoted == 0
+
+    asyncio.run(scenario())
@@ -0,0 +1,30 @@
+# The vectorized validation engine against the original per-row loop
+import pandas as pd
+import pytest
+
+from backend.validation_engine import validate_reasons
+from benchmarks.bench_validation import legacy_validate, load_uploads, synthesize
+
+
+@pytest.fixture(scope="module")
+def uploads():
+    return load_uploads()
+
+
+def test_matches_legacy_loop_on_uploads(uploads):
+    tables = (uploads["reasons"], uploads["pos"], uploads["asns"], uploads["grns"], uploads["invoices"])
+    pd.testing.assert_frame_equal(validate_reasons(*tables), legacy_validate(*tables))
+
+
+@pytest.mark.parametrize("seed", [1, 2, 3])
+def test_matches_legacy_loop_on_synthetic_data(uploads, seed):
+    # Resampled tables have missing and repeated supporting documents per PO
+    tables = synthesize(uploads, 1500, seed=seed)
+    pd.testing.assert_frame_equal(validate_reasons(*tables), legacy_validate(*tables))
+
+
+def test_empty_supporting_tables(uploads):
+    reasons = uploads["reasons"].head(200)
+    empty = {name: uploads[name].iloc[0:0] for name in ("pos", "asns", "grns", "invoices")}
+    tables = (reasons, empty["pos"], empty["asns"], empty["grns"], empty["invoices"])
+    pd.testing.assert_frame_equal(validate_reasons(*tables), legacy_validate(*tables))